@@ -9,8 +9,13 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+## noqa NOTE: As get_asgi_application, with streaming bodies produced in the
+## noqa   worker pool, see core.asyncviews.
+django.setup(set_prefix=False)
 
-application = get_asgi_application()
+from core.asyncviews import StreamingASGIHandler  # noqa: E402
+
+application = StreamingASGIHandler()
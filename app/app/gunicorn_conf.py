@@ -0,0 +1,150 @@
+"""
+Gunicorn configuration for serving the project in production.
+
+Run from the app directory with:
+
+    gunicorn -c python:app.gunicorn_conf app.wsgi
+
+or, to serve the ASGI app (needs uvicorn installed):
+
+    GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker \\
+        gunicorn -c python:app.gunicorn_conf app.asgi
+
+Every setting can be overridden from the environment (GUNICORN_*).
+With more than one worker the coordination cache must be memcached
+(the image expects it at memcached:11211), gunicorn refuses to start
+with a per-process or non-atomic one.
+The app is loaded once in the master and the workers are forked from
+it, sharing its memory copy-on-write. Workers are recycled after
+max_requests requests (with jitter so they do not all restart at once).
+
+Graceful reload: `kill -HUP <master pid>` starts new workers and lets the
+old ones finish their requests within graceful_timeout. As the app is
+preloaded, new code is only picked up by a new master: send USR2 to
+start one next to the old, then QUIT to the old master.
+"""
+import gc
+import os
+
+
+def env_int(name, default):
+    """Return an integer setting from the environment."""
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def cpu_count():
+    """Return the number of CPUs this process may run on."""
+    try:
+        ## noqa NOTE: Honours CPU affinity (taskset, cpusets), unlike cpu_count.
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def default_workers(cpus):
+    """Return the number of worker processes for a number of CPUs."""
+    return cpus * 2 + 1
+
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+workers = env_int('GUNICORN_WORKERS', default_workers(cpu_count()))
+## noqa NOTE: Requests mostly wait on the database, threads overlap the waits.
+## noqa   workers * threads should not exceed the database connections.
+threads = env_int('GUNICORN_THREADS', 4)
+worker_class = os.environ.get(
+    'GUNICORN_WORKER_CLASS', 'gthread' if threads > 1 else 'sync',
+)
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+max_requests = env_int('GUNICORN_MAX_REQUESTS', 1000)
+max_requests_jitter = env_int('GUNICORN_MAX_REQUESTS_JITTER', 100)
+
+timeout = env_int('GUNICORN_TIMEOUT', 30)
+graceful_timeout = env_int('GUNICORN_GRACEFUL_TIMEOUT', 30)
+keepalive = env_int('GUNICORN_KEEPALIVE', 5)
+
+## noqa NOTE: Worker heartbeats on a tmpfs, a slow disk can get workers killed.
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+## noqa NOTE: An empty GUNICORN_ACCESS_LOG turns the access log off.
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-') or None
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def check_shared_cache(workers):
+    """Raise if several workers would not share the coordination cache.
+
+    Cache generations (list caches, ETags, autocomplete indexes),
+    replica pins and token cache versions are stored in it, a worker
+    that did not see a write would keep serving stale data. Its incr
+    must also be atomic across processes, which the backends inheriting
+    BaseCache.incr (file, database) do not guarantee.
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+    from django.conf import settings
+    from django.core.cache.backends.base import BaseCache
+    from django.core.cache.backends.locmem import LocMemCache
+    from django.utils.module_loading import import_string
+    backend = settings.CACHES[settings.COORDINATION_CACHE_ALIAS]['BACKEND']
+    backend_class = import_string(backend)
+    if workers > 1 and (
+        issubclass(backend_class, LocMemCache)
+        or backend_class.incr is BaseCache.incr
+    ):
+        raise RuntimeError(
+            f'{workers} workers cannot coordinate through {backend}, set '
+            'COORDINATION_CACHE_BACKEND to memcached or GUNICORN_WORKERS=1.'
+        )
+
+
+def prepare_metrics_dir(workers):
+    """Empty the directory the workers share metrics in.
+
+    prometheus_client keeps the metrics of each process there, which
+    are summed when scraped; without it every worker reports its own.
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+    from django.conf import settings
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if not path:
+        if workers > 1 and settings.METRICS_ENABLED:
+            raise RuntimeError(
+                f'{workers} workers need PROMETHEUS_MULTIPROC_DIR to share '
+                'their metrics.'
+            )
+        return
+    os.makedirs(path, exist_ok=True)
+    for name in os.listdir(path):
+        if name.endswith('.db'):
+            os.remove(os.path.join(path, name))
+
+
+def on_starting(server):
+    """Check the configuration before the app is loaded."""
+    check_shared_cache(server.cfg.workers)
+    prepare_metrics_dir(server.cfg.workers)
+
+
+def child_exit(server, worker):
+    """Drop the live gauges of a worker that exited."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
+
+
+def when_ready(server):
+    """Finish loading the app in the master before the workers fork."""
+    if not server.cfg.preload_app:
+        return
+    ## noqa NOTE: Django loads the URLconf, and so the views, serializers and
+    ## noqa   DRF, on the first request; load them once for all workers.
+    from django.urls import get_resolver
+    get_resolver().url_patterns
+    ## noqa NOTE: Keep the garbage collector from writing to the shared objects,
+    ## noqa   which would copy their pages into every worker.
+    gc.freeze()
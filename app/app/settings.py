@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 import os
+import sys
+from decimal import Decimal
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -23,9 +25,11 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = 'django-insecure-)avyxqeoz-6^&5a@!3p615204p(o6qr)dz*utvi&7*&5y^2&yk'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get('DEBUG', '1') == '1'
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = list(
+    filter(None, os.environ.get('ALLOWED_HOSTS', '').split(','))
+)
 
 
 # Application definition
@@ -47,6 +51,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -76,20 +81,79 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'app.wsgi.application'
 
+# Request instrumentation, see core.metrics. Adds a Server-Timing header
+# to every response and serves Prometheus metrics at /metrics, which
+# requires METRICS_TOKEN as a bearer token (refused when it is not set).
+# Several worker processes share their metrics in the directory named by
+# the PROMETHEUS_MULTIPROC_DIR environment variable.
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '0') == '1'
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Serve the API views as coroutines running in a pool of worker threads
+# (see core.asyncviews). Off by default: under uvicorn it only beat the
+# stock handler with 10 ms database round trips (55 vs 32 req/s) and was
+# slower with 2 ms ones or a local socket (55 vs 77, 21 vs 32 req/s).
+# The threads, which also produce streaming bodies under ASGI, should
+# not outnumber the database connections available to a process.
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', '0') == '1'
+ASYNC_VIEW_WORKERS = int(os.environ.get('ASYNC_VIEW_WORKERS', 16))
+
 
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+# PostgreSQL with health checks and an optional connection pool, see
+# core.db.base. DB_CONN_MAX_AGE keeps a connection per thread for that
+# many seconds; DB_POOL_SIZE > 0 shares a pool of them between threads.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'core.db',
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
-        'PASSWORD': os.environ.get('DB_PASS')
+        'PASSWORD': os.environ.get('DB_PASS'),
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 0)),
+        'CONN_HEALTH_CHECKS': (
+            os.environ.get('DB_CONN_HEALTH_CHECKS', '1') == '1'
+        ),
+        'POOL': {
+            'SIZE': int(os.environ.get('DB_POOL_SIZE', 0)),
+            'MAX_OVERFLOW': int(os.environ.get('DB_POOL_MAX_OVERFLOW', 10)),
+            'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 30)),
+            'IDLE_TIMEOUT': float(os.environ.get('DB_POOL_IDLE_TIMEOUT', 300)),
+            'PRE_PING': os.environ.get('DB_POOL_PRE_PING', '1') == '1',
+        },
     }
 }
 
+# Read replicas, see core.db.routers. DB_REPLICAS is a comma separated
+# list of HOST or NAME@HOST entries, the other settings are the default
+# database's. Safe requests to the recipe APIs read from a replica no
+# more than REPLICA_MAX_LAG seconds behind; a user who wrote reads from
+# the default database for REPLICA_PIN_SECONDS, which should exceed the
+# max lag plus the lag check interval. Pins are stored in the recipe
+# cache, which must be shared by all worker processes.
+DATABASE_REPLICAS = []
+for _index, _replica in enumerate(
+    filter(None, os.environ.get('DB_REPLICAS', '').split(',')), start=1,
+):
+    _name, _, _host = _replica.strip().rpartition('@')
+    DATABASE_REPLICAS.append(f'replica{_index}')
+    DATABASES[f'replica{_index}'] = {
+        **DATABASES['default'],
+        'HOST': _host,
+        'NAME': _name or DATABASES['default']['NAME'],
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['core.db.routers.ReplicaRouter']
+
+REPLICA_MAX_LAG = float(os.environ.get('REPLICA_MAX_LAG', 2))
+REPLICA_LAG_CHECK_INTERVAL = float(
+    os.environ.get('REPLICA_LAG_CHECK_INTERVAL', 1)
+)
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 5))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -110,6 +174,38 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing
+# https://docs.djangoproject.com/en/3.2/topics/auth/passwords/
+# The first hasher is used for new hashes, the others only verify old ones
+# which are rehashed with the first on the next successful login.
+
+_PASSWORD_HASHERS = {
+    'argon2': 'user.hashers.Argon2PasswordHasher',
+    'scrypt': 'user.hashers.ScryptPasswordHasher',
+    'bcrypt': 'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+}
+PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER', 'argon2')
+
+PASSWORD_HASHERS = [_PASSWORD_HASHERS[PASSWORD_HASHER]] + [
+    path for name, path in _PASSWORD_HASHERS.items()
+    if name != PASSWORD_HASHER
+] + [
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+
+ARGON2_TIME_COST = int(os.environ.get('ARGON2_TIME_COST', 2))
+ARGON2_MEMORY_COST = int(os.environ.get('ARGON2_MEMORY_COST', 19456))
+ARGON2_PARALLELISM = int(os.environ.get('ARGON2_PARALLELISM', 1))
+
+# Worker processes verifying passwords, 0 hashes in the request thread.
+PASSWORD_HASH_POOL_SIZE = int(os.environ.get('PASSWORD_HASH_POOL_SIZE', 0))
+
+AUTHENTICATION_BACKENDS = [
+    'user.backends.HashPoolModelBackend',
+]
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/3.2/topics/i18n/
 
@@ -133,6 +229,17 @@ MEDIA_URL  = '/static/media/'
 MEDIA_ROOT = '/vol/web/media/'
 STATIC_ROOT = '/vol/web/static/'
 
+# Threads generating resized recipe image variants, 0 runs them inline.
+IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', 2))
+
+# Limits on uploaded recipe images, checked while the upload streams in.
+IMAGE_UPLOAD_MAX_BYTES = int(
+    os.environ.get('IMAGE_UPLOAD_MAX_BYTES', 20 * 1024 * 1024)
+)
+IMAGE_UPLOAD_MAX_PIXELS = int(
+    os.environ.get('IMAGE_UPLOAD_MAX_PIXELS', 50_000_000)
+)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -140,8 +247,83 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'core.User'
 
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+# The recipe cache holds response bodies, which may be culled at
+# RECIPE_CACHE_MAX_ENTRIES. The coordination cache holds the small keys
+# the processes coordinate with: cache generations, token versions and
+# replica pins. It must not cull them and must increment atomically, so
+# with more than one worker process it is memcached (a dedicated instance,
+# see app.gunicorn_conf).
+
+RECIPE_CACHE_BACKEND = os.environ.get(
+    'RECIPE_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache',
+)
+RECIPE_CACHE_MAX_ENTRIES = int(
+    os.environ.get('RECIPE_CACHE_MAX_ENTRIES', 10000)
+)
+COORDINATION_CACHE_BACKEND = os.environ.get(
+    'COORDINATION_CACHE_BACKEND',
+    'django.core.cache.backends.locmem.LocMemCache',
+)
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'recipe': {
+        'BACKEND': RECIPE_CACHE_BACKEND,
+        'LOCATION': os.environ.get('RECIPE_CACHE_LOCATION', 'recipe'),
+    },
+    'coordination': {
+        'BACKEND': COORDINATION_CACHE_BACKEND,
+        'LOCATION': os.environ.get(
+            'COORDINATION_CACHE_LOCATION', 'coordination',
+        ),
+    },
+}
+# Memcached evicts by itself and rejects the culling options.
+if 'memcached' not in RECIPE_CACHE_BACKEND:
+    CACHES['recipe']['OPTIONS'] = {'MAX_ENTRIES': RECIPE_CACHE_MAX_ENTRIES}
+if 'memcached' not in COORDINATION_CACHE_BACKEND:
+    CACHES['coordination']['OPTIONS'] = {'MAX_ENTRIES': sys.maxsize}
+
+RECIPE_CACHE_ALIAS = 'recipe'
+RECIPE_CACHE_ENABLED = os.environ.get('RECIPE_CACHE_ENABLED', '1') == '1'
+RECIPE_CACHE_TIMEOUT = int(os.environ.get('RECIPE_CACHE_TIMEOUT', 300))
+
+COORDINATION_CACHE_ALIAS = 'coordination'
+RECIPE_GENERATION_CACHE_ALIAS = COORDINATION_CACHE_ALIAS
+REPLICA_PIN_CACHE_ALIAS = COORDINATION_CACHE_ALIAS
+
+# Full-text search of recipes, see recipe.search. The backend is "auto"
+# (PostgreSQL if available), "postgres" or "memory".
+RECIPE_SEARCH_BACKEND = os.environ.get('RECIPE_SEARCH_BACKEND', 'auto')
+RECIPE_SEARCH_CONFIG = os.environ.get('RECIPE_SEARCH_CONFIG', 'english')
+
+# Tag and ingredient autocomplete, see recipe.autocomplete. Number of
+# users whose names each process keeps indexed in memory, 0 disables it.
+AUTOCOMPLETE_INDEX_USERS = int(os.environ.get('AUTOCOMPLETE_INDEX_USERS', 256))
+
+# Recipe collection statistics, see recipe.stats. Width of the price
+# histogram buckets and number of most used tags/ingredients returned.
+RECIPE_STATS_PRICE_BUCKET = Decimal(
+    os.environ.get('RECIPE_STATS_PRICE_BUCKET', '5.00')
+)
+RECIPE_STATS_TOP = int(os.environ.get('RECIPE_STATS_TOP', 10))
+
+# Token authentication cache (per process), see user.authentication.
+# Changes reach the other processes through a per-user version kept in
+# the coordination cache and checked on every hit.
+
+AUTH_TOKEN_CACHE_SIZE = int(os.environ.get('AUTH_TOKEN_CACHE_SIZE', 10000))
+AUTH_TOKEN_CACHE_TTL = int(os.environ.get('AUTH_TOKEN_CACHE_TTL', 60))
+AUTH_TOKEN_VERSION_CACHE_ALIAS = COORDINATION_CACHE_ALIAS
+
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_PAGINATION_CLASS': 'recipe.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
 }
 
 SPECTACULAR_SETTINGS = {
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        ## noqa NOTE: Registers the query timing signal handler.
+        from core import metrics  # noqa: F401
@@ -0,0 +1,83 @@
+"""
+PostgreSQL backend with connection health checks and pooling.
+
+Configured by two extra keys of the DATABASES entry:
+
+- CONN_HEALTH_CHECKS: test a persistent connection (CONN_MAX_AGE) with
+  a query before its first use in each request, and reconnect if the
+  server dropped it (Django 4.1 does this natively).
+- POOL: SIZE, MAX_OVERFLOW, TIMEOUT, IDLE_TIMEOUT and PRE_PING of a
+  process-local connection pool (see core.db.pool). Closing a
+  connection then hands it back to the pool, the next thread to
+  connect reuses it. A SIZE of 0 (the default) disables the pool.
+"""
+import functools
+
+from django.db.backends.postgresql import base
+
+from core.db.pool import get_pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """PostgreSQL connection with health checks and an optional pool."""
+
+    health_check_done = False
+    pool = None
+
+    def get_pool(self, conn_params):
+        """Return the pool to take connections from, or None."""
+        options = self.settings_dict.get('POOL') or {}
+        if not options.get('SIZE'):
+            return None
+        return get_pool(self.alias, conn_params, {
+            'size': options['SIZE'],
+            'max_overflow': options.get('MAX_OVERFLOW', 0),
+            'timeout': options.get('TIMEOUT', 30),
+            'idle_timeout': options.get('IDLE_TIMEOUT', 300),
+            'pre_ping': options.get('PRE_PING', True),
+        })
+
+    def get_new_connection(self, conn_params):
+        self.pool = self.get_pool(conn_params)
+        if self.pool is None:
+            return super().get_new_connection(conn_params)
+        connection = self.pool.acquire(
+            functools.partial(super().get_new_connection, conn_params),
+        )
+        self.isolation_level = self.settings_dict['OPTIONS'].get(
+            'isolation_level', connection.isolation_level,
+        )
+        return connection
+
+    def connect(self):
+        ## noqa NOTE: A connection just opened or pre-pinged needs no check,
+        ## noqa   set first as connect() itself goes through ensure_connection.
+        self.health_check_done = True
+        super().connect()
+
+    def _close(self):
+        if self.connection is None or self.pool is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            if self.in_atomic_block:
+                ## noqa NOTE: The wrapper keeps using it until the block exits.
+                self.pool.discard(self.connection)
+            else:
+                self.pool.release(self.connection)
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        ## noqa NOTE: Called at the start and end of each request.
+        self.health_check_done = False
+
+    def ensure_connection(self):
+        if (
+            self.connection is not None
+            and self.settings_dict.get('CONN_HEALTH_CHECKS')
+            and not self.health_check_done
+            and not self.in_atomic_block
+        ):
+            if not self.is_usable():
+                self.close()
+            self.health_check_done = True
+        super().ensure_connection()
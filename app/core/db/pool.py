@@ -0,0 +1,180 @@
+"""
+Process-local pool of psycopg2 connections.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+from psycopg2 import OperationalError, extensions
+
+
+class PoolTimeout(OperationalError):
+    """No connection became free within the pool timeout."""
+
+
+class ConnectionPool:
+    """Thread-safe pool of open database connections.
+
+    Up to `size` idle connections are kept for reuse; under load up to
+    `max_overflow` more are opened and closed again once released.
+    Checking out waits at most `timeout` seconds for a free slot.
+    Connections idle longer than `idle_timeout` are closed, and with
+    `pre_ping` a reused connection is tested with a query before it is
+    handed out, so one dropped by the server is replaced transparently.
+    """
+
+    def __init__(self, size, max_overflow=0, timeout=30.0,
+                 idle_timeout=300.0, pre_ping=True, clock=time.monotonic):
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.pre_ping = pre_ping
+        self.clock = clock
+        ## noqa NOTE: (connection, released at), most recently released last.
+        self._idle = deque()
+        ## noqa NOTE: Connections open, idle or checked out.
+        self._open = 0
+        self._cond = threading.Condition()
+
+    def _reap(self):
+        """Remove and return the connections idle for too long."""
+        expired = []
+        deadline = self.clock() - self.idle_timeout
+        while self._idle and self._idle[0][1] <= deadline:
+            expired.append(self._idle.popleft()[0])
+        self._open -= len(expired)
+        return expired
+
+    def _take(self):
+        """Return an idle connection, None to open one, or wait."""
+        deadline = self.clock() + self.timeout
+        expired = []
+        with self._cond:
+            while True:
+                expired += self._reap()
+                if self._idle:
+                    ## noqa NOTE: LIFO, so connections beyond the load age out.
+                    conn = self._idle.pop()[0]
+                    break
+                if self._open < self.size + self.max_overflow:
+                    self._open += 1
+                    conn = None
+                    break
+                remaining = deadline - self.clock()
+                if remaining <= 0:
+                    raise PoolTimeout(
+                        f'No database connection free after {self.timeout}s '
+                        f'({self._open} open).'
+                    )
+                self._cond.wait(remaining)
+        for expired_conn in expired:
+            _close_quietly(expired_conn)
+        return conn
+
+    def _forget(self, conn):
+        """Close a connection and free its slot."""
+        _close_quietly(conn)
+        with self._cond:
+            self._open -= 1
+            self._cond.notify()
+
+    def _ping(self, conn):
+        """Return whether a connection still answers."""
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            if conn.status != extensions.STATUS_READY:
+                conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def acquire(self, connect):
+        """Return a connection, opening one with connect() if needed."""
+        while True:
+            conn = self._take()
+            if conn is None:
+                try:
+                    return connect()
+                except Exception:
+                    with self._cond:
+                        self._open -= 1
+                        self._cond.notify()
+                    raise
+            if conn.closed or (self.pre_ping and not self._ping(conn)):
+                self._forget(conn)
+                continue
+            return conn
+
+    def release(self, conn):
+        """Give back a connection, keeping it open for reuse if possible."""
+        if not conn.closed and conn.status != extensions.STATUS_READY:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+        if conn.closed or conn.status != extensions.STATUS_READY:
+            self._forget(conn)
+            return
+        with self._cond:
+            expired = self._reap()
+            keep = len(self._idle) < self.size
+            if keep:
+                self._idle.append((conn, self.clock()))
+                self._cond.notify()
+        for expired_conn in expired:
+            _close_quietly(expired_conn)
+        if not keep:
+            self._forget(conn)
+
+    def discard(self, conn):
+        """Close a checked out connection instead of giving it back."""
+        self._forget(conn)
+
+    def close(self):
+        """Close the idle connections."""
+        with self._cond:
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+            self._open -= len(idle)
+            self._cond.notify_all()
+        for conn in idle:
+            _close_quietly(conn)
+
+    def stats(self):
+        """Return the number of open and idle connections."""
+        with self._cond:
+            return {'open': self._open, 'idle': len(self._idle)}
+
+
+def _close_quietly(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, conn_params, options):
+    """Return this process's pool for a database alias and its params."""
+    ## noqa NOTE: Keyed by pid too, a forked child never uses its parent's
+    ## noqa   sockets (and by params, tests switch to another database).
+    key = (alias, os.getpid(), repr(sorted(conn_params.items())))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(**options)
+        return pool
+
+
+def close_pools():
+    """Close the idle connections of every pool of this process."""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close()
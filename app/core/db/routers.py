@@ -0,0 +1,193 @@
+"""
+Routing of API reads to read replicas.
+
+The replicas are the DATABASE_REPLICAS aliases of DATABASES. Reads go
+to them only while a view with ReplicaReadMixin serves a safe request,
+everything else (writes, the admin, commands, auth lookups) uses the
+default database. A user who just wrote is pinned to the default
+database for REPLICA_PIN_SECONDS, counted from the response and from
+each commit of their recipe data (see recipe.cache), so they read
+their own writes. A replica more than REPLICA_MAX_LAG seconds behind
+is skipped.
+"""
+import contextvars
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import (
+    DEFAULT_DB_ALIAS, DatabaseError, connections, transaction,
+)
+from rest_framework.permissions import SAFE_METHODS
+
+## noqa NOTE: Alias serving the reads of the current request, None outside.
+_read_alias = contextvars.ContextVar('read_alias', default=None)
+
+## noqa NOTE: Seconds since the last transaction replayed by a standby, 0 on a
+## noqa   primary or a standby that has replayed all it received.
+POSTGRES_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery()
+            OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn()
+        THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+
+def get_replicas():
+    """Return the aliases of the read replicas."""
+    return settings.DATABASE_REPLICAS
+
+
+def _pin_key(user_id):
+    return f'db:pin:{user_id}'
+
+
+def pin(user_id):
+    """Send a user's reads to the default database for a while."""
+    caches[settings.REPLICA_PIN_CACHE_ALIAS].set(
+        _pin_key(user_id), True, timeout=settings.REPLICA_PIN_SECONDS,
+    )
+
+
+def pin_on_commit(user_id):
+    """Pin a user once the current transaction commits."""
+    if get_replicas():
+        ## noqa NOTE: Counts from the commit, a long write (a streamed import)
+        ## noqa   would outlast a pin taken when it started.
+        transaction.on_commit(lambda: pin(user_id))
+
+
+def is_pinned(user_id):
+    """Return whether a user's reads must go to the default database."""
+    return bool(caches[settings.REPLICA_PIN_CACHE_ALIAS].get(
+        _pin_key(user_id),
+    ))
+
+
+def replica_lag(alias):
+    """Return how many seconds a database is behind, None if unreachable."""
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        ## noqa NOTE: Stand-ins (SQLite...) without replication.
+        return 0.0
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(POSTGRES_LAG_SQL)
+            return float(cursor.fetchone()[0] or 0)
+    except DatabaseError:
+        return None
+
+
+class LagMonitor:
+    """Process-local cache of replica lags, refreshed every interval.
+
+    The thread finding a value expired checks the replica again, the
+    others keep using the previous value meanwhile.
+    """
+
+    def __init__(self, interval, check=replica_lag, clock=time.monotonic):
+        self.interval = interval
+        self.check = check
+        self.clock = clock
+        ## noqa NOTE: alias -> (lag or None, checked at).
+        self._lags = {}
+        self._lock = threading.Lock()
+
+    def lag(self, alias):
+        """Return the lag of a replica in seconds, None if unreachable."""
+        now = self.clock()
+        with self._lock:
+            entry = self._lags.get(alias)
+            if entry is not None and entry[1] + self.interval > now:
+                return entry[0]
+            ## noqa NOTE: Claim the check, keeping the previous value if any.
+            self._lags[alias] = (entry[0] if entry else None, now)
+        lag = self.check(alias)
+        with self._lock:
+            self._lags[alias] = (lag, self.clock())
+        return lag
+
+    def clear(self):
+        """Forget every lag checked."""
+        with self._lock:
+            self._lags.clear()
+
+
+lag_monitor = LagMonitor(settings.REPLICA_LAG_CHECK_INTERVAL)
+
+
+def choose_replica():
+    """Return a replica that is not lagging, or the default database."""
+    replicas = []
+    for alias in get_replicas():
+        lag = lag_monitor.lag(alias)
+        if lag is not None and lag <= settings.REPLICA_MAX_LAG:
+            replicas.append(alias)
+    return random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+
+
+class ReplicaRouter:
+    """Send the reads of ReplicaReadMixin views to the read replicas."""
+
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            ## noqa NOTE: None lets related objects load from their instance's
+            ## noqa   database, a transaction must see its own writes.
+            return None
+        return alias
+
+    def db_for_write(self, model, **hints):
+        ## noqa NOTE: Also for objects loaded from a replica.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in get_replicas():
+            return False
+        return None
+
+
+class ReplicaReadMixin:
+    """Serve safe requests from a read replica.
+
+    The replica is chosen once the user is authenticated and serves all
+    reads of the request. Unsafe requests pin their user to the default
+    database.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        token = _read_alias.set(None)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            _read_alias.reset(token)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if not get_replicas() or request.method not in SAFE_METHODS:
+            return
+        if is_pinned(request.user.pk):
+            _read_alias.set(DEFAULT_DB_ALIAS)
+        else:
+            _read_alias.set(choose_replica())
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        user = getattr(request, 'user', None)
+        if (
+            get_replicas()
+            and request.method not in SAFE_METHODS
+            and user is not None
+            and user.is_authenticated
+        ):
+            pin(user.pk)
+        return super().finalize_response(request, response, *args, **kwargs)
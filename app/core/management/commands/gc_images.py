@@ -0,0 +1,30 @@
+"""
+Django command to delete recipe images no recipe uses.
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from recipe import images
+
+
+class Command(BaseCommand):
+    """Django command to garbage collect recipe images."""
+    help = 'Delete stored recipe images that no recipe refers to.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace',
+            type=int,
+            default=3600,
+            help='Seconds an unused image is kept before it is deleted.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        removed = images.collect_garbage(timedelta(seconds=options['grace']))
+        for name in removed:
+            self.stdout.write(f'Deleted {name}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {len(removed)} unused image files.'
+        ))
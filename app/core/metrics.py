@@ -0,0 +1,214 @@
+"""
+Request metrics: wall time, database queries and time, serializer time
+and response size per route, plus hits and misses of the app caches.
+
+Measured by core.middleware.InstrumentationMiddleware while
+METRICS_ENABLED is on, and served in the Prometheus text format by
+core.views.metrics_view. With several worker processes,
+PROMETHEUS_MULTIPROC_DIR must name a directory they share (the image
+and app.gunicorn_conf set it up), where prometheus_client keeps the
+values of every process so that any worker serves the sum.
+"""
+import contextvars
+import os
+import time
+
+import prometheus_client
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from prometheus_client import multiprocess
+from rest_framework.fields import empty
+
+CONTENT_TYPE = prometheus_client.CONTENT_TYPE_LATEST
+
+## noqa NOTE: Timings of the request being served, None outside requests.
+_current = contextvars.ContextVar('request_timings', default=None)
+
+
+class Timings:
+    """Time spent by one request in the database and in serializers."""
+
+    __slots__ = ('db_queries', 'db_time', 'serializer_time', 'serializing')
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        ## noqa NOTE: Set while a serializer runs, nested ones are not counted.
+        self.serializing = False
+
+    def server_timing(self, total):
+        """Return a Server-Timing header value, total in seconds."""
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.1f};'
+            f'desc="{self.db_queries} queries"',
+            f'serializer;dur={self.serializer_time * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ])
+
+
+def start(timings):
+    """Record the timings of the current request in a Timings."""
+    return _current.set(timings)
+
+
+def stop(token):
+    """Stop recording the timings of the current request."""
+    _current.reset(token)
+
+
+def _time_query(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.db_queries += 1
+        timings.db_time += time.perf_counter() - started
+
+
+@receiver(connection_created)
+def time_queries(sender, connection, **kwargs):
+    """Time the queries of every connection, in any thread."""
+    if _time_query not in connection.execute_wrappers:
+        ## noqa NOTE: First, execute_wrapper() pops the last one on exit.
+        connection.execute_wrappers.insert(0, _time_query)
+
+
+class TimedSerializerMixin:
+    """Count the time a serializer validates and represents data."""
+
+    def _timed(self, timings, method, *args):
+        timings.serializing = True
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            timings.serializer_time += time.perf_counter() - started
+            timings.serializing = False
+
+    def to_representation(self, instance):
+        timings = _current.get()
+        if timings is None or timings.serializing:
+            return super().to_representation(instance)
+        return self._timed(timings, super().to_representation, instance)
+
+    def run_validation(self, data=empty):
+        timings = _current.get()
+        if timings is None or timings.serializing:
+            return super().run_validation(data)
+        return self._timed(timings, super().run_validation, data)
+
+
+## noqa NOTE: Own registry, the default one also holds process and GC metrics,
+## noqa   which are not aggregated across processes.
+REGISTRY = prometheus_client.CollectorRegistry()
+
+SECONDS_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+
+request_duration = prometheus_client.Histogram(
+    'http_request_duration_seconds',
+    'Wall time spent serving a request.',
+    ('route', 'method', 'status'),
+    buckets=SECONDS_BUCKETS,
+    registry=REGISTRY,
+)
+db_queries = prometheus_client.Histogram(
+    'http_request_db_queries',
+    'Database queries run by a request.',
+    ('route',),
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500),
+    registry=REGISTRY,
+)
+db_duration = prometheus_client.Histogram(
+    'http_request_db_duration_seconds',
+    'Time a request spent running database queries.',
+    ('route',),
+    buckets=SECONDS_BUCKETS,
+    registry=REGISTRY,
+)
+serializer_duration = prometheus_client.Histogram(
+    'http_request_serializer_duration_seconds',
+    'Time a request spent in serializers.',
+    ('route',),
+    buckets=SECONDS_BUCKETS,
+    registry=REGISTRY,
+)
+response_size = prometheus_client.Histogram(
+    'http_response_size_bytes',
+    'Size of a response body, streamed bodies excluded.',
+    ('route',),
+    buckets=tuple(4 ** exponent for exponent in range(4, 12)),
+    registry=REGISTRY,
+)
+
+REQUEST_METRICS = (
+    request_duration, db_queries, db_duration, serializer_duration,
+    response_size,
+)
+
+cache_requests = prometheus_client.Counter(
+    'app_cache_requests',
+    'Lookups in an app cache by result.',
+    ('cache', 'result'),
+    registry=REGISTRY,
+)
+
+## noqa NOTE: livesum adds up the workers alive, exited ones are dropped.
+cache_entries = prometheus_client.Gauge(
+    'app_cache_entries',
+    'Entries held by a process-local app cache.',
+    ('cache',),
+    multiprocess_mode='livesum',
+    registry=REGISTRY,
+)
+
+CACHE_METRICS = (cache_requests, cache_entries)
+
+
+def observe(route, method, status, total, timings, size=None):
+    """Record the metrics of a served request."""
+    request_duration.labels(route, method, str(status)).observe(total)
+    db_queries.labels(route).observe(timings.db_queries)
+    db_duration.labels(route).observe(timings.db_time)
+    serializer_duration.labels(route).observe(timings.serializer_time)
+    if size is not None:
+        response_size.labels(route).observe(size)
+
+
+def count_cache(cache, hit):
+    """Count a hit or miss of the named app cache."""
+    cache_requests.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def set_cache_entries(cache, count):
+    """Record the number of entries in the named app cache."""
+    cache_entries.labels(cache).set(count)
+
+
+def multiprocess_dir():
+    """Return the directory the worker processes share metrics in."""
+    return os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+
+
+def render():
+    """Return every metric in the Prometheus text format."""
+    path = multiprocess_dir()
+    if path:
+        ## noqa NOTE: Sums the files of every worker, including exited ones, so
+        ## noqa   the counters never go backwards.
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry, path)
+    else:
+        registry = REGISTRY
+    return prometheus_client.generate_latest(registry).decode('utf-8')
+
+
+def reset():
+    """Drop every metric recorded by this process."""
+    for metric in REQUEST_METRICS + CACHE_METRICS:
+        metric.clear()
@@ -0,0 +1,68 @@
+"""
+Middleware shared by the apps.
+"""
+import asyncio
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from core import metrics
+
+
+class InstrumentationMiddleware:
+    """Measure each request and report it in a Server-Timing header.
+
+    Records the metrics served by core.views.metrics_view, per route
+    (recipe:recipe-list, user:token...). Django drops the middleware
+    when METRICS_ENABLED is off, so it then costs nothing.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            ## noqa NOTE: As MiddlewareMixin, so Django awaits __call__ under
+            ## noqa   ASGI instead of running the chain in a single thread.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        timings = metrics.Timings()
+        token = metrics.start(timings)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.stop(token)
+        return self._record(request, response, timings, started)
+
+    async def __acall__(self, request):
+        timings = metrics.Timings()
+        token = metrics.start(timings)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.stop(token)
+        return self._record(request, response, timings, started)
+
+    def _record(self, request, response, timings, started):
+        """Record the metrics of a response and add its Server-Timing."""
+        total = time.perf_counter() - started
+        match = request.resolver_match
+        metrics.observe(
+            match.view_name if match else 'unmatched',
+            request.method,
+            response.status_code,
+            total,
+            timings,
+            None if response.streaming else len(response.content),
+        )
+        response['Server-Timing'] = timings.server_timing(total)
+        return response
@@ -0,0 +1,56 @@
+# Generated by Django 3.2.25 on 2026-10-18 20:38
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicates(apps, schema_editor):
+    """Merge tags/ingredients sharing a user and name into the oldest one.
+
+    Recipe links of the duplicates are moved to the kept row so the
+    unique constraints added in the next migration can be created.
+    """
+    Recipe = apps.get_model('core', 'Recipe')
+    for model_name, field in (('Tag', 'tags'), ('Ingredient', 'ingredients')):
+        model = apps.get_model('core', model_name)
+        through = getattr(Recipe, field).through
+        column = f'{model_name.lower()}_id'
+
+        groups = (
+            model.objects.values('user_id', 'name')
+            .annotate(keep_id=Min('id'), total=Count('id'))
+            .filter(total__gt=1)
+        )
+        for group in groups:
+            duplicate_ids = list(
+                model.objects.filter(
+                    user_id=group['user_id'],
+                    name=group['name'],
+                ).exclude(id=group['keep_id']).values_list('id', flat=True)
+            )
+            linked = set(
+                through.objects.filter(
+                    **{column: group['keep_id']}
+                ).values_list('recipe_id', flat=True)
+            )
+            moved = set(
+                through.objects.filter(
+                    **{f'{column}__in': duplicate_ids}
+                ).values_list('recipe_id', flat=True)
+            )
+            through.objects.bulk_create([
+                through(recipe_id=recipe_id, **{column: group['keep_id']})
+                for recipe_id in moved - linked
+            ])
+            model.objects.filter(id__in=duplicate_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_recipe_image'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+    ]
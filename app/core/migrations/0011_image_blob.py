@@ -0,0 +1,48 @@
+# Generated by Django 3.2.25 on 2026-10-18 20:58
+
+import core.models
+import core.storage
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_image_references(apps, schema_editor):
+    """Create a blob with its reference count for every stored image."""
+    Recipe = apps.get_model('core', 'Recipe')
+    ImageBlob = apps.get_model('core', 'ImageBlob')
+    counts = (
+        Recipe.objects.exclude(image__isnull=True).exclude(image='')
+        .values('image').annotate(total=Count('id')).order_by()
+    )
+    ImageBlob.objects.bulk_create(
+        ImageBlob(name=row['image'], ref_count=row['total'])
+        for row in counts.iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(null=True, storage=core.storage.ContentAddressedStorage(), upload_to=core.models.recipe_image_file_path),
+        ),
+        migrations.RunPython(
+            count_image_references,
+            migrations.RunPython.noop,
+        ),
+    ]
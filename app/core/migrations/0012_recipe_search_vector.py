@@ -0,0 +1,79 @@
+# Generated by Django 3.2.25 on 2026-10-18 21:04
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+SEARCH_INDEX = django.contrib.postgres.indexes.GinIndex(
+    fields=['search_vector'], name='recipe_search_vector_idx',
+)
+
+
+def add_search_index(apps, schema_editor):
+    """Create the GIN index, PostgreSQL only."""
+    if schema_editor.connection.vendor == 'postgresql':
+        Recipe = apps.get_model('core', 'Recipe')
+        schema_editor.add_index(Recipe, SEARCH_INDEX)
+
+
+def remove_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        Recipe = apps.get_model('core', 'Recipe')
+        schema_editor.remove_index(Recipe, SEARCH_INDEX)
+
+
+def fill_search_vectors(apps, schema_editor):
+    """Compute the search vector of the existing recipes (see recipe.search)."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Recipe = apps.get_model('core', 'Recipe')
+    config = settings.RECIPE_SEARCH_CONFIG
+
+    def linked_names(model_name):
+        model = apps.get_model('core', model_name)
+        names = (
+            model.objects.filter(recipe=OuterRef('pk')).order_by()
+            .values('recipe').annotate(names=StringAgg('name', ' '))
+            .values('names')
+        )
+        return Coalesce(Subquery(names), Value(''))
+
+    Recipe.objects.update(search_vector=(
+        SearchVector('title', weight='A', config=config)
+        + SearchVector('description', weight='B', config=config)
+        + SearchVector(
+            linked_names('Tag'),
+            linked_names('Ingredient'),
+            weight='C',
+            config=config,
+        )
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_image_blob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(model_name='recipe', index=SEARCH_INDEX),
+            ],
+            database_operations=[
+                migrations.RunPython(add_search_index, remove_search_index),
+            ],
+        ),
+        migrations.RunPython(fill_search_vectors, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 3.2.25 on 2026-10-18 21:14
+
+from django.db import migrations, models
+from django.db.models.functions import Collate, Lower
+
+PREFIX_INDEXES = {
+    'tag': models.Index(
+        'user', Collate(Lower('name'), 'C'), name='tag_name_prefix_idx',
+    ),
+    'ingredient': models.Index(
+        'user', Collate(Lower('name'), 'C'), name='ingredient_name_prefix_idx',
+    ),
+}
+
+
+def add_prefix_indexes(apps, schema_editor):
+    """Create the name prefix indexes, PostgreSQL only."""
+    if schema_editor.connection.vendor == 'postgresql':
+        for model_name, index in PREFIX_INDEXES.items():
+            model = apps.get_model('core', model_name)
+            schema_editor.add_index(model, index)
+
+
+def remove_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for model_name, index in PREFIX_INDEXES.items():
+            model = apps.get_model('core', model_name)
+            schema_editor.remove_index(model, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_recipe_time_price_indexes'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(model_name=model_name, index=index)
+                for model_name, index in PREFIX_INDEXES.items()
+            ],
+            database_operations=[
+                migrations.RunPython(add_prefix_indexes, remove_prefix_indexes),
+            ],
+        ),
+    ]
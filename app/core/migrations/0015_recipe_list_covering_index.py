@@ -0,0 +1,21 @@
+# Generated by Django 3.2.25 on 2026-10-18 21:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_tag_ingredient_name_prefix_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='recipe',
+            name='recipe_user_id_desc_idx',
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['user', '-id'], include=('title',), name='recipe_user_id_desc_idx'),
+        ),
+    ]
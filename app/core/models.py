@@ -5,13 +5,18 @@ import uuid
 import os
 
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models.functions import Collate, Lower
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
     PermissionsMixin,
 )
 
+from core.storage import image_storage
+
 
 def recipe_image_file_path(instance, filename):
     """Generate file path for new recipe image."""
@@ -58,6 +63,14 @@ class User(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = "email"
 
 
+class RecipeManager(models.Manager):
+    """Manager for recipes."""
+
+    def get_queryset(self):
+        ## noqa NOTE: Saving a loaded recipe would write its stale vector back.
+        return super().get_queryset().defer('search_vector')
+
+
 class Recipe(models.Model):
     """Recipe objects."""
     user = models.ForeignKey(
@@ -71,12 +84,59 @@ class Recipe(models.Model):
     link = models.CharField(max_length=255, blank=True)
     tags = models.ManyToManyField('Tag')
     ingredients = models.ManyToManyField('Ingredient')
-    image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    image = models.ImageField(
+        null=True,
+        upload_to=recipe_image_file_path,
+        storage=image_storage,
+    )
+    ## noqa NOTE: Variant name -> storage path of the resized copies of image.
+    image_variants = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    ## noqa NOTE: Weighted title/description/tag/ingredient words, filled by
+    ## noqa   recipe.search on PostgreSQL and never loaded (see RecipeManager).
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = RecipeManager()
+
+    class Meta:
+        ## noqa NOTE: Serves the per-user list ordered by -id, the title is
+        ## noqa   included so a titles only list is an index-only scan.
+        indexes = [
+            models.Index(
+                fields=['user', '-id'],
+                include=['title'],
+                name='recipe_user_id_desc_idx',
+            ),
+            ## noqa NOTE: Serve the range filters and orderings on time/price,
+            ## noqa   id included for the keyset pagination tiebreak.
+            models.Index(
+                fields=['user', 'time_minutes', 'id'],
+                name='recipe_user_time_idx',
+            ),
+            models.Index(
+                fields=['user', 'price', 'id'],
+                name='recipe_user_price_idx',
+            ),
+            GinIndex(
+                fields=['search_vector'],
+                name='recipe_search_vector_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
 
+class ImageBlob(models.Model):
+    """A stored recipe image and the number of recipes using it."""
+    name = models.CharField(max_length=255, unique=True)
+    ref_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
+
+
 class Tag(models.Model):
     """Tag for filtering recipes."""
     name = models.CharField(max_length=255)
@@ -84,6 +144,24 @@ class Tag(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
     )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ## noqa NOTE: The unique index on (user_id, name) also serves lookups by name.
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='unique_tag_name_per_user',
+            ),
+        ]
+        ## noqa NOTE: Prefix autocomplete (recipe.autocomplete), PostgreSQL only.
+        indexes = [
+            models.Index(
+                'user',
+                Collate(Lower('name'), 'C'),
+                name='tag_name_prefix_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -96,6 +174,23 @@ class Ingredient(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='unique_ingredient_name_per_user',
+            ),
+        ]
+        ## noqa NOTE: Prefix autocomplete (recipe.autocomplete), PostgreSQL only.
+        indexes = [
+            models.Index(
+                'user',
+                Collate(Lower('name'), 'C'),
+                name='ingredient_name_prefix_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -0,0 +1,61 @@
+"""
+Content addressed file storage.
+"""
+import hashlib
+import os
+import re
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+## noqa NOTE: <2 hex>/<64 hex digest>[_<variant>].<ext>, see content_name.
+CONTENT_NAME_RE = re.compile(
+    r'(?:^|/)(?P<prefix>[0-9a-f]{2})/(?P=prefix)[0-9a-f]{62}'
+    r'(?:_\w+)?(?:\.\w+)?$'
+)
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """File system storage naming files after the SHA-256 of their content.
+
+    Saving content that is already stored returns the existing name, so
+    each distinct file is written once. Only the directory of the
+    requested name and its extension are kept.
+    """
+
+    def content_name(self, name, content, max_length=None):
+        """Return the storage name of some content."""
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        hexdigest = digest.hexdigest()
+        dir_name, file_name = os.path.split(name)
+        ext = os.path.splitext(file_name)[1].lower()
+        name = os.path.join(dir_name, hexdigest[:2], hexdigest + ext)
+        if max_length is not None and len(name) > max_length:
+            name = os.path.splitext(name)[0]
+        return name
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.content_name(name, content, max_length)
+        if self.exists(name):
+            ## noqa NOTE: Touch it, the grace period of gc_images counts from here.
+            os.utime(self.path(name))
+            return name
+        saved_name = self._save(name, content)
+        if saved_name != name:
+            ## noqa NOTE: A concurrent save of the same content got there first.
+            self.delete(saved_name)
+        return name
+
+    @staticmethod
+    def is_content_name(name):
+        """Return whether a name, or a variant of it, is a content hash."""
+        return CONTENT_NAME_RE.search(name) is not None
+
+
+image_storage = ContentAddressedStorage()
@@ -0,0 +1,186 @@
+"""
+Tests for the async view adapter.
+"""
+import asyncio
+import threading
+import time
+from decimal import Decimal
+
+from asgiref.sync import async_to_sync
+
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import SimpleTestCase, TransactionTestCase
+from django.test import override_settings
+from rest_framework import status
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core.asyncviews import StreamingASGIHandler, async_view
+from core.models import Recipe
+from recipe.views import RecipeViewSet
+from user.views import ManageUserView
+
+
+def thread_name_view(request):
+    """Return the name of the thread serving the request."""
+    return HttpResponse(threading.current_thread().name)
+
+
+class AsyncViewTests(SimpleTestCase):
+    """Test running sync views from coroutines."""
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+
+    def test_runs_in_worker_pool(self):
+        """Test the view is a coroutine served by a worker thread."""
+        view = async_view(thread_name_view)
+
+        self.assertTrue(asyncio.iscoroutinefunction(view))
+        res = async_to_sync(view)(self.factory.get('/'))
+
+        self.assertTrue(res.content.startswith(b'async-view'))
+
+    def test_requests_served_concurrently(self):
+        """Test blocked requests do not wait for one another."""
+        def slow_view(request):
+            time.sleep(0.2)
+            return HttpResponse()
+        view = async_view(slow_view)
+
+        async def serve_all():
+            return await asyncio.gather(*[
+                view(self.factory.get('/')) for _ in range(5)
+            ])
+
+        start = time.monotonic()
+        responses = async_to_sync(serve_all)()
+
+        self.assertEqual(len(responses), 5)
+        self.assertLess(time.monotonic() - start, 0.6)
+
+    def test_mixin_switched_by_setting(self):
+        """Test views are only wrapped when ASYNC_VIEWS is on."""
+        with override_settings(ASYNC_VIEWS=True):
+            view = ManageUserView.as_view()
+        self.assertTrue(asyncio.iscoroutinefunction(view))
+        self.assertIs(view.cls, ManageUserView)
+
+        with override_settings(ASYNC_VIEWS=False):
+            view = ManageUserView.as_view()
+        self.assertFalse(asyncio.iscoroutinefunction(view))
+
+
+class StreamingASGIHandlerTests(SimpleTestCase):
+    """Test sending streaming bodies under ASGI."""
+
+    def setUp(self):
+        self.handler = StreamingASGIHandler()
+        self.messages = []
+
+    async def send(self, message):
+        self.messages.append(message)
+
+    def test_parts_sent_as_produced(self):
+        """Test each part is sent before the next one is produced."""
+        first_sent = threading.Event()
+        producers = []
+
+        async def send(message):
+            self.messages.append(message)
+            if message.get('body'):
+                first_sent.set()
+
+        def parts():
+            producers.append(threading.current_thread().name)
+            yield 'line 0\n'
+            producers.append(first_sent.wait(5))
+            yield 'line 1\n'
+
+        response = StreamingHttpResponse(parts())
+        async_to_sync(self.handler.send_response)(response, send)
+
+        self.assertTrue(producers[0].startswith('async-view'))
+        self.assertIs(producers[1], True)
+        self.assertEqual(self.messages[0]['type'], 'http.response.start')
+        self.assertEqual(
+            [message.get('body') for message in self.messages[1:]],
+            [b'line 0\n', b'line 1\n', None],
+        )
+        self.assertFalse(self.messages[-1].get('more_body', False))
+
+    def test_body_error_raised(self):
+        """Test an error producing the body reaches the handler."""
+        def parts():
+            yield 'line 0\n'
+            raise ValueError('broken')
+
+        response = StreamingHttpResponse(parts())
+        with self.assertRaises(ValueError):
+            async_to_sync(self.handler.send_response)(response, self.send)
+
+    def test_producer_stopped_when_send_fails(self):
+        """Test the body is no longer produced once sending fails."""
+        produced = []
+
+        def parts():
+            for i in range(100):
+                produced.append(i)
+                yield f'line {i}\n'
+
+        async def send(message):
+            if message.get('body'):
+                raise OSError('disconnected')
+
+        response = StreamingHttpResponse(parts())
+        with self.assertRaises(OSError):
+            async_to_sync(self.handler.send_response)(response, send)
+
+        self.assertLess(len(produced), 100)
+
+
+class AsyncApiViewTests(TransactionTestCase):
+    """Test API views served from the worker pool."""
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+
+    def test_recipe_list(self):
+        """Test the recipe list reads the database from a worker."""
+        recipe = Recipe.objects.create(
+            user=self.user,
+            title='Curry',
+            time_minutes=10,
+            price=Decimal('5.00'),
+        )
+        with override_settings(ASYNC_VIEWS=True):
+            view = RecipeViewSet.as_view({'get': 'list'}, basename='recipe')
+        request = self.factory.get('/api/recipe/recipes/')
+        force_authenticate(request, self.user)
+
+        res = async_to_sync(view)(request)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.is_rendered)
+        self.assertEqual([item['id'] for item in res.data], [recipe.id])
+
+    def test_streamed_body_reads_database(self):
+        """Test a streaming body may query the database under ASGI."""
+        def parts():
+            yield f'{Recipe.objects.count()}\n'
+
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        handler = StreamingASGIHandler()
+        async_to_sync(handler.send_response)(
+            StreamingHttpResponse(parts()), send,
+        )
+
+        self.assertEqual(messages[1]['body'], b'0\n')
@@ -2,6 +2,8 @@
 Test custom Django management commands.
 """
 
+from datetime import timedelta
+from io import StringIO
 from unittest.mock import patch
 
 from psycopg2 import OperationalError as Psycopg2Error
@@ -51,3 +53,26 @@ class CommandTests(SimpleTestCase):
         self.assertEqual(patched_check.call_count, 6)
         ## noqa NOTE:Same as the 'assert_called_once_with' in the above function but this will be called multiple times.
         patched_check.assert_called_with(databases=['default'])
+
+
+@patch('recipe.images.collect_garbage')
+class GcImagesCommandTests(SimpleTestCase):
+    """Test the gc_images command."""
+
+    def test_gc_images_default_grace(self, patched_collect):
+        """Test unused images are collected after an hour by default."""
+        patched_collect.return_value = ['uploads/recipe/ab/old.jpg']
+        out = StringIO()
+
+        call_command('gc_images', stdout=out)
+
+        patched_collect.assert_called_once_with(timedelta(hours=1))
+        self.assertIn('Deleted 1 unused image files.', out.getvalue())
+
+    def test_gc_images_grace(self, patched_collect):
+        """Test the grace period can be set in seconds."""
+        patched_collect.return_value = []
+
+        call_command('gc_images', grace=0, stdout=StringIO())
+
+        patched_collect.assert_called_once_with(timedelta(0))
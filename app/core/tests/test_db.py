@@ -0,0 +1,197 @@
+"""
+Tests for the database backend and its connection pool.
+"""
+import threading
+
+from psycopg2 import extensions
+
+from django.db import connection
+from django.test import SimpleTestCase
+
+from core.db.base import DatabaseWrapper
+from core.db.pool import ConnectionPool, PoolTimeout
+
+
+class FakeClock:
+    """A clock that only moves when told to."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeCursor:
+    """Stand-in for a psycopg2 cursor."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def execute(self, sql):
+        if self.conn.dead:
+            raise extensions.QueryCanceledError('server closed')
+
+
+class FakeConnection:
+    """Stand-in for a psycopg2 connection."""
+
+    def __init__(self):
+        self.closed = 0
+        self.status = extensions.STATUS_READY
+        self.dead = False
+        self.rolled_back = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        self.rolled_back = True
+        self.status = extensions.STATUS_READY
+
+    def close(self):
+        self.closed = 1
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """Test the process-local connection pool."""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.opened = []
+
+    def connect(self):
+        conn = FakeConnection()
+        self.opened.append(conn)
+        return conn
+
+    def make_pool(self, **options):
+        options.setdefault('size', 2)
+        return ConnectionPool(clock=self.clock, **options)
+
+    def test_released_connection_reused(self):
+        """Test a released connection is handed out again."""
+        pool = self.make_pool()
+        conn = pool.acquire(self.connect)
+        pool.release(conn)
+
+        self.assertIs(pool.acquire(self.connect), conn)
+        self.assertEqual(len(self.opened), 1)
+
+    def test_overflow_closed_on_release(self):
+        """Test connections beyond the size are closed once released."""
+        pool = self.make_pool(size=1, max_overflow=1)
+        first = pool.acquire(self.connect)
+        second = pool.acquire(self.connect)
+
+        pool.release(first)
+        pool.release(second)
+
+        self.assertFalse(first.closed)
+        self.assertTrue(second.closed)
+        self.assertEqual(pool.stats(), {'open': 1, 'idle': 1})
+
+    def test_timeout_when_exhausted(self):
+        """Test checking out fails once every slot stays taken."""
+        pool = self.make_pool(size=1, timeout=0)
+        pool.acquire(self.connect)
+
+        with self.assertRaises(PoolTimeout):
+            pool.acquire(self.connect)
+
+    def test_waits_for_release(self):
+        """Test a waiting checkout gets the next released connection."""
+        pool = ConnectionPool(size=1, timeout=5)
+        conn = pool.acquire(self.connect)
+        threading.Timer(0.05, pool.release, [conn]).start()
+
+        self.assertIs(pool.acquire(self.connect), conn)
+
+    def test_idle_connections_reaped(self):
+        """Test connections idle past the idle timeout are closed."""
+        pool = self.make_pool(idle_timeout=60)
+        conn = pool.acquire(self.connect)
+        pool.release(conn)
+        self.clock.now = 61
+
+        fresh = pool.acquire(self.connect)
+
+        self.assertTrue(conn.closed)
+        self.assertIsNot(fresh, conn)
+        self.assertEqual(pool.stats(), {'open': 1, 'idle': 0})
+
+    def test_pre_ping_replaces_dead_connection(self):
+        """Test a connection the server dropped is not handed out."""
+        pool = self.make_pool()
+        conn = pool.acquire(self.connect)
+        pool.release(conn)
+        conn.dead = True
+
+        fresh = pool.acquire(self.connect)
+
+        self.assertIsNot(fresh, conn)
+        self.assertTrue(conn.closed)
+        self.assertEqual(pool.stats(), {'open': 1, 'idle': 0})
+
+    def test_open_transaction_rolled_back(self):
+        """Test a connection released mid-transaction is rolled back."""
+        pool = self.make_pool()
+        conn = pool.acquire(self.connect)
+        conn.status = extensions.STATUS_IN_TRANSACTION
+
+        pool.release(conn)
+
+        self.assertTrue(conn.rolled_back)
+        self.assertEqual(pool.stats(), {'open': 1, 'idle': 1})
+
+
+class DatabaseWrapperTests(SimpleTestCase):
+    """Test pooling and health checks against PostgreSQL."""
+
+    def setUp(self):
+        if connection.vendor != 'postgresql':
+            self.skipTest('Needs PostgreSQL.')
+
+    def make_wrapper(self, **settings):
+        wrapper = DatabaseWrapper(
+            {**connection.settings_dict, **settings}, alias='pool-test',
+        )
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def backend_pid(self, wrapper):
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT pg_backend_pid()')
+            return cursor.fetchone()[0]
+
+    def test_pooled_connection_reused(self):
+        """Test a closed wrapper's connection serves the next one."""
+        first = self.make_wrapper(POOL={'SIZE': 1})
+        pid = self.backend_pid(first)
+        first.close()
+        self.addCleanup(first.pool.close)
+
+        second = self.make_wrapper(POOL={'SIZE': 1})
+
+        self.assertEqual(self.backend_pid(second), pid)
+        self.assertIs(second.pool, first.pool)
+
+    def test_health_check_reconnects(self):
+        """Test a persistent connection killed by the server is replaced."""
+        wrapper = self.make_wrapper(
+            CONN_MAX_AGE=None, CONN_HEALTH_CHECKS=True,
+        )
+        pid = self.backend_pid(wrapper)
+        with self.make_wrapper().cursor() as cursor:
+            cursor.execute('SELECT pg_terminate_backend(%s)', [pid])
+
+        ## noqa NOTE: As at the start of the next request.
+        wrapper.close_if_unusable_or_obsolete()
+
+        self.assertNotEqual(self.backend_pid(wrapper), pid)
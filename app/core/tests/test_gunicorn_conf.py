@@ -0,0 +1,107 @@
+"""
+Tests for the gunicorn configuration.
+"""
+import importlib
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, override_settings
+
+from app import gunicorn_conf
+
+
+class GunicornConfTests(SimpleTestCase):
+    """Test the gunicorn settings derived from the environment."""
+
+    def load(self, **environ):
+        """Return the config module loaded with extra environment."""
+        with patch.dict(os.environ, environ):
+            self.addCleanup(importlib.reload, gunicorn_conf)
+            return importlib.reload(gunicorn_conf)
+
+    def test_workers_derived_from_cpus(self):
+        """Test the default worker count is two per CPU plus one."""
+        self.assertEqual(gunicorn_conf.default_workers(1), 3)
+        self.assertEqual(gunicorn_conf.default_workers(4), 9)
+
+    def test_defaults(self):
+        """Test the app is preloaded and served by threaded workers."""
+        conf = self.load()
+
+        self.assertEqual(
+            conf.workers, gunicorn_conf.default_workers(conf.cpu_count()),
+        )
+        self.assertEqual(conf.worker_class, 'gthread')
+        self.assertTrue(conf.preload_app)
+        self.assertGreater(conf.max_requests, 0)
+
+    def test_environment_overrides(self):
+        """Test settings are overridden from the environment."""
+        conf = self.load(
+            GUNICORN_WORKERS='2',
+            GUNICORN_THREADS='1',
+            GUNICORN_PRELOAD='0',
+            GUNICORN_ACCESS_LOG='',
+        )
+
+        self.assertEqual(conf.workers, 2)
+        self.assertEqual(conf.worker_class, 'sync')
+        self.assertFalse(conf.preload_app)
+        self.assertIsNone(conf.accesslog)
+
+    @override_settings(CACHES={
+        'coordination': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+    })
+    def test_workers_refuse_per_process_cache(self):
+        """Test several workers need a coordination cache they share."""
+        gunicorn_conf.check_shared_cache(1)
+
+        with self.assertRaises(RuntimeError):
+            gunicorn_conf.check_shared_cache(2)
+
+    @override_settings(CACHES={
+        'coordination': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': '/tmp/coordination-cache',
+        },
+    })
+    def test_workers_refuse_non_atomic_cache(self):
+        """Test several workers need a cache with an atomic incr."""
+        with self.assertRaises(RuntimeError):
+            gunicorn_conf.check_shared_cache(2)
+
+    @override_settings(CACHES={
+        'coordination': {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': 'memcached:11211',
+        },
+    })
+    def test_workers_share_memcached(self):
+        """Test several workers start with memcached."""
+        gunicorn_conf.check_shared_cache(3)
+
+    @override_settings(METRICS_ENABLED=True)
+    def test_workers_need_metrics_dir(self):
+        """Test several workers need a directory to share metrics in."""
+        with patch.dict(os.environ):
+            os.environ.pop('PROMETHEUS_MULTIPROC_DIR', None)
+            gunicorn_conf.prepare_metrics_dir(1)
+
+            with self.assertRaises(RuntimeError):
+                gunicorn_conf.prepare_metrics_dir(2)
+
+    def test_metrics_dir_emptied(self):
+        """Test metrics left by a previous run are dropped."""
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        with open(os.path.join(path, 'histogram_1.db'), 'wb'):
+            pass
+
+        with patch.dict(os.environ, {'PROMETHEUS_MULTIPROC_DIR': path}):
+            gunicorn_conf.prepare_metrics_dir(3)
+
+        self.assertEqual(os.listdir(path), [])
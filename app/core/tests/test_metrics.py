@@ -0,0 +1,183 @@
+"""
+Tests for the request instrumentation.
+"""
+import asyncio
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient, APIRequestFactory
+
+from core import metrics
+from core.asyncviews import async_view
+from core.middleware import InstrumentationMiddleware
+from core.models import Recipe
+
+METRICS_URL = reverse('metrics')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+class MultiprocessTests(SimpleTestCase):
+    """Test summing the metrics of several worker processes."""
+
+    def observe_in_process(self, path, seconds):
+        """Record a request in a separate process sharing path."""
+        subprocess.run(
+            [
+                sys.executable, '-c',
+                'import django; django.setup(); '
+                'from core import metrics; '
+                f'metrics.observe("r", "GET", 200, {seconds}, '
+                'metrics.Timings())',
+            ],
+            check=True,
+            cwd=settings.BASE_DIR,
+            env={**os.environ, 'PROMETHEUS_MULTIPROC_DIR': path},
+        )
+
+    def test_render_sums_processes(self):
+        """Test every process' requests are served by any of them."""
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        self.observe_in_process(path, 0.05)
+        self.observe_in_process(path, 0.5)
+
+        with patch.dict(os.environ, {'PROMETHEUS_MULTIPROC_DIR': path}):
+            body = metrics.render()
+
+        self.assertIn(
+            'http_request_duration_seconds_bucket'
+            '{le="0.1",method="GET",route="r",status="200"} 1.0',
+            body,
+        )
+        self.assertIn(
+            'http_request_duration_seconds_count'
+            '{method="GET",route="r",status="200"} 2.0',
+            body,
+        )
+
+
+@override_settings(METRICS_ENABLED=True, METRICS_TOKEN='secret')
+class InstrumentationTests(TestCase):
+    """Test measuring requests."""
+
+    def setUp(self):
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123',
+        )
+        Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5, price='2.00',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_server_timing_header(self):
+        """Test responses report database and serializer time."""
+        res = self.client.get(RECIPES_URL)
+
+        timing = res['Server-Timing']
+        queries = int(re.search(r'desc="(\d+) queries"', timing).group(1))
+        self.assertGreater(queries, 0)
+        self.assertRegex(timing, r'serializer;dur=[\d.]+')
+        self.assertRegex(timing, r'total;dur=[\d.]+')
+
+    def test_metrics_per_route(self):
+        """Test the metrics endpoint reports requests by route name."""
+        self.client.get(RECIPES_URL)
+
+        res = self.client.get(
+            METRICS_URL, HTTP_AUTHORIZATION='Bearer secret',
+        )
+
+        self.assertEqual(res['Content-Type'], metrics.CONTENT_TYPE)
+        body = res.content.decode()
+        self.assertIn(
+            'http_request_duration_seconds_count{method="GET",'
+            'route="recipe:recipe-list",status="200"} 1.0',
+            body,
+        )
+        self.assertIn(
+            'http_request_db_queries_count{route="recipe:recipe-list"} 1.0',
+            body,
+        )
+        self.assertIn(
+            'http_response_size_bytes_count{route="recipe:recipe-list"} 1.0',
+            body,
+        )
+
+    def test_metrics_token_required(self):
+        """Test the metrics need the configured token."""
+        res = self.client.get(METRICS_URL)
+        self.assertEqual(res.status_code, 403)
+
+        res = self.client.get(
+            METRICS_URL, HTTP_AUTHORIZATION='Bearer secret',
+        )
+        self.assertEqual(res.status_code, 200)
+
+    @override_settings(METRICS_TOKEN='')
+    def test_metrics_refused_without_token(self):
+        """Test the metrics are not served when no token is configured."""
+        res = self.client.get(METRICS_URL, HTTP_AUTHORIZATION='Bearer ')
+
+        self.assertEqual(res.status_code, 403)
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_disabled(self):
+        """Test nothing is measured or served when disabled."""
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        res = client.get(RECIPES_URL)
+
+        self.assertNotIn('Server-Timing', res)
+        self.assertEqual(client.get(METRICS_URL).status_code, 404)
+        self.assertNotIn('recipe:recipe-list', metrics.render())
+
+
+@override_settings(METRICS_ENABLED=True)
+class AsyncInstrumentationTests(SimpleTestCase):
+    """Test measuring requests served under ASGI."""
+
+    def setUp(self):
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+
+    def test_requests_served_concurrently(self):
+        """Test the middleware awaits async views instead of blocking."""
+        def slow_view(request):
+            time.sleep(0.2)
+            return HttpResponse()
+        middleware = InstrumentationMiddleware(async_view(slow_view))
+        factory = APIRequestFactory()
+
+        async def serve_all():
+            return await asyncio.gather(*[
+                middleware(factory.get('/')) for _ in range(4)
+            ])
+
+        start = time.monotonic()
+        responses = async_to_sync(serve_all)()
+
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        self.assertLess(time.monotonic() - start, 0.6)
+        self.assertTrue(all('Server-Timing' in res for res in responses))
+        self.assertIn(
+            'http_request_duration_seconds_count{method="GET",'
+            'route="unmatched",status="200"} 4.0',
+            metrics.render(),
+        )
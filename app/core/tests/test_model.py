@@ -4,6 +4,7 @@ Test for models
 from unittest.mock import patch
 from decimal import Decimal
 
+from django.db import IntegrityError
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 
@@ -78,6 +79,21 @@ class ModelTests(TestCase):
 
         self.assertEqual(str(recipe), recipe.title)
 
+    def test_recipe_updated_at_changes_on_save(self):
+        """Test saving a recipe refreshes updated_at."""
+        recipe = models.Recipe.objects.create(
+            user=create_user(),
+            title='Simple recipe name',
+            time_minutes=5,
+            price=Decimal('5.58'),
+        )
+        first = recipe.updated_at
+
+        recipe.title = 'New name'
+        recipe.save()
+
+        self.assertGreater(recipe.updated_at, first)
+
     def test_create_tag(self):
         """Test creating a tag is succesfull."""
         user = create_user()
@@ -85,6 +101,16 @@ class ModelTests(TestCase):
 
         self.assertEqual(str(tag), tag.name)
 
+    def test_tag_name_unique_per_user(self):
+        """Test a user cannot have two tags with the same name."""
+        user = create_user()
+        other_user = create_user(email='other@example.com')
+        models.Tag.objects.create(user=user, name='Tag1')
+        models.Tag.objects.create(user=other_user, name='Tag1')
+
+        with self.assertRaises(IntegrityError):
+            models.Tag.objects.create(user=user, name='Tag1')
+
     def test_create_ingredient(self):
         """Test creating an ingredient is successful."""
         user = create_user()
@@ -95,6 +121,14 @@ class ModelTests(TestCase):
 
         self.assertEqual(str(ingredient), ingredient.name)
 
+    def test_ingredient_name_unique_per_user(self):
+        """Test a user cannot have two ingredients with the same name."""
+        user = create_user()
+        models.Ingredient.objects.create(user=user, name='Salt')
+
+        with self.assertRaises(IntegrityError):
+            models.Ingredient.objects.create(user=user, name='Salt')
+
     ## noqa NOTE: the decorator mocks the behaviour of the built in uuid function.
     @patch('core.models.uuid.uuid4')
     def test_recipe_file_name_uuid(self, mock_uuid):
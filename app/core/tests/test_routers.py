@@ -0,0 +1,169 @@
+"""
+Tests for the read replica router.
+"""
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework.views import APIView
+
+from core.db import routers
+from core.models import Recipe
+
+
+class ReadAliasView(routers.ReplicaReadMixin, APIView):
+    """Return the database the request reads from."""
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        return Response({'alias': routers.ReplicaRouter().db_for_read(Recipe)})
+
+    def post(self, request):
+        return Response({'alias': routers.ReplicaRouter().db_for_read(Recipe)})
+
+
+class FakeClock:
+    """A clock that only moves when told to."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(SimpleTestCase):
+    """Test which database the reads of a request go to."""
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.view = ReadAliasView.as_view()
+        self.user = get_user_model()(id=1, email='user@example.com')
+        self.lags = {'replica': 0.0}
+        routers.lag_monitor.clear()
+        patcher = patch.object(
+            routers.lag_monitor, 'check', side_effect=self.lags.get,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(routers.lag_monitor.clear)
+        self.addCleanup(caches['coordination'].clear)
+
+    def request(self, method, user=None):
+        request = getattr(self.factory, method)('/')
+        force_authenticate(request, user or self.user)
+        return self.view(request).data['alias']
+
+    def test_safe_request_reads_replica(self):
+        """Test GET requests read from the replica."""
+        self.assertEqual(self.request('get'), 'replica')
+
+    def test_unsafe_request_reads_default(self):
+        """Test reads of a write request use the default database."""
+        self.assertIsNone(self.request('post'))
+
+    def test_reads_default_outside_requests(self):
+        """Test reads outside a request use the default database."""
+        self.request('get')
+
+        self.assertIsNone(routers.ReplicaRouter().db_for_read(Recipe))
+
+    def test_writer_pinned_to_default(self):
+        """Test a user who wrote reads from the default database."""
+        other = get_user_model()(id=2, email='other@example.com')
+        self.request('post')
+
+        self.assertEqual(self.request('get'), 'default')
+        self.assertEqual(self.request('get', other), 'replica')
+
+    def test_lagging_replica_skipped(self):
+        """Test a replica behind by more than the max lag is not used."""
+        self.lags['replica'] = 60.0
+
+        self.assertEqual(self.request('get'), 'default')
+
+    def test_unreachable_replica_skipped(self):
+        """Test a replica that cannot be reached is not used."""
+        self.lags['replica'] = None
+
+        self.assertEqual(self.request('get'), 'default')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas(self):
+        """Test reads use the default database without replicas."""
+        self.assertIsNone(self.request('get'))
+
+    def test_writes_go_to_default(self):
+        """Test writes and migrations never use a replica."""
+        router = routers.ReplicaRouter()
+
+        self.assertEqual(router.db_for_write(Recipe), 'default')
+        self.assertFalse(router.allow_migrate('replica', 'core'))
+        self.assertIsNone(router.allow_migrate('default', 'core'))
+
+
+class LagMonitorTests(SimpleTestCase):
+    """Test the cache of replica lags."""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.checks = []
+
+    def check(self, alias):
+        self.checks.append(alias)
+        return 0.5
+
+    def test_lag_checked_once_per_interval(self):
+        """Test a replica is checked again only after the interval."""
+        monitor = routers.LagMonitor(1.0, check=self.check, clock=self.clock)
+
+        self.assertEqual(monitor.lag('replica'), 0.5)
+        monitor.lag('replica')
+        self.clock.now = 1.0
+        monitor.lag('replica')
+
+        self.assertEqual(self.checks, ['replica', 'replica'])
+
+
+class ReplicaLagTests(TestCase):
+    """Test measuring the lag of a database."""
+
+    def test_primary_not_lagging(self):
+        """Test a database that is not a standby has no lag."""
+        self.assertEqual(routers.replica_lag('default'), 0.0)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class PinOnCommitTests(TestCase):
+    """Test users are pinned when their writes commit."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123',
+        )
+        caches['coordination'].clear()
+        self.addCleanup(caches['coordination'].clear)
+
+    def test_write_pins_on_commit(self):
+        """Test a recipe write pins its user once committed."""
+        with self.captureOnCommitCallbacks(execute=True):
+            Recipe.objects.create(
+                user=self.user, title='Soup', time_minutes=5, price='2.00',
+            )
+            self.assertFalse(routers.is_pinned(self.user.pk))
+
+        self.assertTrue(routers.is_pinned(self.user.pk))
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_pin_without_replicas(self):
+        """Test nothing is pinned without replicas."""
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            routers.pin_on_commit(self.user.pk)
+
+        self.assertEqual(callbacks, [])
@@ -0,0 +1,81 @@
+"""
+Tests for the content addressed storage.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.test import RequestFactory, SimpleTestCase
+
+from core.storage import ContentAddressedStorage
+from core.views import IMMUTABLE_MAX_AGE, serve_media
+
+
+class ContentAddressedStorageTests(SimpleTestCase):
+    """Test storing files under the hash of their content."""
+
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.location)
+        self.storage = ContentAddressedStorage(location=self.location)
+
+    def test_name_is_content_hash(self):
+        """Test files are named after their SHA-256."""
+        digest = hashlib.sha256(b'content').hexdigest()
+
+        name = self.storage.save('uploads/image.JPG', ContentFile(b'content'))
+
+        self.assertEqual(name, f'uploads/{digest[:2]}/{digest}.jpg')
+        with self.storage.open(name) as stored:
+            self.assertEqual(stored.read(), b'content')
+
+    def test_same_content_stored_once(self):
+        """Test saving the same content twice returns the same name."""
+        first = self.storage.save('uploads/a.jpg', ContentFile(b'same'))
+        second = self.storage.save('uploads/b.jpg', ContentFile(b'same'))
+        other = self.storage.save('uploads/c.jpg', ContentFile(b'other'))
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertEqual(
+            self.storage.listdir(os.path.dirname(first))[1],
+            [os.path.basename(first)],
+        )
+
+    def test_is_content_name(self):
+        """Test telling content addressed names from others."""
+        digest = hashlib.sha256(b'content').hexdigest()
+        path = f'uploads/recipe/{digest[:2]}/{digest}'
+
+        self.assertTrue(ContentAddressedStorage.is_content_name(
+            f'{path}.jpg'
+        ))
+        self.assertTrue(ContentAddressedStorage.is_content_name(
+            f'{path}_thumbnail.webp'
+        ))
+        self.assertFalse(ContentAddressedStorage.is_content_name(
+            f'uploads/recipe/00/{digest}.jpg'
+        ))
+        self.assertFalse(ContentAddressedStorage.is_content_name(
+            'uploads/recipe/test-uuid.jpg'
+        ))
+
+    def test_serve_media_cache_headers(self):
+        """Test content addressed media is served as immutable."""
+        name = self.storage.save('uploads/a.jpg', ContentFile(b'content'))
+        legacy = FileSystemStorage(location=self.location).save(
+            'uploads/legacy.jpg', ContentFile(b'legacy'),
+        )
+        request = RequestFactory().get('/')
+
+        response = serve_media(request, name, document_root=self.location)
+        self.assertIn(
+            f'max-age={IMMUTABLE_MAX_AGE}', response['Cache-Control'],
+        )
+        self.assertIn('immutable', response['Cache-Control'])
+
+        response = serve_media(request, legacy, document_root=self.location)
+        self.assertNotIn('Cache-Control', response)
@@ -0,0 +1,36 @@
+"""
+Views shared by the apps.
+"""
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.utils.cache import patch_cache_control
+from django.utils.crypto import constant_time_compare
+from django.views.static import serve
+
+from core import metrics
+from core.storage import ContentAddressedStorage
+
+## noqa NOTE: A year, the longest max-age caches are expected to honour.
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+
+def serve_media(request, path, document_root=None, show_indexes=False):
+    """Serve a media file, cacheable for good if named after its content."""
+    response = serve(request, path, document_root, show_indexes)
+    if ContentAddressedStorage.is_content_name(path):
+        patch_cache_control(
+            response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True,
+        )
+    return response
+
+
+def metrics_view(request):
+    """Serve the request metrics to Prometheus, given the token."""
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    if not settings.METRICS_TOKEN or not constant_time_compare(
+        request.headers.get('Authorization', ''),
+        f'Bearer {settings.METRICS_TOKEN}',
+    ):
+        return HttpResponseForbidden()
+    return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class RecipeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipe'
+
+    def ready(self):
+        ## noqa NOTE: Registers the cache invalidation signal handlers.
+        from recipe import signals  # noqa: F401
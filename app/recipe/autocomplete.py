@@ -0,0 +1,116 @@
+"""
+Prefix autocomplete of tag and ingredient names.
+
+Matches are case-insensitive prefix matches ordered by lower-cased
+name. Each process keeps a sorted array of the names of recently active
+users, answering from it with a binary search. An array is dropped
+when the user's names generation moves on (a tag or ingredient is
+created, renamed or deleted, see recipe.cache) and rebuilt by the next
+request. Without the in-process index, or when it is disabled, the
+database answers through the (user_id, lower(name) COLLATE "C") index.
+"""
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import connection
+from django.db.models.functions import Collate, Lower
+
+from recipe import cache
+
+
+def _sort_key():
+    """Return the expression names are matched and ordered by."""
+    key = Lower('name')
+    if connection.vendor == 'postgresql':
+        ## noqa NOTE: Byte order, as in the index, so LIKE 'prefix%' can use it.
+        key = Collate(key, 'C')
+    return key
+
+
+def query_matches(queryset, prefix, limit):
+    """Return (id, name) of the first names starting with prefix."""
+    return list(
+        queryset.annotate(sort_key=_sort_key())
+        .filter(sort_key__startswith=prefix.lower())
+        .order_by('sort_key', 'id')
+        .values_list('id', 'name')[:limit]
+    )
+
+
+class SortedNames:
+    """Names of one user's objects, sorted for prefix lookups."""
+
+    def __init__(self, rows):
+        entries = sorted(
+            (name.lower(), obj_id, name) for obj_id, name in rows
+        )
+        self.keys = [entry[0] for entry in entries]
+        self.entries = [(obj_id, name) for _, obj_id, name in entries]
+
+    def matches(self, prefix, limit):
+        """Return (id, name) of the first names starting with prefix."""
+        prefix = prefix.lower()
+        start = bisect_left(self.keys, prefix)
+        end = start
+        while (
+            end < len(self.keys) and end - start < limit
+            and self.keys[end].startswith(prefix)
+        ):
+            end += 1
+        return self.entries[start:end]
+
+
+class NameIndexCache:
+    """Bounded LRU of SortedNames keyed by (model, user id)."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, generation):
+        """Return the index of key if built at generation, else None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != generation:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, generation, index):
+        """Store the index of key built at generation."""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (generation, index)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop every index."""
+        with self._lock:
+            self._entries.clear()
+
+
+name_indexes = NameIndexCache(settings.AUTOCOMPLETE_INDEX_USERS)
+
+
+def autocomplete(queryset, user_id, prefix, limit):
+    """Return (id, name) of a user's first names starting with prefix.
+
+    queryset holds the user's objects of a single model.
+    """
+    if name_indexes.maxsize <= 0:
+        return query_matches(queryset, prefix, limit)
+
+    key = (queryset.model._meta.label, user_id)
+    ## noqa NOTE: Read before loading, a write meanwhile makes it stale at once.
+    generation = cache.get_generation(user_id, cache.NAMES)
+    index = name_indexes.get(key, generation)
+    if index is None:
+        index = SortedNames(queryset.values_list('id', 'name').iterator())
+        name_indexes.set(key, generation, index)
+    return index.matches(prefix, limit)
@@ -0,0 +1,165 @@
+"""
+Streaming NDJSON import and export of recipes.
+"""
+import json
+from itertools import islice
+
+from django.db import connections, transaction, DatabaseError
+from django.db.models import Prefetch, prefetch_related_objects
+from rest_framework.utils.encoders import JSONEncoder
+
+from core.models import Recipe, Tag, Ingredient
+from recipe import cache, search, serializers
+
+
+def _dumps(data):
+    """Encode one NDJSON line."""
+    return json.dumps(data, cls=JSONEncoder) + '\n'
+
+
+def _chunks(iterable, size):
+    """Yield lists of up to size items from an iterable."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def export_recipes(queryset, context, chunk_size):
+    """Yield every recipe in the queryset as an NDJSON line.
+
+    Rows are read through a server-side cursor and tags/ingredients are
+    prefetched per chunk, so memory stays bounded by chunk_size.
+    """
+    rows = queryset.iterator(chunk_size=chunk_size)
+    for chunk in _chunks(rows, chunk_size):
+        prefetch_related_objects(
+            chunk,
+            Prefetch('tags', queryset=Tag.objects.only('id', 'name')),
+            Prefetch(
+                'ingredients',
+                queryset=Ingredient.objects.only('id', 'name'),
+            ),
+        )
+        data = serializers.RecipeDetailSerializer(
+            chunk, many=True, context=context,
+        ).data
+        yield ''.join(_dumps(item) for item in data)
+
+
+def _parse_lines(stream):
+    """Yield (line number, record or None, errors) for each NDJSON line."""
+    for number, raw in enumerate(stream, start=1):
+        raw = raw.strip()
+        if not raw:
+            continue
+        try:
+            record = json.loads(raw)
+        except ValueError:
+            yield number, None, {'non_field_errors': ['Invalid JSON.']}
+            continue
+        if not isinstance(record, dict):
+            yield number, None, {'non_field_errors': ['Expected an object.']}
+            continue
+        yield number, record, None
+
+
+def import_recipes(stream, context, batch_size):
+    """Validate and create recipes from an NDJSON stream.
+
+    Yields one result line per input line. Valid records are written in
+    batches, each batch in its own transaction.
+    """
+    batch = []
+    for number, record, errors in _parse_lines(stream):
+        if errors is None:
+            serializer = serializers.RecipeDetailSerializer(
+                data=record, context=context,
+            )
+            if serializer.is_valid():
+                batch.append((number, serializer.validated_data))
+            else:
+                errors = serializer.errors
+        if errors is not None:
+            yield _dumps({'line': number, 'status': 'error', 'errors': errors})
+        if len(batch) >= batch_size:
+            yield _write_batch(batch, context)
+            batch = []
+
+    if batch:
+        yield _write_batch(batch, context)
+
+
+def _write_batch(batch, context):
+    """Create a batch of validated recipes and return its result lines."""
+    try:
+        with transaction.atomic():
+            recipes = _create_recipes(
+                [data for _, data in batch], context,
+            )
+    except DatabaseError:
+        return ''.join(
+            _dumps({
+                'line': number,
+                'status': 'error',
+                'errors': {'non_field_errors': ['Batch failed to save.']},
+            })
+            for number, _ in batch
+        )
+
+    ## noqa NOTE: bulk_create sends no signals, invalidate the cache here.
+    cache.invalidate(context['request'].user.id)
+    return ''.join(
+        _dumps({'line': number, 'status': 'created', 'id': recipe.id})
+        for (number, _), recipe in zip(batch, recipes)
+    )
+
+
+def _create_recipes(records, context):
+    """Insert recipes and their nested links with set-based queries."""
+    user = context['request'].user
+    helper = serializers.RecipeSerializer(context=context)
+    recipes = []
+    nested = []
+    for data in records:
+        data = dict(data)
+        nested.append({
+            'tags': data.pop('tags', []),
+            'ingredients': data.pop('ingredients', []),
+        })
+        ## noqa NOTE: Images cannot be sent in NDJSON, use upload-image instead.
+        data.pop('image', None)
+        recipes.append(Recipe(user=user, **data))
+
+    features = connections[Recipe.objects.db].features
+    if features.can_return_rows_from_bulk_insert:
+        recipes = Recipe.objects.bulk_create(recipes)
+    else:
+        ## noqa NOTE: Without INSERT ... RETURNING (SQLite on Django 3.2) the ids
+        ## noqa   are not set by bulk_create, insert the rows one by one.
+        for recipe in recipes:
+            recipe.save(force_insert=True)
+
+    for field, model in (('tags', Tag), ('ingredients', Ingredient)):
+        items = [item for related in nested for item in related[field]]
+        objs = {
+            obj.name: obj
+            for obj in helper._get_or_create_objects(model, items)
+        }
+        through = getattr(Recipe, field).through
+        column = f'{model._meta.model_name}_id'
+        links = {
+            (recipe.id, objs[item['name']].id)
+            for recipe, related in zip(recipes, nested)
+            for item in related[field]
+        }
+        through.objects.bulk_create([
+            through(recipe_id=recipe_id, **{column: obj_id})
+            for recipe_id, obj_id in links
+        ])
+
+    ## noqa NOTE: One statement for the batch, bulk_create sends no signals.
+    search.index_recipes([recipe.id for recipe in recipes])
+    return recipes
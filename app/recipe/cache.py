@@ -0,0 +1,177 @@
+"""
+Per-user response cache for the recipe list APIs.
+
+Entries are keyed by user, view, action and normalized query params
+plus a per-user generation number. Any write to a user's recipes,
+tags or ingredients bumps the generation (see recipe.signals), which
+makes all of their cached entries unreachable in O(1); stale entries
+then expire through the cache timeout. Generations are kept in the
+coordination cache, which every process shares and never culls.
+"""
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.response import Response
+
+from core import metrics
+from core.db import routers
+
+## noqa NOTE: Query params holding comma separated ids, order does not matter.
+ID_LIST_PARAMS = ('tags', 'ingredients')
+
+_stats = {'hits': 0, 'misses': 0}
+_stats_lock = threading.Lock()
+
+
+def get_cache():
+    """Return the cache backend configured for recipe responses."""
+    return caches[settings.RECIPE_CACHE_ALIAS]
+
+
+def is_enabled():
+    """Return whether response caching is switched on."""
+    return settings.RECIPE_CACHE_ENABLED
+
+
+def get_generation_cache():
+    """Return the cache backend holding the user generations."""
+    return caches[settings.RECIPE_GENERATION_CACHE_ALIAS]
+
+
+## noqa NOTE: Generation scopes. RESPONSES moves on with any write, NAMES
+## noqa   only when tag or ingredient names change (autocomplete indexes).
+RESPONSES = 'resp'
+NAMES = 'names'
+
+
+def _generation_key(user_id, scope):
+    return f'recipe:gen:{scope}:{user_id}'
+
+
+def get_generation(user_id, scope=RESPONSES):
+    """Return the current cache generation of a user."""
+    cache = get_generation_cache()
+    key = _generation_key(user_id, scope)
+    generation = cache.get(key)
+    if generation is None:
+        ## noqa NOTE: Seed from the clock so an evicted counter never restarts
+        ## noqa   at a value that older entries were stored under.
+        cache.add(key, time.time_ns(), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_generation(user_id, scope=RESPONSES):
+    """Invalidate every cached response (or index) of a user."""
+    cache = get_generation_cache()
+    key = _generation_key(user_id, scope)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+def invalidate(user_id):
+    """Bump a user's generation now and again once the write commits.
+
+    Also pins the user to the default database once the write commits.
+    """
+    bump_generation(user_id)
+    ## noqa NOTE: A read between the write and its commit may have cached the
+    ## noqa   old rows under the new generation, the second bump drops them.
+    transaction.on_commit(lambda: bump_generation(user_id))
+    routers.pin_on_commit(user_id)
+
+
+def invalidate_names(user_id):
+    """Bump a user's names generation now and again once committed."""
+    bump_generation(user_id, NAMES)
+    transaction.on_commit(lambda: bump_generation(user_id, NAMES))
+
+
+def _normalize_params(query_params):
+    """Return the query params as a canonical, order independent string."""
+    items = []
+    for name in sorted(query_params):
+        values = query_params.getlist(name)
+        if name in ID_LIST_PARAMS:
+            ids = {
+                value.strip()
+                for value_list in values
+                for value in value_list.split(',')
+                if value.strip()
+            }
+            values = [','.join(sorted(ids))]
+        items.append(f'{name}={"&".join(sorted(values))}')
+    return '&'.join(items)
+
+
+def make_key(request, view_name, action):
+    """Return the cache key for a request to a view action."""
+    user_id = request.user.id
+    raw = '|'.join([
+        request.get_host(),
+        view_name,
+        action,
+        _normalize_params(request.query_params),
+    ])
+    digest = hashlib.sha1(raw.encode('utf-8')).hexdigest()
+    return f'recipe:resp:{user_id}:{get_generation(user_id)}:{digest}'
+
+
+def get_cached(key):
+    """Return cached data for a key or None, counting hits and misses."""
+    data = get_cache().get(key)
+    with _stats_lock:
+        _stats['hits' if data is not None else 'misses'] += 1
+    metrics.count_cache('recipe', data is not None)
+    return data
+
+
+def store(key, data):
+    """Store response data under a key."""
+    get_cache().set(key, data, timeout=settings.RECIPE_CACHE_TIMEOUT)
+
+
+def stats():
+    """Return the hit/miss counters of this process."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_stats():
+    """Reset the hit/miss counters of this process."""
+    with _stats_lock:
+        _stats.update(hits=0, misses=0)
+
+
+def to_plain(data):
+    """Return serializer output as plain lists/dicts safe to pickle."""
+    if isinstance(data, dict):
+        return {key: to_plain(value) for key, value in data.items()}
+    if isinstance(data, list):
+        return [to_plain(item) for item in data]
+    return data
+
+
+class CachedListMixin:
+    """Serve list responses from the per-user response cache."""
+
+    def list(self, request, *args, **kwargs):
+        if not is_enabled():
+            return super().list(request, *args, **kwargs)
+
+        key = make_key(request, self.basename, self.action)
+        data = get_cached(key)
+        if data is not None:
+            return Response(data, headers={'X-Cache': 'HIT'})
+
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            store(key, to_plain(response.data))
+        response['X-Cache'] = 'MISS'
+        return response
@@ -0,0 +1,218 @@
+"""
+Background generation of resized recipe image variants.
+"""
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+
+from PIL import Image, ImageOps
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.models import ImageBlob, Recipe
+from core.storage import image_storage
+from recipe import cache, uploads
+
+logger = logging.getLogger(__name__)
+
+## noqa NOTE: Variant name -> bounding box, the aspect ratio is kept.
+VARIANTS = {
+    'thumbnail': (200, 200),
+    'medium': (800, 800),
+}
+VARIANT_FORMAT = 'WEBP'
+VARIANT_EXTENSION = '.webp'
+VARIANT_QUALITY = 80
+## noqa NOTE: Directory of recipe images, see core.models.recipe_image_file_path.
+IMAGE_DIR = os.path.join('uploads', 'recipe')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def variant_path(image_name, variant):
+    """Return the storage path of a variant next to its original."""
+    root = os.path.splitext(image_name)[0]
+    return f'{root}_{variant}{VARIANT_EXTENSION}'
+
+
+def render_variant(image, size):
+    """Return the encoded bytes of an image resized to fit size."""
+    variant = image.copy()
+    variant.thumbnail(size, Image.LANCZOS)
+    if variant.mode not in ('RGB', 'RGBA'):
+        variant = variant.convert('RGBA' if 'A' in variant.mode else 'RGB')
+    output = io.BytesIO()
+    variant.save(output, VARIANT_FORMAT, quality=VARIANT_QUALITY, method=4)
+    return output.getvalue()
+
+
+def generate_variants(recipe_id, image_name):
+    """Write the missing variants of an image and record them on the recipe.
+
+    Variants are named after their original, so recipes sharing an image
+    share its variants. The recipe is only updated if it still points at
+    image_name; variants of replaced images are left to collect_garbage.
+    """
+    variants = {name: variant_path(image_name, name) for name in VARIANTS}
+    missing = [
+        name for name, path in variants.items()
+        if not default_storage.exists(path)
+    ]
+    if missing:
+        with default_storage.open(image_name, 'rb') as image_file:
+            image = Image.open(image_file)
+            ## noqa NOTE: Let JPEG decode at a reduced scale, much cheaper than full size.
+            image.draft('RGB', max(VARIANTS.values()))
+            image = ImageOps.exif_transpose(image)
+            image.load()
+        for name in missing:
+            variants[name] = default_storage.save(
+                variants[name],
+                ContentFile(render_variant(image, VARIANTS[name])),
+            )
+
+    recipes = Recipe.objects.filter(pk=recipe_id, image=image_name)
+    ## noqa NOTE: update() skips auto_now, the ETag derives from updated_at.
+    if recipes.update(image_variants=variants, updated_at=timezone.now()):
+        user_id = recipes.values_list('user_id', flat=True).first()
+        cache.invalidate(user_id)
+    return variants
+
+
+def _run_job(recipe_id, image_name):
+    """Run a variants job in a worker thread."""
+    try:
+        generate_variants(recipe_id, image_name)
+    except Exception:
+        logger.exception('Generating variants of %s failed.', image_name)
+    finally:
+        ## noqa NOTE: Worker threads get their own DB connection, release it.
+        connections.close_all()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_WORKERS,
+                thread_name_prefix='recipe-images',
+            )
+        return _executor
+
+
+def enqueue_variants(recipe):
+    """Generate the variants of a recipe's image once the upload commits.
+
+    Jobs run in a local thread pool (Pillow releases the GIL while it
+    resizes and encodes); IMAGE_WORKERS = 0 runs them inline instead.
+    """
+    args = (recipe.pk, recipe.image.name)
+
+    def submit():
+        if settings.IMAGE_WORKERS <= 0:
+            generate_variants(*args)
+        else:
+            _get_executor().submit(_run_job, *args)
+
+    transaction.on_commit(submit)
+
+
+def acquire_image(name):
+    """Count a new reference to a stored image."""
+    blobs = ImageBlob.objects.filter(name=name)
+    if blobs.update(ref_count=F('ref_count') + 1, updated_at=timezone.now()):
+        return
+    try:
+        with transaction.atomic():
+            ImageBlob.objects.create(name=name, ref_count=1)
+    except IntegrityError:
+        ## noqa NOTE: Created concurrently, count on the existing row.
+        blobs.update(ref_count=F('ref_count') + 1, updated_at=timezone.now())
+
+
+def release_image(name):
+    """Drop a reference to a stored image."""
+    ImageBlob.objects.filter(name=name, ref_count__gt=0).update(
+        ref_count=F('ref_count') - 1, updated_at=timezone.now(),
+    )
+
+
+def _walk(storage, path):
+    if not storage.exists(path):
+        return
+    dir_names, file_names = storage.listdir(path)
+    for file_name in file_names:
+        yield os.path.join(path, file_name)
+    for dir_name in dir_names:
+        yield from _walk(storage, os.path.join(path, dir_name))
+
+
+def _source_root(path):
+    """Return the path without extension of the original of a file."""
+    root = os.path.splitext(path)[0]
+    for name in VARIANTS:
+        if root.endswith(f'_{name}'):
+            return root[:-len(name) - 1]
+    return root
+
+
+def _delete_image(name):
+    image_storage.delete(name)
+    for variant in VARIANTS:
+        default_storage.delete(variant_path(name, variant))
+
+
+def collect_garbage(grace):
+    """Delete stored images no recipe uses and return their names.
+
+    Removed are blobs whose count has been zero for longer than grace,
+    with their variants, and files older than grace that have no blob:
+    uploads whose transaction rolled back and abandoned temporary files.
+    """
+    cutoff = timezone.now() - grace
+    removed = []
+
+    unused = ImageBlob.objects.filter(ref_count=0, updated_at__lt=cutoff)
+    for name in unused.values_list('name', flat=True):
+        with transaction.atomic():
+            ## noqa NOTE: Lock the row so a concurrent acquire waits for us.
+            blob = ImageBlob.objects.select_for_update().filter(
+                name=name, ref_count=0,
+            ).first()
+            if blob is None:
+                continue
+            if image_storage.exists(name) and (
+                image_storage.get_modified_time(name) >= cutoff
+            ):
+                ## noqa NOTE: Just uploaded again, its recipe is not saved yet.
+                continue
+            _delete_image(name)
+            blob.delete()
+        removed.append(name)
+
+    known_roots = {
+        os.path.splitext(name)[0]
+        for name in ImageBlob.objects.values_list('name', flat=True)
+    }
+    paths = chain(
+        _walk(image_storage, IMAGE_DIR),
+        _walk(image_storage, uploads.TEMP_DIR),
+    )
+    for path in paths:
+        if _source_root(path) in known_roots:
+            continue
+        if image_storage.get_modified_time(path) < cutoff:
+            image_storage.delete(path)
+            removed.append(path)
+
+    return removed
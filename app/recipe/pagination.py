@@ -0,0 +1,230 @@
+"""
+Pagination for the recipe APIs.
+"""
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Keyset (seek) pagination over the queryset ordering.
+
+    Opt-in: lists are only paginated when the client sends a `cursor` or
+    `page_size` query parameter. The cursor holds the ordering values of
+    the last row seen, so every page is a single index range scan no
+    matter how deep it is, and rows inserted concurrently never shift
+    the pages a client is walking through.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    invalid_cursor_message = _('Invalid cursor.')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Return one page of results or None when not paginating."""
+        params = request.query_params
+        if (
+            self.cursor_query_param not in params
+            and self.page_size_query_param not in params
+        ):
+            return None
+
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+        self.cursor_fields = self.get_cursor_fields(queryset)
+        position, reverse = self.decode_cursor(request)
+
+        ordering = self.ordering
+        if reverse:
+            ordering = [self._flip(field) for field in ordering]
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._seek_filter(ordering, position))
+
+        ## noqa NOTE: Fetch one extra row to know if there is another page.
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        if reverse:
+            results.reverse()
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+
+        self.page = results
+        return results
+
+    def get_page_size(self, request):
+        """Return the requested page size clamped to the maximum."""
+        default = api_settings.PAGE_SIZE or self.max_page_size
+        try:
+            page_size = int(
+                request.query_params.get(self.page_size_query_param, default)
+            )
+        except (TypeError, ValueError):
+            return default
+        if page_size <= 0:
+            return default
+        return min(page_size, self.max_page_size)
+
+    def get_ordering(self, queryset):
+        """Return the queryset ordering, ending in a unique column."""
+        ordering = list(queryset.query.order_by) or ['-pk']
+        if ordering[-1].lstrip('-') not in ('pk', 'id'):
+            ## noqa NOTE: Tiebreak on the primary key in the same direction.
+            ordering.append('-id' if ordering[-1].startswith('-') else 'id')
+        return ordering
+
+    def get_cursor_fields(self, queryset):
+        """Return the model or annotation field of each ordering column."""
+        opts = queryset.model._meta
+        fields = []
+        for name in (field.lstrip('-') for field in self.ordering):
+            annotation = queryset.query.annotations.get(name)
+            if annotation is not None:
+                fields.append(annotation.output_field)
+            elif name == 'pk':
+                fields.append(opts.pk)
+            else:
+                fields.append(opts.get_field(name))
+        return fields
+
+    def decode_cursor(self, request):
+        """Return the (position, reverse) encoded in the request cursor."""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            data = json.loads(
+                base64.urlsafe_b64decode(encoded.encode('ascii'))
+            )
+            position = data['p']
+            reverse = bool(data.get('r', False))
+        except (
+            binascii.Error, UnicodeError, ValueError, KeyError, TypeError
+        ):
+            raise NotFound(self.invalid_cursor_message)
+        if (
+            not isinstance(position, list)
+            or len(position) != len(self.ordering)
+        ):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            position = [
+                self._cursor_value(field, value)
+                for field, value in zip(self.cursor_fields, position)
+            ]
+        except (ValidationError, ValueError, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, position, reverse):
+        """Return a link to the page after (or before) the position."""
+        data = {'p': position}
+        if reverse:
+            data['r'] = True
+        encoded = base64.urlsafe_b64encode(
+            json.dumps(
+                data, cls=DjangoJSONEncoder, separators=(',', ':')
+            ).encode('utf-8')
+        ).decode('ascii')
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded
+        )
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self._position(self.page[-1]), False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(
+                self.base_url, self.cursor_query_param
+            )
+        return self.encode_cursor(self._position(self.page[0]), True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'The pagination cursor value.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Number of results to return per page.',
+                'schema': {'type': 'integer'},
+            },
+        ]
+
+    def _position(self, obj):
+        """Return the ordering values of an object as a JSON list."""
+        return [getattr(obj, field.lstrip('-')) for field in self.ordering]
+
+    def _cursor_value(self, field, value):
+        """Return a cursor value converted for the column it seeks on."""
+        ## noqa NOTE: Cursors only hold strings and numbers, the ordering
+        ## noqa   columns are not nullable.
+        if value is None or isinstance(value, (dict, list)):
+            raise ValueError(value)
+        return field.to_python(value)
+
+    def _flip(self, field):
+        """Return the ordering field in the opposite direction."""
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    def _seek_filter(self, ordering, position):
+        """Build a filter for rows strictly after the position.
+
+        For ordering (a, b) this is `a after x OR (a = x AND b after y)`,
+        which the database answers from a composite index.
+        """
+        seek = Q()
+        for i, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition = Q(**{f'{name}__{lookup}': position[i]})
+            for prev_field, prev_value in zip(ordering[:i], position[:i]):
+                condition &= Q(**{prev_field.lstrip('-'): prev_value})
+            seek |= condition
+        return seek
@@ -0,0 +1,216 @@
+"""
+Full-text search over recipes.
+
+On PostgreSQL every recipe keeps a weighted tsvector of its title (A),
+description (B) and tag and ingredient names (C), refreshed by
+recipe.signals and matched through a GIN index. Other databases use an
+in-process inverted index with the same weights. It is only coherent
+within one process and meant for tests and local development.
+"""
+import re
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+)
+from django.db import connection
+from django.db.models import (
+    Case,
+    F,
+    FloatField,
+    OuterRef,
+    Subquery,
+    Value,
+    When,
+)
+from django.db.models.functions import Cast, Coalesce
+
+from core.models import Ingredient, Recipe, Tag
+
+## noqa NOTE: Same as the default weights of ts_rank.
+WEIGHTS = {'A': 1.0, 'B': 0.4, 'C': 0.2}
+## noqa NOTE: Recipe fields whose change needs the search data refreshed.
+INDEXED_FIELDS = ('title', 'description')
+
+
+def use_postgres():
+    """Return whether searches run in PostgreSQL."""
+    backend = settings.RECIPE_SEARCH_BACKEND
+    if backend == 'auto':
+        return connection.vendor == 'postgresql'
+    return backend == 'postgres'
+
+
+def _linked_names(model):
+    """Return the names of the objects linked to the outer recipe."""
+    names = (
+        model.objects.filter(recipe=OuterRef('pk'))
+        .order_by()
+        .values('recipe')
+        .annotate(names=StringAgg('name', ' '))
+        .values('names')
+    )
+    return Coalesce(Subquery(names), Value(''))
+
+
+def search_vector():
+    """Return the expression computing the tsvector of a recipe."""
+    config = settings.RECIPE_SEARCH_CONFIG
+    return (
+        SearchVector('title', weight='A', config=config)
+        + SearchVector('description', weight='B', config=config)
+        + SearchVector(
+            _linked_names(Tag),
+            _linked_names(Ingredient),
+            weight='C',
+            config=config,
+        )
+    )
+
+
+def index_recipes(recipe_ids):
+    """Refresh the search data of some recipes."""
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    if use_postgres():
+        Recipe.objects.filter(pk__in=recipe_ids).update(
+            search_vector=search_vector(),
+        )
+    else:
+        memory_index.update(recipe_ids)
+
+
+def unindex_recipe(recipe_id):
+    """Drop the search data of a deleted recipe."""
+    if not use_postgres():
+        memory_index.remove(recipe_id)
+
+
+def search(queryset, text):
+    """Filter recipes to those matching text, best ranked first."""
+    if use_postgres():
+        query = SearchQuery(
+            text,
+            config=settings.RECIPE_SEARCH_CONFIG,
+            search_type='websearch',
+        )
+        ## noqa NOTE: ts_rank is a float4, as a double it survives a round trip
+        ## noqa   through pagination cursors and compares equal again.
+        return queryset.filter(search_vector=query).annotate(
+            rank=Cast(SearchRank(F('search_vector'), query), FloatField()),
+        ).order_by('-rank', '-id')
+
+    scores = memory_index.search(text)
+    if not scores:
+        return queryset.none()
+    return queryset.filter(pk__in=scores).annotate(rank=Case(
+        *[When(pk=pk, then=Value(score)) for pk, score in scores.items()],
+        output_field=FloatField(),
+    )).order_by('-rank', '-id')
+
+
+def tokenize(text):
+    """Return the lower-cased words of a text."""
+    return re.findall(r'\w+', text.lower())
+
+
+class InvertedIndex:
+    """In-process inverted index of recipe text: term -> recipe -> weight.
+
+    It is filled from the database on first use and then kept current
+    by index_recipes/unindex_recipe.
+    """
+
+    def __init__(self):
+        self._postings = defaultdict(dict)
+        self._terms = {}
+        self._built = False
+        self._lock = threading.RLock()
+
+    def _documents(self, recipe_ids=None):
+        """Return recipe id -> [(text, weight)] loaded from the database."""
+        recipes = Recipe.objects.all()
+        if recipe_ids is not None:
+            recipes = recipes.filter(pk__in=recipe_ids)
+        documents = {
+            pk: [(title, 'A'), (description, 'B')]
+            for pk, title, description in recipes.values_list(
+                'id', 'title', 'description',
+            )
+        }
+        for field, model in (('tags', Tag), ('ingredients', Ingredient)):
+            through = getattr(Recipe, field).through
+            links = through.objects.filter(recipe_id__in=documents)
+            for pk, text in links.values_list(
+                'recipe_id', f'{model._meta.model_name}__name',
+            ):
+                documents[pk].append((text, 'C'))
+        return documents
+
+    def _add(self, pk, texts):
+        terms = {}
+        for text, weight in texts:
+            for term in tokenize(text):
+                terms[term] = max(terms.get(term, 0.0), WEIGHTS[weight])
+        for term, weight in terms.items():
+            self._postings[term][pk] = weight
+        self._terms[pk] = set(terms)
+
+    def _remove(self, pk):
+        for term in self._terms.pop(pk, ()):
+            postings = self._postings[term]
+            postings.pop(pk, None)
+            if not postings:
+                del self._postings[term]
+
+    def _build(self):
+        if not self._built:
+            for pk, texts in self._documents().items():
+                self._add(pk, texts)
+            self._built = True
+
+    def update(self, recipe_ids):
+        """Re-read some recipes, dropping those that no longer exist."""
+        with self._lock:
+            if not self._built:
+                ## noqa NOTE: The first search reads everything anyway.
+                return
+            documents = self._documents(recipe_ids)
+            for pk in recipe_ids:
+                self._remove(pk)
+                if pk in documents:
+                    self._add(pk, documents[pk])
+
+    def remove(self, recipe_id):
+        """Drop a recipe from the index."""
+        with self._lock:
+            self._remove(recipe_id)
+
+    def search(self, text):
+        """Return recipe id -> score of the recipes having every word."""
+        terms = set(tokenize(text))
+        if not terms:
+            return {}
+        with self._lock:
+            self._build()
+            postings = [self._postings.get(term, {}) for term in terms]
+            matches = set.intersection(*(set(p) for p in postings))
+            return {
+                pk: sum(p[pk] for p in postings) for pk in matches
+            }
+
+    def clear(self):
+        """Empty the index, it is rebuilt on the next search."""
+        with self._lock:
+            self._postings.clear()
+            self._terms.clear()
+            self._built = False
+
+
+memory_index = InvertedIndex()
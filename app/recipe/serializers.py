@@ -2,12 +2,15 @@
 Serializers for recipe APIs
 """
 
+from django.core.files.storage import default_storage
 from rest_framework import serializers
 
+from core.metrics import TimedSerializerMixin
 from core.models import Recipe, Tag, Ingredient
+from recipe import cache, uploads
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for Tags."""
 
     class Meta:
@@ -16,7 +19,7 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for Ingredients."""
 
     class Meta:
@@ -25,7 +28,51 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class TagCountSerializer(TagSerializer):
+    """Serializer for tags with the number of recipes using them."""
+    recipe_count = serializers.IntegerField(read_only=True)
+
+    class Meta(TagSerializer.Meta):
+        fields = TagSerializer.Meta.fields + ['recipe_count']
+
+
+class IngredientCountSerializer(IngredientSerializer):
+    """Serializer for ingredients with the number of recipes using them."""
+    recipe_count = serializers.IntegerField(read_only=True)
+
+    class Meta(IngredientSerializer.Meta):
+        fields = IngredientSerializer.Meta.fields + ['recipe_count']
+
+
+class PriceBucketSerializer(TimedSerializerMixin, serializers.Serializer):
+    """Serializer for a price histogram bucket, min inclusive."""
+    min_price = serializers.DecimalField(max_digits=7, decimal_places=2)
+    max_price = serializers.DecimalField(max_digits=7, decimal_places=2)
+    count = serializers.IntegerField()
+
+
+class RecipeStatsSerializer(TimedSerializerMixin, serializers.Serializer):
+    """Serializer for the statistics of a user's recipes."""
+    recipe_count = serializers.IntegerField()
+    avg_time_minutes = serializers.FloatField(allow_null=True)
+    min_time_minutes = serializers.IntegerField(allow_null=True)
+    max_time_minutes = serializers.IntegerField(allow_null=True)
+    ## noqa NOTE: Room for an average rounding up past the largest price.
+    avg_price = serializers.DecimalField(
+        max_digits=7, decimal_places=2, allow_null=True,
+    )
+    min_price = serializers.DecimalField(
+        max_digits=5, decimal_places=2, allow_null=True,
+    )
+    max_price = serializers.DecimalField(
+        max_digits=5, decimal_places=2, allow_null=True,
+    )
+    price_histogram = PriceBucketSerializer(many=True)
+    top_tags = TagCountSerializer(many=True)
+    top_ingredients = IngredientCountSerializer(many=True)
+
+
+class RecipeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for recipies"""
     tags = TagSerializer(many=True, required=False)
     ingredients = IngredientSerializer(many=True, required=False)
@@ -38,25 +85,61 @@ class RecipeSerializer(serializers.ModelSerializer):
         ]
         read_only = ['id']
 
-    def _get_or_create_tags(self, tags, recipe):
-        """Handle getting or creating tags as needed."""
+    def get_fields(self):
+        """Return the fields, limited to those requested if any.
+
+        The view puts the requested field names in the `recipe_fields`
+        context key (the fields/expand query params).
+        """
+        fields = super().get_fields()
+        requested = self.context.get('recipe_fields')
+        if requested is not None:
+            fields = {
+                name: field for name, field in fields.items()
+                if name in requested
+            }
+        return fields
+
+    def _get_or_create_objects(self, model, items):
+        """Return user objects for the given names, creating missing ones.
+
+        Uses a fixed number of queries however many items are passed.
+        """
         auth_user = self.context['request'].user
-        for tag in tags:
-            tag_obj, created = Tag.objects.get_or_create(
-                user=auth_user,
-                **tag,
+        ## noqa NOTE: dict.fromkeys drops repeated names and keeps their order.
+        names = list(dict.fromkeys(item['name'] for item in items))
+        if not names:
+            return []
+
+        objs = self._lookup_by_name(model, auth_user, names)
+        missing = [name for name in names if name not in objs]
+        if missing:
+            ## noqa NOTE: ignore_conflicts lets a concurrent creator win the race,
+            ## noqa   the rows are then read back instead of failing the request.
+            model.objects.bulk_create(
+                [model(user=auth_user, name=name) for name in missing],
+                ignore_conflicts=True,
             )
-            recipe.tags.add(tag_obj)
+            ## noqa NOTE: bulk_create sends no signals.
+            cache.invalidate_names(auth_user.pk)
+            objs.update(self._lookup_by_name(model, auth_user, missing))
+
+        return [objs[name] for name in names]
+
+    def _lookup_by_name(self, model, user, names):
+        """Return a name to object mapping of the user's existing objects."""
+        queryset = model.objects.filter(user=user, name__in=names)
+        return {obj.name: obj for obj in queryset}
+
+    def _get_or_create_tags(self, tags, recipe):
+        """Handle getting or creating tags as needed."""
+        recipe.tags.add(*self._get_or_create_objects(Tag, tags))
 
     def _get_or_create_ingredients(self, ingredients, recipe):
         """Handle getting or creating ingredients as needed."""
-        auth_user = self.context['request'].user
-        for ingredient in ingredients:
-            ingredient_obj, created = Ingredient.objects.get_or_create(
-                user=auth_user,
-                **ingredient,
-            )
-            recipe.ingredients.add(ingredient_obj)
+        recipe.ingredients.add(
+            *self._get_or_create_objects(Ingredient, ingredients)
+        )
 
     def create(self, validated_data):
         """Create a recipe."""
@@ -74,12 +157,14 @@ class RecipeSerializer(serializers.ModelSerializer):
         tags = validated_data.pop('tags', None)
         ingredients = validated_data.pop('ingredients', None)
         ## noqa NOTE:This is done to save the nested value in tags.
+        ## noqa NOTE:set() diffs against the current links and only inserts or
+        ## noqa   deletes the through rows that changed.
         if tags is not None:
-            instance.tags.clear()
-            self._get_or_create_tags(tags, instance)
+            instance.tags.set(self._get_or_create_objects(Tag, tags))
         if ingredients is not None:
-            instance.ingredients.clear()
-            self._get_or_create_ingredients(ingredients, instance)
+            instance.ingredients.set(
+                self._get_or_create_objects(Ingredient, ingredients)
+            )
 
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
@@ -91,12 +176,24 @@ class RecipeSerializer(serializers.ModelSerializer):
 ## noqa NOTE:Get all functionality and add extra fields from RecipeSerializer
 class RecipeDetailSerializer(RecipeSerializer):
     """Serializer for recipe detail view."""
+    image_variants = serializers.SerializerMethodField()
 
     class Meta(RecipeSerializer.Meta):
-        fields = RecipeSerializer.Meta.fields + ['description', 'image']
+        fields = RecipeSerializer.Meta.fields + [
+            'description', 'image', 'image_variants',
+        ]
 
+    def get_image_variants(self, recipe) -> dict:
+        """Return the URLs of the resized copies of the image."""
+        request = self.context.get('request')
+        urls = {}
+        for name, path in recipe.image_variants.items():
+            url = default_storage.url(path)
+            urls[name] = request.build_absolute_uri(url) if request else url
+        return urls
 
-class RecipeImageSerializer(serializers.ModelSerializer):
+
+class RecipeImageSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for uploading images to recipes."""
 
     class Meta:
@@ -104,3 +201,9 @@ class RecipeImageSerializer(serializers.ModelSerializer):
         fields = ['id', 'image']
         read_only_fields = ['id']
         extra_kwargs = {'image': {'required': 'True'}}
+
+    def validate_image(self, value):
+        """Reject images with more pixels than allowed."""
+        ## noqa NOTE: Covers headers the upload handler could not read.
+        uploads.check_pixels(value.image.size)
+        return value
@@ -0,0 +1,168 @@
+"""
+Signal handlers invalidating the recipe response cache, refreshing the
+search data of recipes and counting references to stored images.
+"""
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.models import Recipe, Tag, Ingredient
+from recipe import cache, images, search
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_on_write(sender, instance, **kwargs):
+    """Bump the owner's cache generation when an object changes."""
+    cache.invalidate(instance.user_id)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_names_on_write(sender, instance, **kwargs):
+    """Bump the owner's names generation when a tag or ingredient changes."""
+    cache.invalidate_names(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def invalidate_on_link_change(sender, instance, action, pk_set, **kwargs):
+    """Bump the owner's cache generation when recipe links change.
+
+    Changed recipes also get a new updated_at, which their ETag is
+    derived from.
+    """
+    if not action.startswith('post_'):
+        return
+    cache.invalidate(instance.user_id)
+    ## noqa NOTE: instance is a Recipe, or a Tag/Ingredient for reverse changes.
+    if isinstance(instance, Recipe):
+        recipe_ids = [instance.pk] if pk_set or action == 'post_clear' else []
+    else:
+        recipe_ids = pk_set or []
+    if recipe_ids:
+        Recipe.objects.filter(pk__in=recipe_ids).update(
+            updated_at=timezone.now(),
+        )
+        search.index_recipes(recipe_ids)
+
+
+@receiver(post_save, sender=Recipe)
+def index_recipe(sender, instance, update_fields, **kwargs):
+    """Refresh the search data of a saved recipe."""
+    if update_fields is not None and not set(update_fields) & set(
+        search.INDEXED_FIELDS
+    ):
+        return
+    search.index_recipes([instance.pk])
+
+
+@receiver(post_delete, sender=Recipe)
+def unindex_recipe(sender, instance, **kwargs):
+    """Drop the search data of a deleted recipe."""
+    search.unindex_recipe(instance.pk)
+
+
+def _linked_recipe_ids(instance):
+    """Return the ids of the recipes linked to a tag or ingredient."""
+    field = 'tags' if isinstance(instance, Tag) else 'ingredients'
+    through = getattr(Recipe, field).through
+    column = f'{instance._meta.model_name}_id'
+    return list(through.objects.filter(**{column: instance.pk}).values_list(
+        'recipe_id', flat=True,
+    ))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def index_linked_recipes(sender, instance, created, **kwargs):
+    """Refresh the search data of the recipes of a renamed object."""
+    if not created:
+        search.index_recipes(_linked_recipe_ids(instance))
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def load_linked_recipes(sender, instance, **kwargs):
+    """Remember the recipes of an object about to be deleted."""
+    ## noqa NOTE: The links are gone by post_delete, deleted without signals.
+    instance._linked_recipe_ids = _linked_recipe_ids(instance)
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def reindex_linked_recipes(sender, instance, **kwargs):
+    """Refresh the search data of the recipes of a deleted object."""
+    search.index_recipes(instance._linked_recipe_ids)
+
+
+def _image_name(instance):
+    """Return the image name of a recipe, None if it is not loaded."""
+    if 'image' not in instance.__dict__:
+        return None
+    value = instance.__dict__['image']
+    return getattr(value, 'name', value) or ''
+
+
+def _stored_image(instance):
+    """Return the image name saved in the database for a recipe."""
+    return Recipe.objects.filter(pk=instance.pk).values_list(
+        'image', flat=True,
+    ).first() or ''
+
+
+@receiver(pre_save, sender=Recipe)
+def load_replaced_image(sender, instance, update_fields, **kwargs):
+    """Look up the image a save may replace."""
+    instance._stored_image = None
+    if _image_name(instance) is None or (
+        update_fields is not None and 'image' not in update_fields
+    ):
+        ## noqa NOTE: The image is not written.
+        return
+    ## noqa NOTE: Read from the database, a loaded copy may be out of date.
+    instance._stored_image = (
+        '' if instance._state.adding else _stored_image(instance)
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def count_image_references(sender, instance, **kwargs):
+    """Move the image reference of a recipe when its image changes."""
+    old_image = instance._stored_image
+    new_image = _image_name(instance)
+    if old_image is None or new_image == old_image:
+        return
+    if new_image:
+        images.acquire_image(new_image)
+    if old_image:
+        images.release_image(old_image)
+
+
+@receiver(pre_delete, sender=Recipe)
+def load_deleted_image(sender, instance, **kwargs):
+    """Look up the image of a recipe about to be deleted."""
+    ## noqa NOTE: The collector loaded the row, only deferred images are queried.
+    image = _image_name(instance)
+    instance._stored_image = (
+        _stored_image(instance) if image is None else image
+    )
+
+
+@receiver(post_delete, sender=Recipe)
+def release_image(sender, instance, **kwargs):
+    """Drop the image reference of a deleted recipe."""
+    if instance._stored_image:
+        images.release_image(instance._stored_image)
@@ -0,0 +1,73 @@
+"""
+Aggregated statistics of a user's recipe collection.
+
+Everything is computed by grouped aggregate queries, no recipe rows are
+loaded. Responses are cached under the user's cache generation (see
+recipe.cache), so any write to their recipes, tags or ingredients makes
+the next request recompute them.
+"""
+from django.conf import settings
+from django.db.models import (
+    Avg,
+    Count,
+    DecimalField,
+    F,
+    Max,
+    Min,
+    Value,
+)
+from django.db.models.functions import Floor
+
+from core.models import Ingredient, Recipe, Tag
+
+
+def price_histogram(recipes, width):
+    """Return [{min_price, max_price, count}] of the non-empty buckets."""
+    buckets = (
+        recipes.annotate(bucket=Floor(
+            F('price') / Value(width, output_field=DecimalField()),
+        ))
+        .order_by('bucket')
+        .values('bucket')
+        .annotate(count=Count('id'))
+    )
+    return [
+        {
+            'min_price': bucket['bucket'] * width,
+            'max_price': (bucket['bucket'] + 1) * width,
+            'count': bucket['count'],
+        }
+        for bucket in buckets
+    ]
+
+
+def most_used(model, user, limit):
+    """Return the user's objects of a model used by most recipes."""
+    return list(
+        model.objects.filter(user=user)
+        .annotate(recipe_count=Count('recipe'))
+        .filter(recipe_count__gt=0)
+        .order_by('-recipe_count', 'name', 'id')[:limit]
+    )
+
+
+def recipe_stats(user):
+    """Return the statistics of a user's recipes."""
+    recipes = Recipe.objects.filter(user=user)
+    limit = settings.RECIPE_STATS_TOP
+    return {
+        **recipes.aggregate(
+            recipe_count=Count('id'),
+            avg_time_minutes=Avg('time_minutes'),
+            min_time_minutes=Min('time_minutes'),
+            max_time_minutes=Max('time_minutes'),
+            avg_price=Avg('price'),
+            min_price=Min('price'),
+            max_price=Max('price'),
+        ),
+        'price_histogram': price_histogram(
+            recipes, settings.RECIPE_STATS_PRICE_BUCKET,
+        ),
+        'top_tags': most_used(Tag, user, limit),
+        'top_ingredients': most_used(Ingredient, user, limit),
+    }
@@ -0,0 +1,176 @@
+"""
+Tests for the tag and ingredient autocomplete.
+"""
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.test import TestCase
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+from recipe import autocomplete
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_AUTOCOMPLETE_URL = reverse('recipe:tag-autocomplete')
+INGREDIENTS_AUTOCOMPLETE_URL = reverse('recipe:ingredient-autocomplete')
+
+
+def create_user(email='user@example.com', password='testpass123'):
+    """Create and return a user."""
+    return get_user_model().objects.create_user(email, password)
+
+
+class SortedNamesTests(TestCase):
+    """Test the in-process sorted name array."""
+
+    def test_prefix_matches_in_order(self):
+        """Test matches are the names with the prefix, sorted."""
+        index = autocomplete.SortedNames([
+            (1, 'Pepper'), (2, 'pasta'), (3, 'Parsley'), (4, 'Rice'),
+        ])
+
+        self.assertEqual(
+            index.matches('PA', 10), [(3, 'Parsley'), (2, 'pasta')],
+        )
+        self.assertEqual(index.matches('p', 2), [(3, 'Parsley'), (2, 'pasta')])
+        self.assertEqual(index.matches('x', 10), [])
+        self.assertEqual(len(index.matches('', 10)), 4)
+
+
+class AutocompleteApiTests(TestCase):
+    """Test the autocomplete actions, answered by the database."""
+
+    index_users = 0
+
+    def setUp(self):
+        autocomplete.name_indexes.clear()
+        self.addCleanup(autocomplete.name_indexes.clear)
+        maxsize = autocomplete.name_indexes.maxsize
+        autocomplete.name_indexes.maxsize = self.index_users
+        self.addCleanup(
+            setattr, autocomplete.name_indexes, 'maxsize', maxsize,
+        )
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _names(self, url, **params):
+        res = self.client.get(url, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [item['name'] for item in res.data]
+
+    def test_case_insensitive_prefix(self):
+        """Test names starting with q in any case are returned, sorted."""
+        for name in ('Vegetarian', 'vegan', 'Dessert', 'Very spicy'):
+            Tag.objects.create(user=self.user, name=name)
+
+        self.assertEqual(
+            self._names(TAGS_AUTOCOMPLETE_URL, q='VEG'),
+            ['vegan', 'Vegetarian'],
+        )
+        self.assertEqual(self._names(TAGS_AUTOCOMPLETE_URL, q='x'), [])
+
+    def test_limit(self):
+        """Test the number of matches is limited."""
+        for i in range(15):
+            Ingredient.objects.create(user=self.user, name=f'Salt {i:02}')
+
+        names = self._names(INGREDIENTS_AUTOCOMPLETE_URL, q='salt')
+        self.assertEqual(names, [f'Salt {i:02}' for i in range(10)])
+        self.assertEqual(
+            len(self._names(INGREDIENTS_AUTOCOMPLETE_URL, limit=3)), 3,
+        )
+
+    def test_invalid_limit(self):
+        """Test a limit out of range is rejected."""
+        for limit in ('0', '51', 'abc'):
+            res = self.client.get(TAGS_AUTOCOMPLETE_URL, {'limit': limit})
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('limit', res.data)
+
+    def test_only_own_names(self):
+        """Test names of other users are not returned."""
+        other_user = create_user('other@example.com')
+        Tag.objects.create(user=other_user, name='Vegan')
+        tag = Tag.objects.create(user=self.user, name='Vegetarian')
+
+        res = self.client.get(TAGS_AUTOCOMPLETE_URL, {'q': 'veg'})
+
+        self.assertEqual(res.data, [{'id': tag.id, 'name': tag.name}])
+
+    def test_changes_visible(self):
+        """Test created, renamed and deleted names show up at once."""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.assertEqual(self._names(TAGS_AUTOCOMPLETE_URL, q='v'), ['Vegan'])
+
+        Tag.objects.create(user=self.user, name='Vegetarian')
+        tag.name = 'Spicy'
+        tag.save()
+        self.assertEqual(
+            self._names(TAGS_AUTOCOMPLETE_URL, q='v'), ['Vegetarian'],
+        )
+
+        tag.delete()
+        self.assertEqual(self._names(TAGS_AUTOCOMPLETE_URL, q='s'), [])
+
+    def test_names_created_with_recipe_visible(self):
+        """Test names created through a recipe show up at once."""
+        self._names(TAGS_AUTOCOMPLETE_URL, q='v')
+
+        res = self.client.post(RECIPES_URL, {
+            'title': 'Salad',
+            'time_minutes': 5,
+            'price': '3.00',
+            'tags': [{'name': 'Vegan'}],
+        }, format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        self.assertEqual(self._names(TAGS_AUTOCOMPLETE_URL, q='v'), ['Vegan'])
+
+    def test_tags_and_ingredients_apart(self):
+        """Test each action only returns names of its own model."""
+        Tag.objects.create(user=self.user, name='Salty')
+        Ingredient.objects.create(user=self.user, name='Salt')
+
+        self.assertEqual(
+            self._names(TAGS_AUTOCOMPLETE_URL, q='sal'), ['Salty'],
+        )
+        self.assertEqual(
+            self._names(INGREDIENTS_AUTOCOMPLETE_URL, q='sal'), ['Salt'],
+        )
+
+
+class IndexedAutocompleteApiTests(AutocompleteApiTests):
+    """Run the autocomplete tests against the in-process index."""
+
+    index_users = 2
+
+    def test_index_reused(self):
+        """Test repeated lookups are answered without queries."""
+        Tag.objects.create(user=self.user, name='Vegan')
+        self._names(TAGS_AUTOCOMPLETE_URL, q='v')
+
+        with self.assertNumQueries(0):
+            names = autocomplete.autocomplete(
+                Tag.objects.filter(user=self.user), self.user.pk, 'VE', 10,
+            )
+
+        self.assertEqual([name for _, name in names], ['Vegan'])
+
+    def test_index_kept_on_recipe_write(self):
+        """Test writes not changing names keep the index."""
+        Tag.objects.create(user=self.user, name='Vegan')
+        self._names(TAGS_AUTOCOMPLETE_URL, q='v')
+
+        Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5, price='2.00',
+        )
+        with self.assertNumQueries(0):
+            names = autocomplete.autocomplete(
+                Tag.objects.filter(user=self.user), self.user.pk, 'v', 10,
+            )
+
+        self.assertEqual([name for _, name in names], ['Vegan'])
@@ -0,0 +1,191 @@
+"""
+Tests for the bulk recipe import/export API.
+"""
+import json
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.test import TestCase
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+from recipe.views import RecipeViewSet
+
+
+BULK_URL = reverse('recipe:recipe-bulk')
+
+
+def to_ndjson(records):
+    """Encode records as an NDJSON body."""
+    return ''.join(json.dumps(record) + '\n' for record in records)
+
+
+def read_ndjson(res):
+    """Return the decoded lines of a streamed NDJSON response."""
+    body = b''.join(res.streaming_content).decode('utf-8')
+    return [json.loads(line) for line in body.splitlines()]
+
+
+def recipe_record(**params):
+    """Return a sample recipe record."""
+    record = {
+        'title': 'Sample recipe',
+        'time_minutes': 10,
+        'price': '5.50',
+    }
+    record.update(params)
+    return record
+
+
+class PublicBulkApiTests(TestCase):
+    """Test unauthenticated bulk requests."""
+
+    def test_auth_required(self):
+        """Test auth is required for bulk import/export."""
+        res = APIClient().get(BULK_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateBulkApiTests(TestCase):
+    """Test authenticated bulk requests."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        self.client.force_authenticate(self.user)
+
+    def _post(self, body):
+        """Post an NDJSON body to the bulk endpoint."""
+        return self.client.generic(
+            'POST', BULK_URL, body, content_type='application/x-ndjson',
+        )
+
+    def test_import_recipes(self):
+        """Test importing recipes with nested tags and ingredients."""
+        records = [
+            recipe_record(
+                title='Curry',
+                tags=[{'name': 'Thai'}, {'name': 'Dinner'}],
+                ingredients=[{'name': 'Rice'}],
+            ),
+            recipe_record(
+                title='Soup',
+                tags=[{'name': 'Dinner'}],
+                description='Warm',
+            ),
+        ]
+
+        res = self._post(to_ndjson(records))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        results = read_ndjson(res)
+        self.assertEqual([r['status'] for r in results], ['created'] * 2)
+        curry = Recipe.objects.get(id=results[0]['id'])
+        self.assertEqual(curry.user, self.user)
+        self.assertEqual(
+            set(curry.tags.values_list('name', flat=True)),
+            {'Thai', 'Dinner'},
+        )
+        self.assertEqual(curry.ingredients.get().name, 'Rice')
+        soup = Recipe.objects.get(id=results[1]['id'])
+        self.assertEqual(soup.description, 'Warm')
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(Ingredient.objects.count(), 1)
+
+    def test_import_reports_invalid_lines(self):
+        """Test invalid lines are reported without blocking valid ones."""
+        body = '\n'.join([
+            json.dumps(recipe_record(title='Good')),
+            '{not json',
+            json.dumps({'title': 'Missing fields'}),
+            '',
+            json.dumps(recipe_record(title='Also good')),
+        ])
+
+        res = self._post(body)
+
+        results = {r['line']: r for r in read_ndjson(res)}
+        self.assertEqual(sorted(results), [1, 2, 3, 5])
+        self.assertEqual(results[1]['status'], 'created')
+        self.assertEqual(results[2]['status'], 'error')
+        self.assertIn('time_minutes', results[3]['errors'])
+        self.assertEqual(results[5]['status'], 'created')
+        self.assertEqual(Recipe.objects.count(), 2)
+
+    def test_import_in_batches(self):
+        """Test records are written in batches of the configured size."""
+        records = [recipe_record(title=f'R{i}') for i in range(7)]
+
+        with patch.object(RecipeViewSet, 'bulk_batch_size', 3):
+            results = read_ndjson(self._post(to_ndjson(records)))
+
+        self.assertEqual(len(results), 7)
+        self.assertEqual(
+            [r['line'] for r in results], list(range(1, 8)),
+        )
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 7)
+
+    def test_export_recipes(self):
+        """Test exporting streams the user's recipes as NDJSON."""
+        other = get_user_model().objects.create_user('o@example.com', 'pw')
+        Recipe.objects.create(
+            user=other, title='Other', time_minutes=1, price=Decimal('1'),
+        )
+        recipe = Recipe.objects.create(
+            user=self.user, title='Mine', time_minutes=5,
+            price=Decimal('2.50'),
+        )
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Quick'))
+
+        res = self.client.get(BULK_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        lines = read_ndjson(res)
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(lines[0]['title'], 'Mine')
+        self.assertEqual(lines[0]['tags'], [{'id': recipe.tags.get().id,
+                                             'name': 'Quick'}])
+
+    def test_export_query_count_per_chunk(self):
+        """Test export prefetches nested objects once per chunk."""
+        for i in range(5):
+            recipe = Recipe.objects.create(
+                user=self.user, title=f'R{i}', time_minutes=5,
+                price=Decimal('2.50'),
+            )
+            recipe.tags.add(Tag.objects.create(user=self.user, name=f'T{i}'))
+
+        with patch.object(RecipeViewSet, 'bulk_chunk_size', 2):
+            res = self.client.get(BULK_URL)
+            ## noqa NOTE: 1 server-side cursor + tags/ingredients per chunk of 2.
+            with self.assertNumQueries(1 + 3 * 2):
+                lines = read_ndjson(res)
+
+        self.assertEqual(len(lines), 5)
+
+    def test_export_round_trips_through_import(self):
+        """Test exported lines can be imported again."""
+        recipe = Recipe.objects.create(
+            user=self.user, title='Pie', time_minutes=50,
+            price=Decimal('7.00'),
+        )
+        recipe.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Apple')
+        )
+        exported = b''.join(self.client.get(BULK_URL).streaming_content)
+
+        results = read_ndjson(self._post(exported))
+
+        self.assertEqual(results[0]['status'], 'created')
+        copy = Recipe.objects.get(id=results[0]['id'])
+        self.assertEqual(copy.title, 'Pie')
+        self.assertEqual(copy.ingredients.get().name, 'Apple')
@@ -0,0 +1,186 @@
+"""
+Tests for the recipe response cache.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from prometheus_client.parser import text_string_to_metric_families
+
+from core import metrics
+from core.models import Recipe, Tag, Ingredient
+from recipe import cache
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+
+def create_recipe(user, **params):
+    """Create and return a sample recipe."""
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 10,
+        'price': Decimal('5.00'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+def cache_samples():
+    """Return the recipe cache samples served on the metrics endpoint."""
+    return {
+        (sample.name, sample.labels.get('result')): sample.value
+        for family in text_string_to_metric_families(metrics.render())
+        for sample in family.samples
+        if sample.labels.get('cache') == 'recipe'
+    }
+
+
+class ResponseCacheTests(TestCase):
+    """Test caching of list responses."""
+
+    def setUp(self):
+        cache.get_cache().clear()
+        cache.reset_stats()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_second_request_is_hit(self):
+        """Test repeating a list request is served from the cache."""
+        create_recipe(self.user)
+
+        first = self.client.get(RECIPES_URL)
+        with self.assertNumQueries(0):
+            second = self.client.get(RECIPES_URL)
+
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(cache.stats(), {'hits': 1, 'misses': 1})
+
+    def test_hits_exported(self):
+        """Test hits and misses are served on the metrics endpoint."""
+        before = cache_samples()
+
+        self.client.get(RECIPES_URL)
+        self.client.get(RECIPES_URL)
+        self.client.get(RECIPES_URL)
+
+        after = cache_samples()
+        for result, count in (('hit', 2), ('miss', 1)):
+            key = ('app_cache_requests_total', result)
+            self.assertEqual(after[key] - before.get(key, 0), count)
+
+    def test_recipe_write_invalidates(self):
+        """Test creating a recipe invalidates the cached list."""
+        self.client.get(RECIPES_URL)
+        create_recipe(self.user, title='New')
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(res.data[0]['title'], 'New')
+
+    def test_link_change_invalidates(self):
+        """Test adding a tag to a recipe invalidates cached lists."""
+        recipe = create_recipe(self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.client.get(RECIPES_URL)
+        self.client.get(TAGS_URL, {'assigned_only': 1})
+
+        recipe.tags.add(tag)
+
+        recipes = self.client.get(RECIPES_URL)
+        tags = self.client.get(TAGS_URL, {'assigned_only': 1})
+        self.assertEqual(recipes.data[0]['tags'][0]['name'], 'Vegan')
+        self.assertEqual([t['name'] for t in tags.data], ['Vegan'])
+
+    def test_ingredient_delete_invalidates(self):
+        """Test deleting an ingredient invalidates the cached list."""
+        ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+        self.client.get(INGREDIENTS_URL)
+
+        ingredient.delete()
+
+        res = self.client.get(INGREDIENTS_URL)
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(res.data, [])
+
+    def test_params_are_normalized(self):
+        """Test the order of filter ids does not change the key."""
+        self.client.get(RECIPES_URL, {'tags': '2,1'})
+
+        res = self.client.get(RECIPES_URL, {'tags': '1,2,1'})
+
+        self.assertEqual(res['X-Cache'], 'HIT')
+
+    def test_params_change_key(self):
+        """Test different filters are cached separately."""
+        self.client.get(TAGS_URL)
+
+        res = self.client.get(TAGS_URL, {'assigned_only': 1})
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+
+    def test_cache_per_user(self):
+        """Test users never receive each other's cached lists."""
+        create_recipe(self.user, title='Mine')
+        self.client.get(RECIPES_URL)
+        other = get_user_model().objects.create_user('o@example.com', 'pw')
+        self.client.force_authenticate(other)
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(res.data, [])
+
+    def test_other_user_write_keeps_cache(self):
+        """Test writes of another user do not invalidate this user."""
+        self.client.get(RECIPES_URL)
+        other = get_user_model().objects.create_user('o@example.com', 'pw')
+        create_recipe(other)
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res['X-Cache'], 'HIT')
+
+    @override_settings(RECIPE_CACHE_ENABLED=False)
+    def test_cache_disabled(self):
+        """Test nothing is cached when caching is disabled."""
+        self.client.get(RECIPES_URL)
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotIn('X-Cache', res)
+        self.assertEqual(cache.stats(), {'hits': 0, 'misses': 0})
+
+    @override_settings(CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+        'recipe': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+        },
+        'coordination': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+    })
+    def test_backend_is_pluggable(self):
+        """Test the configured backend is used for responses."""
+        self.client.get(RECIPES_URL)
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
@@ -0,0 +1,220 @@
+"""
+Tests for ETags and conditional requests on the recipe APIs.
+"""
+import threading
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+from recipe.views import RecipeViewSet
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def detail_url(recipe_id):
+    """Create and return a recipe detail URL."""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def create_recipe(user, **params):
+    """Create and return a sample recipe."""
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 10,
+        'price': Decimal('5.00'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class ETagTests(TestCase):
+    """Test conditional GET and optimistic concurrency."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list_not_modified(self):
+        """Test an unchanged list returns 304 without queries."""
+        create_recipe(self.user)
+        res = self.client.get(RECIPES_URL)
+        etag = res['ETag']
+
+        with self.assertNumQueries(0):
+            res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['ETag'], etag)
+
+    def test_list_etag_changes_on_write(self):
+        """Test a write changes the list ETag."""
+        etag = self.client.get(TAGS_URL)['ETag']
+        Tag.objects.create(user=self.user, name='New')
+
+        res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+
+    def test_detail_not_modified(self):
+        """Test an unchanged recipe returns 304 after one query."""
+        recipe = create_recipe(self.user)
+        etag = self.client.get(detail_url(recipe.id))['ETag']
+
+        with self.assertNumQueries(1):
+            res = self.client.get(
+                detail_url(recipe.id), HTTP_IF_NONE_MATCH=etag,
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_etag_changes_with_nested_objects(self):
+        """Test linking or renaming a tag changes the recipe ETag."""
+        recipe = create_recipe(self.user)
+        tag = Tag.objects.create(user=self.user, name='Old')
+        first = self.client.get(detail_url(recipe.id))['ETag']
+
+        recipe.tags.add(tag)
+        second = self.client.get(detail_url(recipe.id))['ETag']
+        tag.name = 'Renamed'
+        tag.save()
+        third = self.client.get(detail_url(recipe.id))['ETag']
+
+        self.assertEqual(len({first, second, third}), 3)
+
+    def test_detail_etag_depends_on_fields(self):
+        """Test a sparse recipe body does not validate the full one."""
+        recipe = create_recipe(self.user)
+        etag = self.client.get(detail_url(recipe.id), {'fields': 'id'})['ETag']
+
+        res = self.client.get(detail_url(recipe.id), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+        self.assertIn('description', res.data)
+
+    def test_detail_other_users_recipe(self):
+        """Test no ETag is leaked for another user's recipe."""
+        other = get_user_model().objects.create_user('o@example.com', 'pw')
+        recipe = create_recipe(other)
+
+        res = self.client.get(detail_url(recipe.id), HTTP_IF_NONE_MATCH='*')
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_update_with_matching_if_match(self):
+        """Test an update with the current ETag succeeds."""
+        recipe = create_recipe(self.user)
+        etag = self.client.get(detail_url(recipe.id))['ETag']
+
+        res = self.client.patch(
+            detail_url(recipe.id), {'title': 'New'}, HTTP_IF_MATCH=etag,
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'New')
+
+    def test_update_with_stale_if_match(self):
+        """Test an update based on a stale copy is rejected."""
+        recipe = create_recipe(self.user, title='Original')
+        etag = self.client.get(detail_url(recipe.id))['ETag']
+        self.client.patch(detail_url(recipe.id), {'title': 'First write'})
+
+        res = self.client.patch(
+            detail_url(recipe.id), {'title': 'Lost'}, HTTP_IF_MATCH=etag,
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'First write')
+
+    def test_tag_update_with_stale_if_match(self):
+        """Test tag updates also honour If-Match."""
+        tag = Tag.objects.create(user=self.user, name='Lunch')
+        url = reverse('recipe:tag-detail', args=[tag.id])
+        etag = self.client.patch(url, {'name': 'Brunch'})['ETag']
+        self.client.patch(url, {'name': 'Dinner'})
+
+        res = self.client.patch(url, {'name': 'Supper'}, HTTP_IF_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_412_PRECONDITION_FAILED)
+
+
+class ConcurrentUpdateTests(TransactionTestCase):
+    """Test concurrent updates sent with the same If-Match."""
+
+    def setUp(self):
+        if not connection.features.has_select_for_update:
+            self.skipTest('Needs SELECT ... FOR UPDATE row locks.')
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+
+    def patch_recipe(self, recipe, title, etag, results):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        try:
+            res = client.patch(
+                detail_url(recipe.id), {'title': title}, HTTP_IF_MATCH=etag,
+            )
+            results[title] = res.status_code
+        finally:
+            connection.close()
+
+    def test_only_first_update_succeeds(self):
+        """Test the second update waits for the first and is rejected."""
+        recipe = create_recipe(self.user, title='Original')
+        client = APIClient()
+        client.force_authenticate(self.user)
+        etag = client.get(detail_url(recipe.id))['ETag']
+        saving = threading.Event()
+        release = threading.Event()
+        perform_update = RecipeViewSet.perform_update
+
+        def slow_update(view, serializer):
+            if not saving.is_set():
+                saving.set()
+                release.wait(5)
+            perform_update(view, serializer)
+
+        results = {}
+        with patch.object(RecipeViewSet, 'perform_update', slow_update):
+            first = threading.Thread(
+                target=self.patch_recipe,
+                args=(recipe, 'First', etag, results),
+            )
+            first.start()
+            saving.wait(5)
+            second = threading.Thread(
+                target=self.patch_recipe,
+                args=(recipe, 'Second', etag, results),
+            )
+            second.start()
+            second.join(0.2)
+            release.set()
+            first.join()
+            second.join()
+
+        self.assertEqual(results, {
+            'First': status.HTTP_200_OK,
+            'Second': status.HTTP_412_PRECONDITION_FAILED,
+        })
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'First')
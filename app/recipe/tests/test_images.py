@@ -0,0 +1,238 @@
+"""
+Tests for recipe image variants and image garbage collection.
+"""
+from datetime import timedelta
+import shutil
+import tempfile
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import ImageBlob, Recipe
+from core.storage import image_storage
+from recipe import images
+
+
+def image_upload_url(recipe_id):
+    """Create and return an image upload URL."""
+    return reverse('recipe:recipe-upload-image', args=[recipe_id])
+
+
+def detail_url(recipe_id):
+    """Create and return a recipe detail URL."""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+class ImageTestMixin:
+    """Upload images to a recipe in a temporary media directory."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media_settings = override_settings(
+            MEDIA_ROOT=self.media_root,
+            IMAGE_WORKERS=0,
+        )
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.addCleanup(shutil.rmtree, self.media_root)
+
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'password123',
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Sample recipe',
+            time_minutes=5,
+            price=5,
+        )
+
+    def _upload(self, size=(1200, 600), color='black', recipe=None):
+        recipe = recipe or self.recipe
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            Image.new('RGB', size, color).save(image_file, format='JPEG')
+            image_file.seek(0)
+            with self.captureOnCommitCallbacks(execute=True):
+                res = self.client.post(
+                    image_upload_url(recipe.id),
+                    {'image': image_file},
+                    format='multipart',
+                )
+        recipe.refresh_from_db()
+        return res
+
+
+class ImageVariantsTests(ImageTestMixin, TestCase):
+    """Tests for generating resized copies of uploaded images."""
+
+    def test_upload_generates_variants(self):
+        """Test uploading an image writes resized WebP variants."""
+        res = self._upload()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(self.recipe.image_variants), set(images.VARIANTS))
+        for name, bounds in images.VARIANTS.items():
+            path = self.recipe.image_variants[name]
+            with default_storage.open(path, 'rb') as variant_file:
+                variant = Image.open(variant_file)
+                self.assertEqual(variant.format, 'WEBP')
+                self.assertLessEqual(variant.width, bounds[0])
+                self.assertLessEqual(variant.height, bounds[1])
+                ## noqa NOTE: The 2:1 aspect ratio of the original is kept.
+                self.assertEqual(variant.width, variant.height * 2)
+
+    def test_variants_not_upscaled(self):
+        """Test images smaller than a variant keep their size."""
+        self._upload(size=(100, 50))
+
+        path = self.recipe.image_variants['medium']
+        with default_storage.open(path, 'rb') as variant_file:
+            self.assertEqual(Image.open(variant_file).size, (100, 50))
+
+    def test_detail_includes_variant_urls(self):
+        """Test the recipe detail lists absolute variant URLs."""
+        self._upload()
+
+        res = self.client.get(detail_url(self.recipe.id))
+
+        variants = res.data['image_variants']
+        self.assertEqual(set(variants), set(images.VARIANTS))
+        for url in variants.values():
+            self.assertTrue(url.startswith('http://testserver/'))
+            self.assertTrue(url.endswith(images.VARIANT_EXTENSION))
+
+    def test_variants_change_detail_etag(self):
+        """Test clients polling the recipe see the variants land."""
+        self._upload()
+        etag = self.client.get(detail_url(self.recipe.id))['ETag']
+
+        images.generate_variants(self.recipe.id, self.recipe.image.name)
+        res = self.client.get(
+            detail_url(self.recipe.id), HTTP_IF_NONE_MATCH=etag,
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_recipes_share_image_and_variants(self):
+        """Test uploading the same picture twice stores it once."""
+        other = Recipe.objects.create(
+            user=self.user,
+            title='Other recipe',
+            time_minutes=5,
+            price=5,
+        )
+        self._upload()
+        self._upload(recipe=other)
+
+        self.assertEqual(other.image.name, self.recipe.image.name)
+        self.assertEqual(other.image_variants, self.recipe.image_variants)
+        blob = ImageBlob.objects.get(name=self.recipe.image.name)
+        self.assertEqual(blob.ref_count, 2)
+
+    def test_stale_job_changes_nothing(self):
+        """Test a job for an image that was replaced is discarded."""
+        self._upload()
+        current = dict(self.recipe.image_variants)
+        with image_storage.open(self.recipe.image.name, 'rb') as image_file:
+            old_name = default_storage.save(
+                'uploads/recipe/old.jpg', image_file,
+            )
+
+        images.generate_variants(self.recipe.id, old_name)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_variants, current)
+
+
+class ImageGarbageCollectionTests(ImageTestMixin, TestCase):
+    """Tests for reference counting and collecting unused images."""
+
+    def _collect(self):
+        return images.collect_garbage(timedelta(0))
+
+    def test_replaced_image_collected(self):
+        """Test replacing an image frees the old one and its variants."""
+        self._upload(color='red')
+        old_name = self.recipe.image.name
+        old_variants = list(self.recipe.image_variants.values())
+        self._upload(color='blue')
+
+        self.assertEqual(ImageBlob.objects.get(name=old_name).ref_count, 0)
+        removed = self._collect()
+
+        self.assertIn(old_name, removed)
+        self.assertFalse(ImageBlob.objects.filter(name=old_name).exists())
+        for path in [old_name] + old_variants:
+            self.assertFalse(default_storage.exists(path))
+        for path in self.recipe.image_variants.values():
+            self.assertTrue(default_storage.exists(path))
+        self.assertTrue(image_storage.exists(self.recipe.image.name))
+
+    def test_deleted_recipe_image_collected(self):
+        """Test deleting the last recipe using an image frees it."""
+        self._upload()
+        name = self.recipe.image.name
+        other = Recipe.objects.create(
+            user=self.user,
+            title='Other recipe',
+            time_minutes=5,
+            price=5,
+        )
+        self._upload(recipe=other)
+
+        self.recipe.delete()
+        self.assertEqual(self._collect(), [])
+        self.assertTrue(image_storage.exists(name))
+
+        Recipe.objects.defer('image').get(pk=other.pk).delete()
+        self.assertEqual(ImageBlob.objects.get(name=name).ref_count, 0)
+        self.assertIn(name, self._collect())
+        self.assertFalse(image_storage.exists(name))
+
+    def test_delete_uses_loaded_images(self):
+        """Test deleting recipes queries no image per recipe."""
+        def delete_recipes(count):
+            user = get_user_model().objects.create_user(
+                f'user{count}@example.com', 'password123',
+            )
+            for i in range(count):
+                Recipe.objects.create(
+                    user=user, title=f'Recipe {i}', time_minutes=5, price=5,
+                )
+            with CaptureQueriesContext(connection) as ctx:
+                Recipe.objects.filter(user=user).delete()
+            return len(ctx.captured_queries)
+
+        self.assertEqual(delete_recipes(3), delete_recipes(1))
+
+    def test_image_kept_within_grace(self):
+        """Test unused images are kept until the grace period ends."""
+        self._upload()
+        name = self.recipe.image.name
+        self.recipe.delete()
+
+        removed = images.collect_garbage(timedelta(hours=1))
+
+        self.assertEqual(removed, [])
+        self.assertTrue(image_storage.exists(name))
+
+    def test_files_without_blob_collected(self):
+        """Test files no blob accounts for are deleted."""
+        name = image_storage.save(
+            'uploads/recipe/image.jpg', ContentFile(b'rolled back'),
+        )
+
+        self.assertIn(name, self._collect())
+        self.assertFalse(image_storage.exists(name))
@@ -5,7 +5,9 @@ from decimal import Decimal
 
 from django.contrib.auth import get_user_model
 from django.urls import reverse
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from rest_framework import status
 from rest_framework.test import APIClient
@@ -139,3 +141,33 @@ class PrivateIngredientsApiTest(TestCase):
         res = self.client.get(INGREDIENTS_URL, {'assigned_only': 1})
 
         self.assertEqual(len(res.data), 1)
+
+    def test_ingredients_recipe_count(self):
+        """Test listing ingredients with the number of recipes using them."""
+        used = Ingredient.objects.create(user=self.user, name='Used')
+        Ingredient.objects.create(user=self.user, name='Unused')
+        for title in ['First', 'Second']:
+            recipe = Recipe.objects.create(
+                user=self.user,
+                title=title,
+                time_minutes=5,
+                price=Decimal('1.00'),
+            )
+            recipe.ingredients.add(used)
+
+        res = self.client.get(INGREDIENTS_URL, {'recipe_count': 1})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        counts = {item['name']: item['recipe_count'] for item in res.data}
+        self.assertEqual(counts, {'Used': 2, 'Unused': 0})
+
+    def test_assigned_only_uses_semi_join(self):
+        """Test assigned_only filters with EXISTS rather than DISTINCT."""
+        Ingredient.objects.create(user=self.user, name='Solo')
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(INGREDIENTS_URL, {'assigned_only': 1})
+
+        sql = ctx.captured_queries[-1]['sql']
+        self.assertIn('EXISTS', sql)
+        self.assertNotIn('DISTINCT', sql)
@@ -0,0 +1,151 @@
+"""
+Tests for keyset pagination of the recipe APIs.
+"""
+import base64
+import json
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.test import TestCase
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def create_recipe(user, title):
+    """Create and return a sample recipe."""
+    return Recipe.objects.create(
+        user=user,
+        title=title,
+        time_minutes=10,
+        price=Decimal('5.00'),
+    )
+
+
+class KeysetPaginationTests(TestCase):
+    """Test paginating list endpoints with cursors."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        self.client.force_authenticate(self.user)
+
+    def _walk(self, url, params):
+        """Follow next links and return the ids of every page."""
+        pages = []
+        res = self.client.get(url, params)
+        while True:
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            pages.append([item['id'] for item in res.data['results']])
+            if not res.data['next']:
+                return pages
+            res = self.client.get(res.data['next'])
+
+    def test_unpaginated_without_params(self):
+        """Test lists are plain when no pagination param is given."""
+        create_recipe(self.user, 'Soup')
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIsInstance(res.data, list)
+
+    def test_recipe_pages_follow_ordering(self):
+        """Test walking recipe pages returns every recipe once in order."""
+        recipes = [create_recipe(self.user, f'R{i}') for i in range(7)]
+
+        pages = self._walk(RECIPES_URL, {'page_size': 3})
+
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        ids = [recipe_id for page in pages for recipe_id in page]
+        self.assertEqual(ids, sorted((r.id for r in recipes), reverse=True))
+
+    def test_tag_pages_follow_name_ordering(self):
+        """Test walking tag pages follows the -name, -id ordering."""
+        for name in ['Beta', 'Alpha', 'Delta', 'Gamma']:
+            Tag.objects.create(user=self.user, name=name)
+
+        pages = self._walk(TAGS_URL, {'page_size': 3})
+
+        ids = [tag_id for page in pages for tag_id in page]
+        expected = Tag.objects.order_by('-name', '-id')
+        self.assertEqual(ids, [tag.id for tag in expected])
+
+    def test_cursor_stable_under_inserts(self):
+        """Test inserting rows does not shift the next page."""
+        for i in range(4):
+            create_recipe(self.user, f'R{i}')
+        res = self.client.get(RECIPES_URL, {'page_size': 2})
+        first_page = [item['id'] for item in res.data['results']]
+        expected_next = list(
+            Recipe.objects.filter(id__lt=first_page[-1])
+            .order_by('-id').values_list('id', flat=True)[:2]
+        )
+
+        create_recipe(self.user, 'New')
+        res = self.client.get(res.data['next'])
+
+        self.assertEqual(
+            [item['id'] for item in res.data['results']],
+            expected_next,
+        )
+
+    def test_previous_link(self):
+        """Test the previous link returns the prior page."""
+        for i in range(5):
+            create_recipe(self.user, f'R{i}')
+        first = self.client.get(RECIPES_URL, {'page_size': 2})
+        self.assertIsNone(first.data['previous'])
+        second = self.client.get(first.data['next'])
+
+        res = self.client.get(second.data['previous'])
+
+        self.assertEqual(res.data['results'], first.data['results'])
+        self.assertIsNone(res.data['previous'])
+
+    def test_page_query_count_constant(self):
+        """Test page size does not change the number of queries."""
+        for i in range(20):
+            recipe = create_recipe(self.user, f'R{i}')
+            recipe.tags.add(
+                Tag.objects.create(user=self.user, name=f'T{i}')
+            )
+
+        for page_size in [1, 5, 20]:
+            with self.assertNumQueries(3):
+                res = self.client.get(RECIPES_URL, {'page_size': page_size})
+            self.assertEqual(len(res.data['results']), page_size)
+
+    def test_invalid_cursor(self):
+        """Test a malformed cursor returns not found."""
+        res = self.client.get(RECIPES_URL, {'cursor': 'not-a-cursor'})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cursor_with_invalid_values(self):
+        """Test a cursor whose values do not fit the ordering is rejected."""
+        cursors = [
+            ({}, {'p': ['abc']}),
+            ({}, {'p': [None]}),
+            ({}, {'p': [{}]}),
+            ({}, {'p': [[1]]}),
+            ({'ordering': 'price'}, {'p': ['1.5', 'abc'], 'r': True}),
+        ]
+        for params, data in cursors:
+            cursor = base64.urlsafe_b64encode(
+                json.dumps(data).encode('utf-8')
+            ).decode('ascii')
+
+            res = self.client.get(RECIPES_URL, {**params, 'cursor': cursor})
+
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
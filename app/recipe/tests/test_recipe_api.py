@@ -9,7 +9,9 @@ import os
 from PIL import Image
 
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status
@@ -304,6 +306,51 @@ class PrivateRecipeAPITests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(recipe.tags.count(), 0)
 
+    def test_unchanged_patch_skips_through_table_writes(self):
+        """Test patching identical tags/ingredients writes no links."""
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Lunch'))
+        recipe.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Rice')
+        )
+
+        payload = {
+            'tags': [{'name': 'Lunch'}],
+            'ingredients': [{'name': 'Rice'}],
+        }
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.patch(
+                detail_url(recipe.id), payload, format='json'
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        through_writes = [
+            query['sql'] for query in ctx.captured_queries
+            if query['sql'].startswith(('INSERT', 'DELETE'))
+            and ('core_recipe_tags' in query['sql']
+                 or 'core_recipe_ingredients' in query['sql'])
+        ]
+        self.assertEqual(through_writes, [])
+
+    def test_partial_tag_change_keeps_existing_links(self):
+        """Test updating tags only touches links that changed."""
+        recipe = create_recipe(user=self.user)
+        keep = Tag.objects.create(user=self.user, name='Keep')
+        drop = Tag.objects.create(user=self.user, name='Drop')
+        recipe.tags.add(keep, drop)
+        through = Recipe.tags.through
+        keep_link = through.objects.get(recipe=recipe, tag=keep)
+
+        payload = {'tags': [{'name': 'Keep'}, {'name': 'New'}]}
+        res = self.client.patch(detail_url(recipe.id), payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            set(recipe.tags.values_list('name', flat=True)),
+            {'Keep', 'New'},
+        )
+        self.assertTrue(through.objects.filter(id=keep_link.id).exists())
+
     def test_create_recipe_with_ingredients(self):
         """Test crateing a recipe with new ingredients."""
         payload = {
@@ -394,6 +441,69 @@ class PrivateRecipeAPITests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(recipe.ingredients.count(), 0)
 
+    def _count_create_queries(self, tag_count, ingredient_count):
+        """Return the number of queries used to create a recipe."""
+        payload = {
+            'title': f'Recipe {tag_count}',
+            'time_minutes': 30,
+            'price': Decimal('2.50'),
+            'tags': [{'name': f'Tag {i}'} for i in range(tag_count)],
+            'ingredients': [
+                {'name': f'Ing {i}'} for i in range(ingredient_count)
+            ],
+        }
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        return len(ctx.captured_queries)
+
+    def test_create_nested_query_count_constant(self):
+        """Test creating nested tags/ingredients uses set-based queries."""
+        few = self._count_create_queries(2, 2)
+        ## noqa NOTE: The first two names of each now exist, the rest are new.
+        many = self._count_create_queries(30, 40)
+
+        self.assertEqual(few, many)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 30)
+        self.assertEqual(
+            Ingredient.objects.filter(user=self.user).count(), 40
+        )
+
+    def test_create_recipe_with_repeated_tag_names(self):
+        """Test repeated names in a payload create a single tag."""
+        payload = {
+            'title': 'Pongal',
+            'time_minutes': 60,
+            'price': Decimal('4.50'),
+            'tags': [{'name': 'Indian'}, {'name': 'Indian'}],
+        }
+
+        res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        recipe = Recipe.objects.get(id=res.data['id'])
+        self.assertEqual(recipe.tags.count(), 1)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+
+    def test_create_does_not_reuse_other_users_tags(self):
+        """Test tags with the same name of another user are not linked."""
+        other_user = create_user(email='other@example.com', password='pw123')
+        other_tag = Tag.objects.create(user=other_user, name='Vegan')
+        payload = {
+            'title': 'Salad',
+            'time_minutes': 5,
+            'price': Decimal('1.50'),
+            'tags': [{'name': 'Vegan'}],
+        }
+
+        res = self.client.post(RECIPES_URL, payload, format='json')
+
+        recipe = Recipe.objects.get(id=res.data['id'])
+        tag = recipe.tags.get()
+        self.assertEqual(tag.user, self.user)
+        self.assertNotEqual(tag, other_tag)
+
     def test_filter_by_tags(self):
         """Test filtering recipes by tags."""
         r1 = create_recipe(user=self.user, title='Thai Vegetable Curry')
@@ -436,6 +546,294 @@ class PrivateRecipeAPITests(TestCase):
         self.assertIn(s2.data, res.data)
         self.assertNotIn(s3.data, res.data)
 
+    def test_filter_by_tags_match_all(self):
+        """Test match=all returns recipes having every given tag."""
+        vegan = Tag.objects.create(user=self.user, name='Vegan')
+        quick = Tag.objects.create(user=self.user, name='Quick')
+        both = create_recipe(user=self.user, title='Salad')
+        both.tags.add(vegan, quick)
+        only_vegan = create_recipe(user=self.user, title='Stew')
+        only_vegan.tags.add(vegan)
+
+        params = {'tags': f'{vegan.id},{quick.id}', 'match': 'all'}
+        res = self.client.get(RECIPES_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['id'] for r in res.data], [both.id])
+
+    def test_filter_match_all_tags_and_ingredients(self):
+        """Test match=all applies to tags and ingredients together."""
+        tag = Tag.objects.create(user=self.user, name='Dinner')
+        rice = Ingredient.objects.create(user=self.user, name='Rice')
+        beans = Ingredient.objects.create(user=self.user, name='Beans')
+        r1 = create_recipe(user=self.user, title='Rice and beans')
+        r1.tags.add(tag)
+        r1.ingredients.add(rice, beans)
+        r2 = create_recipe(user=self.user, title='Fried rice')
+        r2.tags.add(tag)
+        r2.ingredients.add(rice)
+
+        params = {
+            'tags': f'{tag.id}',
+            'ingredients': f'{rice.id},{beans.id}',
+            'match': 'all',
+        }
+        res = self.client.get(RECIPES_URL, params)
+
+        self.assertEqual([r['id'] for r in res.data], [r1.id])
+
+    def test_filter_match_any_returns_each_recipe_once(self):
+        """Test recipes matching several ids are listed once."""
+        t1 = Tag.objects.create(user=self.user, name='Vegan')
+        t2 = Tag.objects.create(user=self.user, name='Quick')
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(t1, t2)
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(RECIPES_URL, {'tags': f'{t1.id},{t2.id}'})
+
+        self.assertEqual([r['id'] for r in res.data], [recipe.id])
+        self.assertIn('EXISTS', ctx.captured_queries[0]['sql'])
+        self.assertNotIn('DISTINCT', ctx.captured_queries[0]['sql'])
+
+    def test_filter_invalid_match(self):
+        """Test an unknown match mode returns an error."""
+        res = self.client.get(RECIPES_URL, {'tags': '1', 'match': 'some'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_filter_invalid_ids(self):
+        """Test ids that are not integers return an error."""
+        for params in [{'tags': 'abc'}, {'ingredients': '1,,2'}]:
+            res = self.client.get(RECIPES_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn(next(iter(params)), res.data)
+
+    def test_filter_by_max_time(self):
+        """Test filtering recipes taking at most max_time minutes."""
+        r1 = create_recipe(user=self.user, time_minutes=10)
+        r2 = create_recipe(user=self.user, time_minutes=30)
+        create_recipe(user=self.user, time_minutes=31)
+
+        res = self.client.get(RECIPES_URL, {'max_time': '30'})
+
+        self.assertEqual([r['id'] for r in res.data], [r2.id, r1.id])
+
+    def test_filter_by_price_range(self):
+        """Test filtering recipes by min_price and max_price."""
+        create_recipe(user=self.user, price=Decimal('4.99'))
+        r1 = create_recipe(user=self.user, price=Decimal('5.00'))
+        r2 = create_recipe(user=self.user, price=Decimal('10.00'))
+        create_recipe(user=self.user, price=Decimal('10.01'))
+
+        res = self.client.get(
+            RECIPES_URL, {'min_price': '5', 'max_price': '10.00'},
+        )
+
+        self.assertEqual([r['id'] for r in res.data], [r2.id, r1.id])
+
+    def test_filter_invalid_ranges(self):
+        """Test malformed range params return an error per param."""
+        res = self.client.get(
+            RECIPES_URL,
+            {'max_time': '-1', 'min_price': 'cheap', 'max_price': '1'},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(res.data), {'max_time', 'min_price'})
+
+    def test_ordering(self):
+        """Test sorting by an indexed column, ties broken by id."""
+        r1 = create_recipe(user=self.user, price=Decimal('7.00'))
+        r2 = create_recipe(user=self.user, price=Decimal('3.00'))
+        r3 = create_recipe(user=self.user, price=Decimal('7.00'))
+
+        res = self.client.get(RECIPES_URL, {'ordering': 'price'})
+        self.assertEqual([r['id'] for r in res.data], [r2.id, r1.id, r3.id])
+
+        res = self.client.get(RECIPES_URL, {'ordering': '-price'})
+        self.assertEqual([r['id'] for r in res.data], [r3.id, r1.id, r2.id])
+
+    def test_ordering_paginated(self):
+        """Test ordered lists can be paged through with cursors."""
+        recipes = [
+            create_recipe(user=self.user, time_minutes=minutes)
+            for minutes in (20, 5, 20, 10)
+        ]
+
+        ids = []
+        res = self.client.get(
+            RECIPES_URL,
+            {'ordering': 'time_minutes', 'max_time': 20, 'page_size': 1},
+        )
+        while True:
+            ids += [r['id'] for r in res.data['results']]
+            if not res.data['next']:
+                break
+            res = self.client.get(res.data['next'])
+
+        self.assertEqual(
+            ids, [recipes[i].id for i in (1, 3, 0, 2)],
+        )
+
+    def test_ordering_not_allowed(self):
+        """Test sorting by a column without an index is rejected."""
+        for ordering in ('title', '--price', 'user'):
+            res = self.client.get(RECIPES_URL, {'ordering': ordering})
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('ordering', res.data)
+
+    def test_fields_selects_output(self):
+        """Test only the fields named in fields are returned."""
+        recipe = create_recipe(user=self.user)
+
+        res = self.client.get(RECIPES_URL, {'fields': 'id,title'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [{'id': recipe.id, 'title': recipe.title}])
+
+    def test_expand_adds_detail_fields(self):
+        """Test expand adds fields to the default list output."""
+        recipe = create_recipe(user=self.user)
+
+        res = self.client.get(RECIPES_URL, {'expand': 'description'})
+
+        serializer = RecipeSerializer(recipe)
+        self.assertEqual(
+            res.data, [{**serializer.data, 'description': recipe.description}],
+        )
+
+    def test_fields_on_detail(self):
+        """Test fields and expand also apply to the recipe detail."""
+        recipe = create_recipe(user=self.user)
+
+        res = self.client.get(
+            detail_url(recipe.id), {'fields': 'title', 'expand': 'price'},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'title': recipe.title, 'price': '5.25'})
+
+    def test_fields_unknown_rejected(self):
+        """Test asking for a field that does not exist is rejected."""
+        res = self.client.get(
+            RECIPES_URL, {'fields': 'id,user', 'expand': 'secret'},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(res.data), {'fields', 'expand'})
+
+    def test_fields_ignored_on_write(self):
+        """Test updates return the full recipe whatever fields says."""
+        recipe = create_recipe(user=self.user)
+
+        res = self.client.patch(
+            detail_url(recipe.id) + '?fields=id', {'title': 'New title'},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['title'], 'New title')
+        self.assertIn('description', res.data)
+
+
+class RecipeQueryCountTests(TestCase):
+    """Test the number of queries made by recipe read endpoints."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email='user@example.com', password='test123')
+        self.client.force_authenticate(self.user)
+
+    def _create_recipes(self, count):
+        """Create recipes each having its own tag and ingredient."""
+        recipes = []
+        for i in range(count):
+            recipe = create_recipe(user=self.user, title=f'Recipe {i}')
+            recipe.tags.add(
+                Tag.objects.create(user=self.user, name=f'Tag {recipe.id}')
+            )
+            recipe.ingredients.add(
+                Ingredient.objects.create(
+                    user=self.user, name=f'Ing {recipe.id}',
+                )
+            )
+            recipes.append(recipe)
+        return recipes
+
+    def test_list_query_count_constant(self):
+        """Test listing recipes does not query once per recipe."""
+        for count in [1, 10, 25]:
+            self._create_recipes(count)
+            ## noqa NOTE: recipes + tags prefetch + ingredients prefetch.
+            with self.assertNumQueries(3):
+                res = self.client.get(RECIPES_URL)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_list_query_count_constant_with_filter(self):
+        """Test filtered recipe list does not query once per recipe."""
+        recipes = self._create_recipes(10)
+        tag_ids = ','.join(str(r.tags.first().id) for r in recipes)
+
+        with self.assertNumQueries(3):
+            res = self.client.get(RECIPES_URL, {'tags': tag_ids})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 10)
+
+    def test_retrieve_query_count(self):
+        """Test recipe detail loads nested objects with prefetches."""
+        recipe = self._create_recipes(1)[0]
+
+        ## noqa NOTE: ETag version + recipe + tags + ingredients.
+        with self.assertNumQueries(4):
+            res = self.client.get(detail_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, RecipeDetailSerializer(recipe).data)
+
+    def test_list_trims_detail_columns(self):
+        """Test list does not load detail-only columns."""
+        self._create_recipes(1)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(RECIPES_URL)
+
+        recipe_sql = ctx.captured_queries[0]['sql']
+        self.assertIn('"title"', recipe_sql)
+        self.assertNotIn('"description"', recipe_sql)
+        self.assertNotIn('"image"', recipe_sql)
+
+    def test_titles_only_list(self):
+        """Test a titles only list reads two columns and no relations."""
+        self._create_recipes(3)
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(RECIPES_URL, {'fields': 'id,title'})
+
+        self.assertEqual(len(res.data), 3)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        recipe_sql = ctx.captured_queries[0]['sql']
+        self.assertIn('"title"', recipe_sql)
+        self.assertNotIn('"price"', recipe_sql)
+        self.assertNotIn('"link"', recipe_sql)
+
+    def test_fields_paginated_by_unselected_column(self):
+        """Test the ordering column is loaded even if not returned."""
+        self._create_recipes(3)
+
+        ## noqa NOTE: No query per row for the cursor's time_minutes.
+        with self.assertNumQueries(1):
+            res = self.client.get(RECIPES_URL, {
+                'fields': 'title',
+                'ordering': 'time_minutes',
+                'page_size': 2,
+            })
+
+        self.assertEqual(len(res.data['results']), 2)
+        self.assertIsNotNone(res.data['next'])
+
 
 class ImageUploadTests(TestCase):
     """Tests for image upload API."""
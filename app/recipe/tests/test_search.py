@@ -0,0 +1,229 @@
+"""
+Tests for full-text search of recipes.
+"""
+import json
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.urls import reverse
+from django.test import TestCase, override_settings
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+from recipe import search
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+BULK_URL = reverse('recipe:recipe-bulk')
+
+
+def detail_url(recipe_id):
+    """Create and return a recipe detail URL."""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def create_recipe(user, title, description=''):
+    """Create and return a sample recipe."""
+    return Recipe.objects.create(
+        user=user,
+        title=title,
+        description=description,
+        time_minutes=10,
+        price=Decimal('5.00'),
+    )
+
+
+class SearchApiTests(TestCase):
+    """Test searching recipes with the search param."""
+
+    def setUp(self):
+        search.memory_index.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        self.client.force_authenticate(self.user)
+
+    def _search(self, text, **params):
+        res = self.client.get(RECIPES_URL, {'search': text, **params})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [item['id'] for item in res.data]
+
+    def test_title_ranked_above_description(self):
+        """Test a title match ranks above a description match."""
+        in_description = create_recipe(
+            self.user, 'Weeknight dinner', 'A quick curry with rice.',
+        )
+        in_title = create_recipe(self.user, 'Curry', 'Spicy.')
+        create_recipe(self.user, 'Pancakes', 'Sweet.')
+
+        self.assertEqual(
+            self._search('curry'), [in_title.id, in_description.id],
+        )
+
+    def test_every_word_required(self):
+        """Test recipes must contain all of the searched words."""
+        both = create_recipe(self.user, 'Chicken curry')
+        create_recipe(self.user, 'Chicken soup')
+
+        self.assertEqual(self._search('chicken curry'), [both.id])
+
+    def test_only_own_recipes(self):
+        """Test searching is limited to the user's recipes."""
+        other_user = get_user_model().objects.create_user(
+            'other@example.com',
+            'testpass123',
+        )
+        create_recipe(other_user, 'Curry')
+        own = create_recipe(self.user, 'Curry')
+
+        self.assertEqual(self._search('curry'), [own.id])
+
+    def test_no_match(self):
+        """Test an empty list is returned when nothing matches."""
+        create_recipe(self.user, 'Curry')
+
+        self.assertEqual(self._search('pancakes'), [])
+
+    def test_updated_recipe_reindexed(self):
+        """Test changing a title changes what the recipe is found by."""
+        recipe = create_recipe(self.user, 'Curry')
+        self.assertEqual(self._search('curry'), [recipe.id])
+
+        res = self.client.patch(detail_url(recipe.id), {'title': 'Pancakes'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(self._search('curry'), [])
+        self.assertEqual(self._search('pancakes'), [recipe.id])
+
+    def test_tags_and_ingredients_searchable(self):
+        """Test recipes are found by their tag and ingredient names."""
+        recipe = create_recipe(self.user, 'Dinner')
+        self.assertEqual(self._search('vegan'), [])
+
+        res = self.client.patch(
+            detail_url(recipe.id),
+            {'tags': [{'name': 'Vegan'}], 'ingredients': [{'name': 'Tofu'}]},
+            format='json',
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(self._search('vegan'), [recipe.id])
+        self.assertEqual(self._search('tofu'), [recipe.id])
+
+    def test_renamed_and_deleted_tag_reindexed(self):
+        """Test renaming or deleting a tag updates its recipes."""
+        recipe = create_recipe(self.user, 'Dinner')
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recipe.tags.add(tag)
+        self.assertEqual(self._search('vegan'), [recipe.id])
+
+        tag.name = 'Spicy'
+        tag.save()
+        self.assertEqual(self._search('vegan'), [])
+        self.assertEqual(self._search('spicy'), [recipe.id])
+
+        tag.delete()
+        self.assertEqual(self._search('spicy'), [])
+
+    def test_deleted_recipe_not_found(self):
+        """Test deleted recipes disappear from the results."""
+        recipe = create_recipe(self.user, 'Curry')
+        self.assertEqual(self._search('curry'), [recipe.id])
+
+        recipe.delete()
+
+        self.assertEqual(self._search('curry'), [])
+
+    def test_bulk_imported_recipes_indexed(self):
+        """Test recipes created by the bulk import are searchable."""
+        body = ''.join(json.dumps({
+            'title': title,
+            'time_minutes': 10,
+            'price': '5.00',
+            'tags': [{'name': 'Imported'}],
+        }) + '\n' for title in ('Curry', 'Soup'))
+
+        res = self.client.post(
+            BULK_URL, body, content_type='application/x-ndjson',
+        )
+        b''.join(res.streaming_content)
+
+        self.assertEqual(len(self._search('imported')), 2)
+        self.assertEqual(len(self._search('curry')), 1)
+
+    def test_search_combined_with_filters(self):
+        """Test search applies on top of the tag filter."""
+        tag = Tag.objects.create(user=self.user, name='Dinner')
+        tagged = create_recipe(self.user, 'Curry')
+        tagged.tags.add(tag)
+        create_recipe(self.user, 'Curry')
+
+        self.assertEqual(
+            self._search('curry', tags=str(tag.id)), [tagged.id],
+        )
+
+    def test_search_paginated(self):
+        """Test ranked results can be paged through with cursors."""
+        in_title = create_recipe(self.user, 'Curry', 'Curry.')
+        older = create_recipe(self.user, 'Dinner', 'Curry.')
+        newer = create_recipe(self.user, 'Lunch', 'Curry.')
+
+        ids = []
+        res = self.client.get(RECIPES_URL, {'search': 'curry', 'page_size': 1})
+        while True:
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            ids += [item['id'] for item in res.data['results']]
+            if not res.data['next']:
+                break
+            res = self.client.get(res.data['next'])
+
+        ## noqa NOTE: Equal ranks come newest first.
+        self.assertEqual(ids, [in_title.id, newer.id, older.id])
+
+
+@override_settings(RECIPE_SEARCH_BACKEND='memory')
+class MemorySearchApiTests(SearchApiTests):
+    """Run the search tests against the in-process inverted index."""
+
+    def test_index_built_from_database(self):
+        """Test the index reads existing recipes on first search."""
+        recipe = create_recipe(self.user, 'Curry')
+        search.memory_index.clear()
+
+        self.assertEqual(self._search('curry'), [recipe.id])
+
+
+class PostgresSearchTests(TestCase):
+    """Test the search vector kept in PostgreSQL."""
+
+    def setUp(self):
+        if connection.vendor != 'postgresql':
+            self.skipTest('Needs PostgreSQL.')
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+
+    def test_search_vector_weights(self):
+        """Test the vector weights title, description and tags."""
+        recipe = create_recipe(self.user, 'Curry', 'Rice')
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+
+        vector = Recipe.objects.filter(pk=recipe.pk).values_list(
+            'search_vector', flat=True,
+        ).get()
+
+        self.assertEqual(vector, "'curri':1A 'rice':2B 'vegan':3C")
+
+    def test_search_vector_not_loaded(self):
+        """Test recipes are loaded without their search vector."""
+        recipe = create_recipe(self.user, 'Curry')
+
+        loaded = Recipe.objects.get(pk=recipe.pk)
+
+        self.assertIn('search_vector', loaded.get_deferred_fields())
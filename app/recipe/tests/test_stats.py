@@ -0,0 +1,150 @@
+"""
+Tests for the recipe statistics API.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.test import TestCase, override_settings
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+from recipe import cache
+
+
+STATS_URL = reverse('recipe:stats')
+
+
+def create_recipe(user, time_minutes=10, price='5.00'):
+    """Create and return a sample recipe."""
+    return Recipe.objects.create(
+        user=user,
+        title='Sample recipe',
+        time_minutes=time_minutes,
+        price=Decimal(price),
+    )
+
+
+class PublicStatsApiTests(TestCase):
+    """Test unauthenticated API requests."""
+
+    def test_auth_required(self):
+        """Test auth is required to call the API."""
+        res = APIClient().get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateStatsApiTests(TestCase):
+    """Test authenticated API requests."""
+
+    def setUp(self):
+        cache.get_cache().clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_empty_collection(self):
+        """Test the statistics of a user without recipes."""
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['recipe_count'], 0)
+        self.assertIsNone(res.data['avg_time_minutes'])
+        self.assertIsNone(res.data['avg_price'])
+        self.assertEqual(res.data['price_histogram'], [])
+        self.assertEqual(res.data['top_tags'], [])
+
+    def test_summary(self):
+        """Test counts, averages and ranges of the user's recipes."""
+        create_recipe(self.user, time_minutes=10, price='2.00')
+        create_recipe(self.user, time_minutes=20, price='3.00')
+        create_recipe(self.user, time_minutes=60, price='7.50')
+        other_user = get_user_model().objects.create_user(
+            'other@example.com',
+            'testpass123',
+        )
+        create_recipe(other_user, time_minutes=500, price='99.00')
+
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.data['recipe_count'], 3)
+        self.assertEqual(res.data['avg_time_minutes'], 30)
+        self.assertEqual(res.data['min_time_minutes'], 10)
+        self.assertEqual(res.data['max_time_minutes'], 60)
+        self.assertEqual(res.data['avg_price'], '4.17')
+        self.assertEqual(res.data['min_price'], '2.00')
+        self.assertEqual(res.data['max_price'], '7.50')
+
+    def test_price_histogram(self):
+        """Test recipes are counted in price buckets."""
+        for price in ('0.50', '4.99', '5.00', '17.25'):
+            create_recipe(self.user, price=price)
+
+        with self.settings(RECIPE_STATS_PRICE_BUCKET=Decimal('5.00')):
+            res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.data['price_histogram'], [
+            {'min_price': '0.00', 'max_price': '5.00', 'count': 2},
+            {'min_price': '5.00', 'max_price': '10.00', 'count': 1},
+            {'min_price': '15.00', 'max_price': '20.00', 'count': 1},
+        ])
+
+    @override_settings(RECIPE_STATS_TOP=2)
+    def test_most_used_tags_and_ingredients(self):
+        """Test the most used tags and ingredients come first."""
+        vegan = Tag.objects.create(user=self.user, name='Vegan')
+        quick = Tag.objects.create(user=self.user, name='Quick')
+        dinner = Tag.objects.create(user=self.user, name='Dinner')
+        Tag.objects.create(user=self.user, name='Unused')
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+        for tags in ([vegan, quick], [vegan, dinner], [vegan, quick]):
+            recipe = create_recipe(self.user)
+            recipe.tags.add(*tags)
+            recipe.ingredients.add(salt)
+
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.data['top_tags'], [
+            {'id': vegan.id, 'name': 'Vegan', 'recipe_count': 3},
+            {'id': quick.id, 'name': 'Quick', 'recipe_count': 2},
+        ])
+        self.assertEqual(res.data['top_ingredients'], [
+            {'id': salt.id, 'name': 'Salt', 'recipe_count': 3},
+        ])
+
+    def test_cached_until_write(self):
+        """Test statistics are served from cache until recipes change."""
+        create_recipe(self.user)
+        res = self.client.get(STATS_URL)
+        self.assertEqual(res['X-Cache'], 'MISS')
+
+        with self.assertNumQueries(0):
+            res = self.client.get(STATS_URL)
+        self.assertEqual(res['X-Cache'], 'HIT')
+        self.assertEqual(res.data['recipe_count'], 1)
+
+        create_recipe(self.user)
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(res.data['recipe_count'], 2)
+
+    def test_not_modified(self):
+        """Test a matching If-None-Match gets a 304 until recipes change."""
+        res = self.client.get(STATS_URL)
+        etag = res['ETag']
+
+        res = self.client.get(STATS_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        create_recipe(self.user)
+        res = self.client.get(STATS_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['recipe_count'], 1)
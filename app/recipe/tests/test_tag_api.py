@@ -5,7 +5,9 @@ from decimal import Decimal
 
 from django.contrib.auth import get_user_model
 from django.urls import reverse
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from rest_framework import status
 from rest_framework.test import APIClient
@@ -90,6 +92,17 @@ class PrivateTagsApiTest(TestCase):
         tag.refresh_from_db()
         self.assertEqual(tag.name, payload['name'])
 
+    def test_update_tag_duplicate_name_error(self):
+        """Test renaming a tag to an existing name returns an error."""
+        Tag.objects.create(user=self.user, name='Dinner')
+        tag = Tag.objects.create(user=self.user, name='Supper')
+
+        res = self.client.patch(detail_url(tag.id), {'name': 'Dinner'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        tag.refresh_from_db()
+        self.assertEqual(tag.name, 'Supper')
+
     def test_delete_tag(self):
         """Test deleting a tag."""
         tag = Tag.objects.create(user=self.user, name='Breakfast')
@@ -142,3 +155,41 @@ class PrivateTagsApiTest(TestCase):
         res = self.client.get(TAGS_URL, {'assigned_only': 1})
 
         self.assertEqual(len(res.data), 1)
+
+    def test_tags_recipe_count(self):
+        """Test listing tags with the number of recipes using them."""
+        used = Tag.objects.create(user=self.user, name='Used')
+        Tag.objects.create(user=self.user, name='Unused')
+        for title in ['First', 'Second']:
+            recipe = Recipe.objects.create(
+                user=self.user,
+                title=title,
+                time_minutes=5,
+                price=Decimal('1.00'),
+            )
+            recipe.tags.add(used)
+
+        res = self.client.get(TAGS_URL, {'recipe_count': 1})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        counts = {item['name']: item['recipe_count'] for item in res.data}
+        self.assertEqual(counts, {'Used': 2, 'Unused': 0})
+
+    def test_invalid_flags(self):
+        """Test flags other than 0 or 1 are rejected."""
+        for params in [{'recipe_count': 'yes'}, {'assigned_only': 2}]:
+            res = self.client.get(TAGS_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn(next(iter(params)), res.data)
+
+    def test_assigned_only_uses_semi_join(self):
+        """Test assigned_only filters with EXISTS rather than DISTINCT."""
+        Tag.objects.create(user=self.user, name='Solo')
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(TAGS_URL, {'assigned_only': 1})
+
+        sql = ctx.captured_queries[-1]['sql']
+        self.assertIn('EXISTS', sql)
+        self.assertNotIn('DISTINCT', sql)
@@ -0,0 +1,148 @@
+"""
+Tests for streaming recipe image uploads.
+"""
+import io
+import os
+import tracemalloc
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient, APIRequestFactory
+
+from core.models import Recipe
+from recipe import uploads
+from recipe.views import RecipeViewSet
+
+
+def image_upload_url(recipe_id):
+    """Create and return an image upload URL."""
+    return reverse('recipe:recipe-upload-image', args=[recipe_id])
+
+
+def make_image(size, image_format='BMP'):
+    """Return an in-memory image file of a given size."""
+    image_file = io.BytesIO()
+    Image.new('RGB', size).save(image_file, format=image_format)
+    image_file.name = f'image.{image_format.lower()}'
+    image_file.seek(0)
+    return image_file
+
+
+class StreamingUploadTests(TestCase):
+    """Tests for the streamed image upload path."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'password123',
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Sample recipe',
+            time_minutes=5,
+            price=5,
+        )
+        self.temp_files = set(os.listdir(uploads.upload_temp_dir()))
+
+    def tearDown(self):
+        self.recipe.refresh_from_db()
+        self.recipe.image.delete()
+        ## noqa NOTE: Nothing may be left behind in the temporary directory.
+        self.assertEqual(
+            set(os.listdir(uploads.upload_temp_dir())), self.temp_files,
+        )
+
+    def test_upload_moves_file_into_place(self):
+        """Test the streamed file ends up under uploads/recipe."""
+        res = self.client.post(
+            image_upload_url(self.recipe.id),
+            {'image': make_image((64, 48))},
+            format='multipart',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        self.assertTrue(self.recipe.image.name.startswith('uploads/recipe/'))
+        with Image.open(self.recipe.image.path) as image:
+            self.assertEqual(image.size, (64, 48))
+
+    @override_settings(IMAGE_UPLOAD_MAX_BYTES=1000)
+    def test_upload_over_byte_limit_rejected(self):
+        """Test a file crossing the byte limit is cut off with a 413."""
+        res = self.client.post(
+            image_upload_url(self.recipe.id),
+            {'image': make_image((40, 40))},
+            format='multipart',
+        )
+
+        self.assertEqual(
+            res.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        )
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+
+    @override_settings(IMAGE_UPLOAD_MAX_BYTES=1000)
+    def test_body_over_byte_limit_rejected_up_front(self):
+        """Test a body longer than the limit is rejected unread."""
+        res = self.client.post(
+            image_upload_url(self.recipe.id),
+            {'image': make_image((200, 200))},
+            format='multipart',
+        )
+
+        self.assertEqual(
+            res.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        )
+
+    @override_settings(IMAGE_UPLOAD_MAX_PIXELS=1000)
+    def test_upload_over_pixel_limit_rejected(self):
+        """Test an image with too many pixels is rejected."""
+        res = self.client.post(
+            image_upload_url(self.recipe.id),
+            {'image': make_image((50, 50), 'PNG')},
+            format='multipart',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('image', res.data)
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+
+    def test_read_image_size_from_header(self):
+        """Test the size is read from a partial file."""
+        data = make_image((300, 200), 'PNG').getvalue()
+
+        self.assertEqual(uploads.read_image_size(data[:64]), (300, 200))
+        self.assertIsNone(uploads.read_image_size(b'notanimage'))
+
+    def test_upload_memory_stays_below_file_size(self):
+        """Test uploading a large image does not hold it in memory."""
+        image_file = make_image((1600, 1200))
+        file_size = len(image_file.getvalue())
+        request = APIRequestFactory().post(
+            image_upload_url(self.recipe.id),
+            {'image': image_file},
+            format='multipart',
+        )
+        view = RecipeViewSet.as_view({'post': 'upload_image'})
+        ## noqa NOTE: force_authenticate on the factory request.
+        request._force_auth_user = self.user
+
+        tracemalloc.start()
+        try:
+            res = view(request, pk=self.recipe.id)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+            request.close()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertGreater(file_size, 5 * 2 ** 20)
+        self.assertLess(peak, file_size / 10)
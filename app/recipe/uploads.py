@@ -0,0 +1,134 @@
+"""
+Streaming upload of recipe images.
+"""
+import io
+import os
+import tempfile
+
+from PIL import Image
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import (
+    StopUpload,
+    TemporaryFileUploadHandler,
+)
+from django.utils.translation import gettext as _
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+## noqa NOTE: Bytes of a file searched for the image size before leaving
+## noqa   the check to the image field validation.
+HEADER_BYTES = 256 * 2 ** 10
+## noqa NOTE: Room for the multipart boundaries and headers around the file.
+MULTIPART_OVERHEAD = 16 * 2 ** 10
+## noqa NOTE: Media directory of in-flight uploads, on the same volume so
+## noqa   finished ones can be renamed into place.
+TEMP_DIR = os.path.join('uploads', 'tmp')
+
+
+class ImageTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = _('The image file is too large.')
+    default_code = 'image_too_large'
+
+
+def upload_temp_dir():
+    """Return the directory of in-flight uploads on the media volume."""
+    path = os.path.join(settings.MEDIA_ROOT, TEMP_DIR)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def read_image_size(data):
+    """Return the (width, height) in an image header or None."""
+    try:
+        ## noqa NOTE: open() only parses the header, no pixels are decoded.
+        with Image.open(io.BytesIO(data)) as image:
+            return image.size
+    except Exception:
+        return None
+
+
+def check_pixels(size):
+    """Raise ValidationError if an image has too many pixels."""
+    width, height = size
+    if width * height > settings.IMAGE_UPLOAD_MAX_PIXELS:
+        raise ValidationError({'image': [
+            _('The image may have at most %(max)d pixels.') % {
+                'max': settings.IMAGE_UPLOAD_MAX_PIXELS,
+            },
+        ]})
+
+
+class MediaTemporaryUploadedFile(TemporaryUploadedFile):
+    """An upload spooled to a temporary file on the media volume.
+
+    Saving it to the file system storage renames it into place instead
+    of copying it.
+    """
+
+    def __init__(self, name, content_type, size, charset,
+                 content_type_extra=None):
+        ext = os.path.splitext(name)[1]
+        file = tempfile.NamedTemporaryFile(
+            suffix='.upload' + ext, dir=upload_temp_dir(),
+        )
+        super(TemporaryUploadedFile, self).__init__(
+            file, name, content_type, size, charset, content_type_extra,
+        )
+
+
+class RecipeImageUploadHandler(TemporaryFileUploadHandler):
+    """Write uploaded images to disk chunk by chunk, enforcing limits.
+
+    The body is never held in memory. Uploads over the byte limit are
+    cut off as soon as it is crossed and images with too many pixels as
+    soon as their header arrives, before anything is decoded. The
+    reason is kept in `error` for the view to raise.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.max_bytes = settings.IMAGE_UPLOAD_MAX_BYTES
+        self.error = None
+        self._header = None
+
+    def _stop(self, error):
+        self.error = error
+        raise StopUpload(connection_reset=True)
+
+    def handle_raw_input(self, input_data, META, content_length, boundary,
+                         encoding=None):
+        if content_length > self.max_bytes + MULTIPART_OVERHEAD:
+            ## noqa NOTE: Raised from new_file, where the parser catches it.
+            self.error = ImageTooLarge()
+
+    def new_file(self, *args, **kwargs):
+        if self.error is not None:
+            raise StopUpload(connection_reset=True)
+        super(TemporaryFileUploadHandler, self).new_file(*args, **kwargs)
+        self.file = MediaTemporaryUploadedFile(
+            self.file_name, self.content_type, 0, self.charset,
+            self.content_type_extra,
+        )
+        self._header = bytearray()
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > self.max_bytes:
+            self._stop(ImageTooLarge())
+        if self._header is not None:
+            self._check_header(raw_data)
+        self.file.write(raw_data)
+
+    def _check_header(self, raw_data):
+        self._header += raw_data
+        size = read_image_size(bytes(self._header))
+        if size is None and len(self._header) < HEADER_BYTES:
+            return
+        self._header = None
+        if size is not None:
+            try:
+                check_pixels(size)
+            except ValidationError as error:
+                self._stop(error)
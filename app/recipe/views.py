@@ -7,19 +7,66 @@ from drf_spectacular.utils import (
     OpenApiParameter,
     OpenApiTypes,
 )
+from django.db import IntegrityError, transaction
+from django.db.models import (
+    Count,
+    Exists,
+    Max,
+    OuterRef,
+    Prefetch,
+    Subquery,
+)
+from django.db.models.functions import Coalesce
+from django.http import StreamingHttpResponse
+from django.utils.translation import gettext as _
 from rest_framework import (
     viewsets,
     mixins,
     status
 )
 
+from rest_framework import serializers as drf_serializers
 from rest_framework.decorators import action
+from rest_framework.fields import empty
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from rest_framework.authentication import TokenAuthentication
+from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 
+from core.asyncviews import AsyncViewMixin
+from core.db.routers import ReplicaReadMixin
 from core.models import Recipe, Tag, Ingredient
-from recipe import serializers
+from recipe import (
+    autocomplete,
+    bulk,
+    cache,
+    etags,
+    images,
+    search,
+    serializers,
+    stats,
+    uploads,
+)
+from recipe.cache import CachedListMixin
+from recipe.etags import ConditionalMixin
+from user.authentication import CachingTokenAuthentication
+
+
+## noqa NOTE: Sparse fieldsets, accepted by the recipe list and detail.
+FIELDS_PARAMETERS = [
+    OpenApiParameter(
+        'fields',
+        OpenApiTypes.STR,
+        description="""Comma separated list of the fields to return
+        instead of the default ones.""",
+    ),
+    OpenApiParameter(
+        'expand',
+        OpenApiTypes.STR,
+        description="""Comma separated list of fields to return on top
+        of the default (or selected) ones, e.g. description,image.""",
+    ),
+]
 
 
 ## noqa NOTE: Allows to extend the autogenerated Schema by drf_spectacular.
@@ -38,49 +85,293 @@ from recipe import serializers
                 OpenApiTypes.STR,
                 description="""Comma separated list of
                 Ingredient IDs to filter.""",
-            )
+            ),
+            OpenApiParameter(
+                'match',
+                OpenApiTypes.STR, enum=['any', 'all'],
+                description="""Return recipes having any (default) or
+                all of the given tags/ingredients.""",
+            ),
+            OpenApiParameter(
+                'max_time',
+                OpenApiTypes.INT,
+                description='Only recipes taking at most this many minutes.',
+            ),
+            OpenApiParameter(
+                'min_price',
+                OpenApiTypes.DECIMAL,
+                description='Only recipes costing at least this much.',
+            ),
+            OpenApiParameter(
+                'max_price',
+                OpenApiTypes.DECIMAL,
+                description='Only recipes costing at most this much.',
+            ),
+            OpenApiParameter(
+                'ordering',
+                OpenApiTypes.STR,
+                enum=[
+                    'id', '-id', 'time_minutes', '-time_minutes',
+                    'price', '-price',
+                ],
+                description="""Sort by an indexed column, prefix with "-"
+                for descending. Defaults to -id, or to rank when
+                searching.""",
+            ),
+            OpenApiParameter(
+                'search',
+                OpenApiTypes.STR,
+                description="""Words to search for in title, description,
+                tags and ingredients; results are ranked best first.""",
+            ),
+            *FIELDS_PARAMETERS,
         ]
-    )
+    ),
+    retrieve=extend_schema(parameters=FIELDS_PARAMETERS),
 )
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(
+    AsyncViewMixin,
+    ReplicaReadMixin,
+    ConditionalMixin,
+    CachedListMixin,
+    viewsets.ModelViewSet,
+):
     """View for manage recipe APIs."""
     ## noqa NOTE: Configurations for class, queryset --> to specify the model to be managed.
     serializer_class = serializers.RecipeDetailSerializer
     queryset = Recipe.objects.all()
     ## noqa NOTE: Inorder to access any enpoint in this class need to be tokenauthenticated and needs to be authenticated as well
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachingTokenAuthentication]
     permission_classes = [IsAuthenticated]
+    ## noqa NOTE: Rows written per transaction / read per cursor fetch in bulk.
+    bulk_batch_size = 500
+    bulk_chunk_size = 2000
+
+    ## noqa NOTE: Only columns with a (user, column, id) index may be sorted on.
+    ordering_fields = ('id', 'time_minutes', 'price')
+    ## noqa NOTE: Range filters, query param -> (lookup, validating field).
+    range_filters = {
+        'max_time': (
+            'time_minutes__lte', drf_serializers.IntegerField(min_value=0),
+        ),
+        'min_price': (
+            'price__gte',
+            drf_serializers.DecimalField(max_digits=5, decimal_places=2),
+        ),
+        'max_price': (
+            'price__lte',
+            drf_serializers.DecimalField(max_digits=5, decimal_places=2),
+        ),
+    }
+
+    ## noqa NOTE: Validates each id given to the tags/ingredients filters.
+    id_field = drf_serializers.IntegerField()
 
-    def _params_to_ints(self, qs):
+    ## noqa NOTE: Relations returned as nested objects, loaded by prefetching.
+    nested_fields = ('tags', 'ingredients')
+
+    def _params_to_ints(self, name, qs):
         """Convert list of strings to integers"""
-        return [int(str_id) for str_id in qs.split(',')]
+        try:
+            return [
+                self.id_field.run_validation(str_id)
+                for str_id in qs.split(',')
+            ]
+        except ValidationError as exc:
+            raise ValidationError({name: exc.detail})
+
+    def _filter_ranges(self, query_set):
+        """Apply the range filters given in the query params."""
+        errors = {}
+        for param, (lookup, field) in self.range_filters.items():
+            value = self.request.query_params.get(param)
+            if value is None:
+                continue
+            try:
+                value = field.run_validation(value)
+            except ValidationError as exc:
+                errors[param] = exc.detail
+                continue
+            query_set = query_set.filter(**{lookup: value})
+        if errors:
+            raise ValidationError(errors)
+        return query_set
+
+    def _get_ordering(self):
+        """Return the requested ordering with an id tiebreak, or None."""
+        ordering = self.request.query_params.get('ordering')
+        if ordering is None:
+            return None
+        field = ordering.lstrip('-')
+        if field not in self.ordering_fields or ordering.count('-') > 1:
+            raise ValidationError({'ordering': [
+                _('Must be one of %(fields)s, optionally prefixed by "-".')
+                % {'fields': ', '.join(self.ordering_fields)},
+            ]})
+        if field == 'id':
+            return [ordering]
+        return [ordering, '-id' if ordering.startswith('-') else 'id']
+
+    def _get_requested_fields(self):
+        """Return the fields selected by fields/expand, or None."""
+        if hasattr(self, '_requested_fields'):
+            return self._requested_fields
+        self._requested_fields = None
+        params = self.request.query_params
+        if (
+            self.action not in ('list', 'retrieve')
+            or not ('fields' in params or 'expand' in params)
+        ):
+            return None
+
+        allowed = serializers.RecipeDetailSerializer.Meta.fields
+        if self.action == 'list':
+            default = serializers.RecipeSerializer.Meta.fields
+        else:
+            default = allowed
+        requested = {}
+        errors = {}
+        for param in ('fields', 'expand'):
+            names = [
+                name.strip() for name in params.get(param, '').split(',')
+                if name.strip()
+            ]
+            unknown = [name for name in names if name not in allowed]
+            if unknown:
+                errors[param] = [
+                    _('Unknown fields: %(unknown)s. Choose from %(allowed)s.')
+                    % {
+                        'unknown': ', '.join(unknown),
+                        'allowed': ', '.join(allowed),
+                    },
+                ]
+            requested[param] = names
+        if errors:
+            raise ValidationError(errors)
+
+        selected = set(requested['fields'] or default)
+        selected.update(requested['expand'])
+        self._requested_fields = [name for name in allowed if name in selected]
+        return self._requested_fields
+
+    def _filter_related(self, query_set, field_name, ids, match_all):
+        """Filter recipes linked to any (or all) of the given ids."""
+        field = Recipe._meta.get_field(field_name)
+        column = field.m2m_reverse_field_name()
+        ## noqa NOTE: Semi-joins on the through table need no DISTINCT.
+        links = field.remote_field.through.objects.filter(
+            **{field.m2m_field_name(): OuterRef('pk')}
+        )
+        if not match_all:
+            return query_set.filter(
+                Exists(links.filter(**{f'{column}__in': ids}))
+            )
+
+        ## noqa NOTE: One EXISTS per id, each an index lookup on the through table.
+        for obj_id in sorted(set(ids)):
+            query_set = query_set.filter(
+                Exists(links.filter(**{column: obj_id}))
+            )
+        return query_set
 
     ## noqa NOTE: override queryset to get only the items of user.
     def get_queryset(self):
         """Retrive recipes for authenticated user."""
         tags = self.request.query_params.get('tags')
         ingredients = self.request.query_params.get('ingredients')
-        query_set = self.queryset
+        match = self.request.query_params.get('match', 'any')
+        if match not in ('any', 'all'):
+            raise ValidationError({'match': [_('Must be "any" or "all".')]})
+        match_all = match == 'all'
+
+        query_set = self.queryset.filter(user=self.request.user)
         if tags:
-            tag_ids = self._params_to_ints(tags)
-            query_set = query_set.filter(tags__id__in=tag_ids)
+            tag_ids = self._params_to_ints('tags', tags)
+            query_set = self._filter_related(
+                query_set, 'tags', tag_ids, match_all,
+            )
         if ingredients:
-            ingredient_ids = self._params_to_ints(ingredients)
-            query_set = query_set.filter(ingredients__id__in=ingredient_ids)
+            ingredient_ids = self._params_to_ints('ingredients', ingredients)
+            query_set = self._filter_related(
+                query_set, 'ingredients', ingredient_ids, match_all,
+            )
+
+        query_set = self._filter_ranges(query_set)
+
+        ordering = self._get_ordering()
+        search_text = self.request.query_params.get('search', '').strip()
+        if search_text:
+            ## noqa NOTE: Ranked best first, ties newest first.
+            query_set = search.search(query_set, search_text)
+        if ordering or not search_text:
+            query_set = query_set.order_by(*(ordering or ['-id']))
+
+        return self._optimize_queryset(query_set)
+
+    def _optimize_queryset(self, query_set):
+        """Trim columns and prefetch nested objects for read actions."""
+        ## noqa NOTE: Writes need the full row, so only list/retrieve are trimmed.
+        if self.action not in ('list', 'retrieve', 'bulk'):
+            return query_set
+
+        fields = (
+            self._get_requested_fields()
+            or self.get_serializer_class().Meta.fields
+        )
+        columns = [
+            field for field in fields if field not in self.nested_fields
+        ]
+        ## noqa NOTE: The pagination cursor reads the ordering columns.
+        concrete = {field.name for field in Recipe._meta.concrete_fields}
+        for field in query_set.query.order_by:
+            if field.lstrip('-') in concrete:
+                columns.append(field.lstrip('-'))
+        query_set = query_set.only(*columns)
+        if self.action == 'bulk':
+            ## noqa NOTE: Export prefetches per chunk of its server-side cursor.
+            return query_set
 
-        return query_set.filter(
-            user=self.request.user
-        ).order_by('-id').distinct()
+        ## noqa NOTE: One query per relation instead of two per recipe (N+1),
+        ## noqa   and none for relations left out of the requested fields.
+        related = {'tags': Tag, 'ingredients': Ingredient}
+        return query_set.prefetch_related(*[
+            Prefetch(field, queryset=related[field].objects.only('id', 'name'))
+            for field in self.nested_fields if field in fields
+        ])
+
+    def get_object_version(self, pk):
+        """Return the change markers of a recipe and its nested objects."""
+        version = Recipe.objects.filter(
+            pk=pk, user=self.request.user,
+        ).annotate(
+            tags_updated=Max('tags__updated_at'),
+            tags_count=Count('tags', distinct=True),
+            ingredients_updated=Max('ingredients__updated_at'),
+            ingredients_count=Count('ingredients', distinct=True),
+        ).values_list(
+            'id', 'updated_at', 'tags_updated', 'tags_count',
+            'ingredients_updated', 'ingredients_count',
+        ).first()
+        if version is None:
+            return None
+        ## noqa NOTE: A sparse body must not validate the full one.
+        return (*version, self._get_requested_fields())
 
     def get_serializer_class(self):
         """Return the serializer class for request."""
-        if self.action == 'list':
+        if self.action == 'list' and self._get_requested_fields() is None:
             return serializers.RecipeSerializer
         if self.action == 'upload_image':
             return serializers.RecipeImageSerializer
 
         return self.serializer_class
 
+    def get_serializer_context(self):
+        """Add the fields requested through fields/expand."""
+        context = super().get_serializer_context()
+        context['recipe_fields'] = self._get_requested_fields()
+        return context
+
     def perform_create(self, serializer):
         """Create a new recipe."""
         serializer.save(user=self.request.user)
@@ -90,16 +381,51 @@ class RecipeViewSet(viewsets.ModelViewSet):
         """Upload an image to recipe."""
         ## noqa NOTE: gets the object here from Recipe class.
         recipe = self.get_object()
+        ## noqa NOTE: Stream the body to the media volume instead of letting
+        ## noqa   Django buffer it, the limits are checked while it arrives.
+        handler = uploads.RecipeImageUploadHandler(request._request)
+        request._request.upload_handlers = [handler]
+        data = request.data
+        if handler.error is not None:
+            raise handler.error
         ## noqa NOTE: passes to the get_serilaizer_class method..
         ## noqa       where the serializer is determined and then the data is passed over.
-        serializer = self.get_serializer(recipe, data=request.data)
+        serializer = self.get_serializer(recipe, data=data)
 
         if serializer.is_valid():
-            serializer.save()
+            ## noqa NOTE: Variants are made in the background after the response.
+            recipe = serializer.save(image_variants={})
+            images.enqueue_variants(recipe)
             return Response(serializer.data, status=status.HTTP_200_OK)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @extend_schema(
+        description="""Stream recipes as NDJSON (GET) or create recipes
+        from an NDJSON body, one recipe per line, returning one NDJSON
+        result line per input line (POST).""",
+    )
+    @action(methods=['GET', 'POST'], detail=False, url_path='bulk')
+    def bulk(self, request):
+        """Import or export recipes as newline delimited JSON."""
+        context = self.get_serializer_context()
+        if request.method == 'GET':
+            queryset = self.get_queryset()
+            ## noqa NOTE: Streamed after the view returns, bind the database now.
+            lines = bulk.export_recipes(
+                queryset.using(queryset.db), context, self.bulk_chunk_size,
+            )
+            return StreamingHttpResponse(
+                lines, content_type='application/x-ndjson',
+            )
+
+        ## noqa NOTE: Read the body line by line instead of parsing request.data.
+        stream = request.stream or []
+        lines = bulk.import_recipes(stream, context, self.bulk_batch_size)
+        return StreamingHttpResponse(
+            lines, content_type='application/x-ndjson',
+        )
+
 
 @extend_schema_view(
     list=extend_schema(
@@ -108,40 +434,166 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 'assigned_only',
                 OpenApiTypes.INT, enum=[0, 1],
                 description='Filter by items assigned to recipes.'
-            )
+            ),
+            OpenApiParameter(
+                'recipe_count',
+                OpenApiTypes.INT, enum=[0, 1],
+                description='Include the number of recipes using each item.'
+            ),
         ]
-    )
+    ),
+    autocomplete=extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'q',
+                OpenApiTypes.STR,
+                description='Case-insensitive prefix of the names to return.',
+            ),
+            OpenApiParameter(
+                'limit',
+                OpenApiTypes.INT,
+                description='Number of names to return, 10 by default.',
+            ),
+        ],
+    ),
 )
 class BaseRecipeAttrViewSet(
+                            AsyncViewMixin,
+                            ReplicaReadMixin,
+                            ConditionalMixin,
+                            CachedListMixin,
                             mixins.DestroyModelMixin,
                             mixins.UpdateModelMixin,
                             mixins.ListModelMixin,
                             viewsets.GenericViewSet):
     """Base viewset for recipe attribute."""
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachingTokenAuthentication]
     permission_classes = [IsAuthenticated]
+    ## noqa NOTE: Set by subclasses, the Recipe M2M field linking to the model.
+    recipe_field = None
+    count_serializer_class = None
+    ## noqa NOTE: Matches returned by autocomplete, by default and at most.
+    autocomplete_limit = drf_serializers.IntegerField(
+        min_value=1, max_value=50, default=10,
+    )
+    ## noqa NOTE: Validates the 0/1 flags (assigned_only, recipe_count).
+    flag_field = drf_serializers.IntegerField(
+        min_value=0, max_value=1, default=0,
+    )
+
+    def _param_flag(self, name):
+        """Return a 0/1 query parameter as a bool."""
+        try:
+            value = self.flag_field.run_validation(
+                self.request.query_params.get(name, empty),
+            )
+        except ValidationError as exc:
+            raise ValidationError({name: exc.detail})
+        return bool(value)
+
+    def _recipe_links(self):
+        """Return (through rows linking recipes to the outer item, column)."""
+        field = Recipe._meta.get_field(self.recipe_field)
+        column = field.m2m_reverse_field_name()
+        links = field.remote_field.through.objects.filter(
+            **{column: OuterRef('pk')}
+        )
+        return links, column
 
     def get_queryset(self):
         """Filter queryset to authenticated user."""
-        assigned_only = bool(
-            int(self.request.query_params.get('assigned_only', 0))
-        )
-        queryset = self.queryset
-        if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
+        queryset = self.queryset.filter(user=self.request.user)
+        links, column = self._recipe_links()
+        if self._param_flag('assigned_only'):
+            ## noqa NOTE: Semi-join on the through table, no JOIN + DISTINCT.
+            queryset = queryset.filter(Exists(links))
+        if self.action == 'list' and self._param_flag('recipe_count'):
+            counts = links.order_by().values(column).annotate(
+                count=Count('*'),
+            ).values('count')
+            queryset = queryset.annotate(
+                recipe_count=Coalesce(Subquery(counts), 0),
+            )
+
+        return queryset.order_by('-name', '-id')
+
+    def get_serializer_class(self):
+        """Return the serializer class for request."""
+        if self.action == 'list' and self._param_flag('recipe_count'):
+            return self.count_serializer_class
+        return self.serializer_class
+
+    def perform_update(self, serializer):
+        """Save the object, rejecting a name the user already has."""
+        try:
+            with transaction.atomic():
+                serializer.save()
+        except IntegrityError:
+            msg = _('An item with this name already exists.')
+            raise ValidationError({'name': [msg]})
+
+    @action(methods=['GET'], detail=False, pagination_class=None)
+    def autocomplete(self, request):
+        """Return the user's items whose name starts with a prefix."""
+        prefix = request.query_params.get('q', '').strip()
+        try:
+            limit = self.autocomplete_limit.run_validation(
+                request.query_params.get('limit', empty),
+            )
+        except ValidationError as exc:
+            raise ValidationError({'limit': exc.detail})
 
-        return queryset.filter(
-            user=self.request.user
-        ).order_by('-name').distinct()
+        matches = autocomplete.autocomplete(
+            self.queryset.filter(user=request.user),
+            request.user.pk,
+            prefix,
+            limit,
+        )
+        return Response([
+            {'id': obj_id, 'name': name} for obj_id, name in matches
+        ])
 
 
 class TagViewSet(BaseRecipeAttrViewSet):
     """Manage tags in the databases."""
     serializer_class = serializers.TagSerializer
+    count_serializer_class = serializers.TagCountSerializer
     queryset = Tag.objects.all()
+    recipe_field = 'tags'
 
 
 class IngredientViewSet(BaseRecipeAttrViewSet):
     """Manage ingredients in the database."""
     serializer_class = serializers.IngredientSerializer
+    count_serializer_class = serializers.IngredientCountSerializer
     queryset = Ingredient.objects.all()
+    recipe_field = 'ingredients'
+
+
+class RecipeStatsView(AsyncViewMixin, ReplicaReadMixin, APIView):
+    """Statistics of the authenticated user's recipes."""
+    authentication_classes = [CachingTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(responses=serializers.RecipeStatsSerializer)
+    def get(self, request):
+        """Return recipe counts, averages, price histogram and top items."""
+        key = cache.make_key(request, 'recipe-stats', 'retrieve')
+        etag = etags.make_etag(key)
+        headers = {'ETag': etag}
+        if etags.etag_matches(request.headers.get('If-None-Match'), etag):
+            return Response(
+                status=status.HTTP_304_NOT_MODIFIED, headers=headers,
+            )
+
+        data = cache.get_cached(key) if cache.is_enabled() else None
+        if data is None:
+            data = cache.to_plain(serializers.RecipeStatsSerializer(
+                stats.recipe_stats(request.user),
+            ).data)
+            if cache.is_enabled():
+                cache.store(key, data)
+                headers['X-Cache'] = 'MISS'
+        else:
+            headers['X-Cache'] = 'HIT'
+        return Response(data, headers=headers)
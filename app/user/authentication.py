@@ -0,0 +1,184 @@
+"""
+Authentication for the APIs.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.authentication import TokenAuthentication
+
+from core import metrics
+
+
+def _version_key(user_id):
+    return f'auth:version:{user_id}'
+
+
+def get_credentials_version(user_id):
+    """Return the shared version of a user's account and tokens."""
+    cache = caches[settings.AUTH_TOKEN_VERSION_CACHE_ALIAS]
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        ## noqa NOTE: Seed from the clock so an evicted counter never restarts
+        ## noqa   at a value that cached entries were stored under.
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_credentials_version(user_id):
+    """Make every process drop its cached entries of a user."""
+    cache = caches[settings.AUTH_TOKEN_VERSION_CACHE_ALIAS]
+    key = _version_key(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+def invalidate_credentials(user_id):
+    """Bump a user's version now and again once the change commits."""
+    bump_credentials_version(user_id)
+    ## noqa NOTE: A request between the change and its commit may have cached
+    ## noqa   the old row under the new version, the second bump drops it.
+    transaction.on_commit(lambda: bump_credentials_version(user_id))
+
+
+class TokenCache:
+    """Bounded, process-local LRU cache of token key -> (user, token).
+
+    Entries expire after ttl seconds. Entries are dropped explicitly when
+    a token is deleted or its user is saved (see user.signals). Given a
+    version function, each entry also keeps the version of its user at
+    caching time and a hit with another version is a miss, which is how
+    changes made in other processes are seen. Given a name, hits,
+    misses and size are also exported on the metrics endpoint.
+    """
+
+    def __init__(
+        self, maxsize, ttl, clock=time.monotonic, version=None, name=None,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.version = version
+        self.name = name
+        self._entries = OrderedDict()
+        self._keys_by_user = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return the cached (user, token) for a key or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] <= self.clock():
+                self._remove(key)
+                entry = None
+        ## noqa NOTE: Outside the lock, the version may come from a remote cache.
+        if (
+            entry is not None and self.version is not None
+            and entry[3] != self.version(entry[0].pk)
+        ):
+            self.invalidate_key(key)
+            entry = None
+        if self.name is not None:
+            metrics.count_cache(self.name, entry is not None)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def set(self, key, user, token):
+        """Cache the user and token of a key."""
+        if self.maxsize <= 0:
+            return
+        version = self.version(user.pk) if self.version is not None else None
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (
+                user, token, self.clock() + self.ttl, version,
+            )
+            self._keys_by_user.setdefault(user.pk, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+            self._report_size()
+
+    def invalidate_key(self, key):
+        """Drop the entry of a token key."""
+        with self._lock:
+            self._remove(key)
+
+    def invalidate_user(self, user_id):
+        """Drop every entry of a user."""
+        with self._lock:
+            for key in list(self._keys_by_user.get(user_id, ())):
+                self._remove(key)
+
+    def clear(self):
+        """Drop all entries and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+            self.hits = 0
+            self.misses = 0
+            self._report_size()
+
+    def stats(self):
+        """Return the size, hit/miss counters and hit ratio."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / total if total else 0.0,
+            }
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        user_keys = self._keys_by_user.get(entry[0].pk)
+        if user_keys is not None:
+            user_keys.discard(key)
+            if not user_keys:
+                del self._keys_by_user[entry[0].pk]
+        self._report_size()
+
+    def _report_size(self):
+        if self.name is not None:
+            metrics.set_cache_entries(self.name, len(self._entries))
+
+
+token_cache = TokenCache(
+    maxsize=settings.AUTH_TOKEN_CACHE_SIZE,
+    ttl=settings.AUTH_TOKEN_CACHE_TTL,
+    version=get_credentials_version,
+    name='auth_token',
+)
+
+
+class CachingTokenAuthentication(TokenAuthentication):
+    """Token authentication skipping the token/user query on cache hits."""
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is None:
+            cached = super().authenticate_credentials(key)
+            token_cache.set(key, *cached)
+
+        user, token = cached
+        ## noqa NOTE: Hand out a copy so a view changing request.user never
+        ## noqa   alters the instance shared with other requests.
+        return copy.copy(user), token
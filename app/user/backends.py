@@ -0,0 +1,36 @@
+"""
+Authentication backends.
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from user.hashers import hash_pool
+
+
+class HashPoolModelBackend(ModelBackend):
+    """ModelBackend verifying passwords through the hash pool.
+
+    Hashes made with a legacy or outdated hasher are replaced by one
+    from the preferred hasher on a successful login.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            ## noqa NOTE: Hash anyway to hide which emails exist through timing.
+            hash_pool.make_password(password)
+            return None
+
+        is_correct, must_update = hash_pool.verify(password, user.password)
+        if not is_correct or not self.user_can_authenticate(user):
+            return None
+        if must_update:
+            user.password = hash_pool.make_password(password)
+            user.save(update_fields=['password'])
+        return user
@@ -0,0 +1,172 @@
+"""
+Password hashers and off-thread password verification.
+"""
+import base64
+import hashlib
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.utils.crypto import constant_time_compare
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    """Argon2id with costs taken from settings.
+
+    Django's defaults use 100 MiB per hash; the settings default to the
+    OWASP baseline (19 MiB, 2 passes, 1 lane) so a burst of logins does
+    not exhaust worker memory. Hashes made with other costs are updated
+    on the next successful login.
+    """
+
+    @property
+    def time_cost(self):
+        return settings.ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.ARGON2_PARALLELISM
+
+
+class ScryptPasswordHasher(hashers.BasePasswordHasher):
+    """Scrypt from the standard library (backport of Django 4.0's)."""
+    algorithm = 'scrypt'
+    block_size = 8
+    maxmem = 0
+    parallelism = 1
+    work_factor = 2 ** 14
+
+    def encode(self, password, salt, n=None, r=None, p=None):
+        assert password is not None
+        assert salt and '$' not in salt
+        n = n or self.work_factor
+        r = r or self.block_size
+        p = p or self.parallelism
+        hash_ = hashlib.scrypt(
+            password.encode(),
+            salt=salt.encode(),
+            n=n,
+            r=r,
+            p=p,
+            maxmem=self.maxmem,
+            dklen=64,
+        )
+        hash_ = base64.b64encode(hash_).decode('ascii').strip()
+        return '%s$%d$%s$%d$%d$%s' % (self.algorithm, n, salt, r, p, hash_)
+
+    def decode(self, encoded):
+        algorithm, work_factor, salt, block_size, parallelism, hash_ = (
+            encoded.split('$', 6)
+        )
+        assert algorithm == self.algorithm
+        return {
+            'algorithm': algorithm,
+            'work_factor': int(work_factor),
+            'salt': salt,
+            'block_size': int(block_size),
+            'parallelism': int(parallelism),
+            'hash': hash_,
+        }
+
+    def verify(self, password, encoded):
+        decoded = self.decode(encoded)
+        encoded_2 = self.encode(
+            password,
+            decoded['salt'],
+            decoded['work_factor'],
+            decoded['block_size'],
+            decoded['parallelism'],
+        )
+        return constant_time_compare(encoded, encoded_2)
+
+    def safe_summary(self, encoded):
+        decoded = self.decode(encoded)
+        return {
+            'algorithm': decoded['algorithm'],
+            'work factor': decoded['work_factor'],
+            'block size': decoded['block_size'],
+            'parallelism': decoded['parallelism'],
+            'salt': hashers.mask_hash(decoded['salt']),
+            'hash': hashers.mask_hash(decoded['hash']),
+        }
+
+    def must_update(self, encoded):
+        decoded = self.decode(encoded)
+        return (
+            decoded['work_factor'] != self.work_factor
+            or decoded['block_size'] != self.block_size
+            or decoded['parallelism'] != self.parallelism
+        )
+
+    def harden_runtime(self, password, encoded):
+        ## noqa NOTE: The runtime of scrypt depends only on its parameters.
+        pass
+
+
+def verify_password(password, encoded):
+    """Return (is_correct, must_update) for a password and its hash."""
+    updates = []
+    is_correct = hashers.check_password(
+        password, encoded, setter=lambda raw_password: updates.append(True),
+    )
+    return is_correct, bool(updates)
+
+
+def _init_worker():
+    ## noqa NOTE: Spawned workers start without Django, set it up once.
+    import django
+    django.setup()
+
+
+class HashPool:
+    """Run password hashing in a bounded pool of worker processes.
+
+    Request threads wait on the result with the GIL released, so other
+    requests keep being served, and at most `size` hashes run at once
+    whatever the login rate. A size of 0 hashes in the calling thread.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.size,
+                    ## noqa NOTE: spawn, as forking copies open DB connections and locks.
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                )
+            return self._executor
+
+    def _run(self, func, *args):
+        if self.size <= 0:
+            return func(*args)
+        return self._get_executor().submit(func, *args).result()
+
+    def verify(self, password, encoded):
+        """Return (is_correct, must_update) for a password and its hash."""
+        return self._run(verify_password, password, encoded)
+
+    def make_password(self, password):
+        """Return a new hash of the password with the preferred hasher."""
+        return self._run(hashers.make_password, password)
+
+    def shutdown(self):
+        """Stop the worker processes."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+
+hash_pool = HashPool(settings.PASSWORD_HASH_POOL_SIZE)
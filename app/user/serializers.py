@@ -10,8 +10,10 @@ from django.utils.translation import gettext as _
 
 from rest_framework import serializers
 
+from core.metrics import TimedSerializerMixin
 
-class UserSerializer(serializers.ModelSerializer):
+
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for the user object."""
 
     class Meta:
@@ -45,7 +47,7 @@ class UserSerializer(serializers.ModelSerializer):
         return user
 
 
-class AuthTokenSerializer(serializers.Serializer):
+class AuthTokenSerializer(TimedSerializerMixin, serializers.Serializer):
     """Serializer for the uesr auth token"""
     email = serializers.EmailField()
     password = serializers.CharField(
@@ -0,0 +1,28 @@
+"""
+Signal handlers keeping the token authentication cache consistent.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from user.authentication import invalidate_credentials, token_cache
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """Forget a token once it is deleted."""
+    token_cache.invalidate_key(instance.key)
+    invalidate_credentials(instance.user_id)
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def invalidate_changed_user(sender, instance, **kwargs):
+    """Forget the tokens of a user that changed.
+
+    Covers deactivation (is_active) and password changes made through
+    UserSerializer.update, which both save the user.
+    """
+    token_cache.invalidate_user(instance.pk)
+    invalidate_credentials(instance.pk)
@@ -0,0 +1,184 @@
+"""
+Tests for the caching token authentication.
+"""
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from prometheus_client.parser import text_string_to_metric_families
+
+from core import metrics
+from user.authentication import TokenCache, token_cache
+
+
+ME_URL = reverse('user:me')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def cache_samples():
+    """Return the auth_token cache samples served on the metrics endpoint."""
+    return {
+        (sample.name, sample.labels.get('result')): sample.value
+        for family in text_string_to_metric_families(metrics.render())
+        for sample in family.samples
+        if sample.labels.get('cache') == 'auth_token'
+    }
+
+
+class FakeClock:
+    """Clock advanced manually by tests."""
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class TokenCacheTests(SimpleTestCase):
+    """Test the bounded token LRU."""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = TokenCache(maxsize=2, ttl=10, clock=self.clock)
+
+    def _user(self, pk):
+        return SimpleNamespace(pk=pk)
+
+    def test_get_after_set(self):
+        """Test a cached key is returned with hit/miss counters."""
+        user = self._user(1)
+        self.assertIsNone(self.cache.get('a'))
+        self.cache.set('a', user, 'token')
+
+        self.assertEqual(self.cache.get('a'), (user, 'token'))
+        self.assertEqual(
+            self.cache.stats(),
+            {'size': 1, 'hits': 1, 'misses': 1, 'hit_ratio': 0.5},
+        )
+
+    def test_evicts_least_recently_used(self):
+        """Test the least recently used key is evicted when full."""
+        self.cache.set('a', self._user(1), 'ta')
+        self.cache.set('b', self._user(2), 'tb')
+        self.cache.get('a')
+
+        self.cache.set('c', self._user(3), 'tc')
+
+        self.assertIsNone(self.cache.get('b'))
+        self.assertIsNotNone(self.cache.get('a'))
+        self.assertIsNotNone(self.cache.get('c'))
+
+    def test_entries_expire(self):
+        """Test entries are dropped after the TTL."""
+        self.cache.set('a', self._user(1), 'ta')
+
+        self.clock.now = 10
+
+        self.assertIsNone(self.cache.get('a'))
+        self.assertEqual(self.cache.stats()['size'], 0)
+
+    def test_invalidate_user(self):
+        """Test all keys of a user are dropped together."""
+        self.cache.set('a', self._user(1), 'ta')
+        self.cache.set('b', self._user(1), 'tb')
+
+        self.cache.invalidate_user(1)
+
+        self.assertIsNone(self.cache.get('a'))
+        self.assertIsNone(self.cache.get('b'))
+
+
+class CachingTokenAuthenticationTests(TestCase):
+    """Test authenticating API requests through the cache."""
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_second_request_skips_token_query(self):
+        """Test a cached token does not query the token table."""
+        self.client.get(ME_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+        self.assertEqual(token_cache.stats()['hits'], 1)
+
+    def test_stats_exported(self):
+        """Test hits, misses and size are served on the metrics endpoint."""
+        before = cache_samples()
+
+        self.client.get(ME_URL)
+        self.client.get(ME_URL)
+        self.client.get(ME_URL)
+
+        after = cache_samples()
+        for result, count in (('hit', 2), ('miss', 1)):
+            key = ('app_cache_requests_total', result)
+            self.assertEqual(after[key] - before.get(key, 0), count)
+        self.assertEqual(after['app_cache_entries', None], 1)
+
+    def test_deleted_token_rejected(self):
+        """Test deleting a token revokes it immediately."""
+        self.client.get(ME_URL)
+
+        self.token.delete()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_rejected(self):
+        """Test deactivating a user revokes cached tokens."""
+        self.client.get(RECIPES_URL)
+
+        self.user.is_active = False
+        self.user.save()
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_change_in_other_process_rejected(self):
+        """Test a change made by another process invalidates the entry."""
+        self.client.get(RECIPES_URL)
+
+        ## noqa NOTE: Another process only shares the version, not the entries.
+        with patch.object(token_cache, 'invalidate_user'):
+            self.user.is_active = False
+            self.user.save()
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_drops_cached_user(self):
+        """Test changing the password through the API drops the entry."""
+        self.client.get(ME_URL)
+
+        res = self.client.patch(ME_URL, {'password': 'newpass123'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(token_cache.stats()['size'], 0)
+
+    def test_update_does_not_change_cached_user(self):
+        """Test a view changing request.user leaves the cache untouched."""
+        self.client.get(ME_URL)
+        cached_user, _ = token_cache.get(self.token.key)
+
+        self.client.patch(ME_URL, {'name': 'Changed'})
+
+        self.assertNotEqual(cached_user.name, 'Changed')
@@ -0,0 +1,149 @@
+"""
+Tests for password hashing and the hash pool.
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import (
+    BCryptSHA256PasswordHasher,
+    check_password,
+    identify_hasher,
+    make_password,
+)
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from user.hashers import (
+    Argon2PasswordHasher,
+    HashPool,
+    ScryptPasswordHasher,
+)
+
+
+TOKEN_URL = reverse('user:token')
+
+
+class HasherTests(SimpleTestCase):
+    """Test the configured password hashers."""
+
+    def test_new_hashes_use_preferred_hasher(self):
+        """Test new passwords are hashed with argon2 by default."""
+        encoded = make_password('testpass123')
+
+        self.assertEqual(identify_hasher(encoded).algorithm, 'argon2')
+        self.assertTrue(check_password('testpass123', encoded))
+
+    @override_settings(ARGON2_MEMORY_COST=8192, ARGON2_TIME_COST=1)
+    def test_argon2_costs_from_settings(self):
+        """Test argon2 costs come from settings and trigger updates."""
+        hasher = Argon2PasswordHasher()
+        encoded = hasher.encode('testpass123', hasher.salt())
+
+        decoded = hasher.decode(encoded)
+        self.assertEqual(decoded['memory_cost'], 8192)
+        self.assertEqual(decoded['time_cost'], 1)
+        with self.settings(ARGON2_TIME_COST=2):
+            self.assertTrue(hasher.must_update(encoded))
+
+    def test_scrypt_round_trip(self):
+        """Test the scrypt hasher verifies its own hashes."""
+        hasher = ScryptPasswordHasher()
+        encoded = hasher.encode('testpass123', hasher.salt())
+
+        self.assertTrue(encoded.startswith('scrypt$'))
+        self.assertTrue(hasher.verify('testpass123', encoded))
+        self.assertFalse(hasher.verify('wrong', encoded))
+        self.assertFalse(hasher.must_update(encoded))
+
+    def test_scrypt_must_update_on_new_work_factor(self):
+        """Test scrypt hashes with other parameters need updating."""
+        hasher = ScryptPasswordHasher()
+        encoded = hasher.encode('testpass123', hasher.salt(), n=2 ** 10)
+
+        self.assertTrue(hasher.must_update(encoded))
+
+    def test_bcrypt_round_trip(self):
+        """Test the bcrypt option works with the installed requirements."""
+        hasher = BCryptSHA256PasswordHasher()
+        encoded = hasher.encode('testpass123', hasher.salt())
+
+        self.assertTrue(encoded.startswith('bcrypt_sha256$'))
+        self.assertTrue(hasher.verify('testpass123', encoded))
+        self.assertFalse(hasher.verify('wrong', encoded))
+
+
+class HashPoolTests(SimpleTestCase):
+    """Test hashing in worker processes."""
+
+    def test_inline_verify(self):
+        """Test a pool of size 0 verifies in the calling thread."""
+        pool = HashPool(0)
+        encoded = make_password('testpass123')
+
+        self.assertEqual(pool.verify('testpass123', encoded), (True, False))
+        self.assertEqual(pool.verify('wrong', encoded), (False, False))
+
+    def test_process_verify(self):
+        """Test worker processes verify and flag outdated hashes."""
+        pool = HashPool(1)
+        self.addCleanup(pool.shutdown)
+        legacy = make_password('testpass123', hasher='pbkdf2_sha256')
+
+        self.assertEqual(pool.verify('testpass123', legacy), (True, True))
+        self.assertEqual(pool.verify('wrong', legacy), (False, False))
+        encoded = pool.make_password('testpass123')
+        self.assertEqual(identify_hasher(encoded).algorithm, 'argon2')
+
+
+class RehashOnLoginTests(TestCase):
+    """Test legacy hashes are replaced on login."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+
+    def test_legacy_hash_upgraded_on_token_login(self):
+        """Test logging in replaces a PBKDF2 hash with argon2."""
+        self.user.password = make_password(
+            'testpass123', hasher='pbkdf2_sha256',
+        )
+        self.user.save()
+
+        res = self.client.post(TOKEN_URL, {
+            'email': 'user@example.com',
+            'password': 'testpass123',
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertEqual(identify_hasher(self.user.password).algorithm,
+                         'argon2')
+
+    def test_wrong_password_keeps_hash(self):
+        """Test a failed login leaves the stored hash alone."""
+        original = self.user.password
+
+        res = self.client.post(TOKEN_URL, {
+            'email': 'user@example.com',
+            'password': 'wrong',
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.password, original)
+
+    def test_inactive_user_rejected(self):
+        """Test inactive users cannot obtain a token."""
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.post(TOKEN_URL, {
+            'email': 'user@example.com',
+            'password': 'testpass123',
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -1,10 +1,12 @@
 """
 Views for the user API
 """
-from rest_framework import generics, authentication, permissions
+from rest_framework import generics, permissions
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
 
+from core.asyncviews import AsyncViewMixin
+from user.authentication import CachingTokenAuthentication
 from user.serializers import (
     UserSerializer,
     AuthTokenSerializer
@@ -12,13 +14,13 @@ from user.serializers import (
 
 
 ## noqa NOTE: The generics.CreateAPIView can handle http POST requests that is designed to create objects in  DB.
-class CreateUserView(generics.CreateAPIView):
+class CreateUserView(AsyncViewMixin, generics.CreateAPIView):
     """Create a new user in the system."""
     ## noqa NOTE: set the serializer_class on this view.
     serializer_class = UserSerializer
 
 
-class CreateTokenView(ObtainAuthToken):
+class CreateTokenView(AsyncViewMixin, ObtainAuthToken):
     """Create a new auth token for user."""
     ## noqa NOTE: use the ObtainAuthToken class behaviour and maeke it use our serializer(AuthTokenSerializer)
     ## noqa Overriding the class as we use username as email rather than the default username.
@@ -28,13 +30,13 @@ class CreateTokenView(ObtainAuthToken):
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
 
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class ManageUserView(AsyncViewMixin, generics.RetrieveUpdateAPIView):
     """Manage the authenticated user."""
     ## noqa NOTE:RetrieveUpdateAPIView for retrieving and updating obj in the database.
     ## noqa NOTE:user modified UserSerializer.
     serializer_class = UserSerializer
     ## noqa NOTE: To get the authentication and permissions for using this API.
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachingTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     ## noqa NOTE: get_object is overrided, get_objects gets the objects for http get request or any request for this API.